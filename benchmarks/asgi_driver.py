@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Dict, Optional, Tuple
+
+
+# =========================
+# Cliente ASGI mínimo (sin servidor ni httpx)
+# =========================
+#
+# Llama a la app directamente con un scope HTTP: mide el coste de la app
+# (rutas, plantillas, SQLite, cachés) sin la pila de red de uvicorn.
+
+async def asgi_get(
+    app: Any,
+    path: str,
+    query: str = "",
+    headers: Optional[Dict[str, str]] = None,
+) -> Tuple[int, Dict[str, str], bytes]:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode("utf-8"),
+        "query_string": query.encode("utf-8"),
+        "root_path": "",
+        "headers": [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in (headers or {}).items()],
+        "client": ("127.0.0.1", 50000),
+        "server": ("benchmark", 80),
+    }
+    request_sent = False
+    disconnect = asyncio.Event()
+
+    async def receive() -> Dict[str, Any]:
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # Solo se pide más si la app espera una desconexión: la damos al terminar
+        await disconnect.wait()
+        return {"type": "http.disconnect"}
+
+    status = 0
+    response_headers: Dict[str, str] = {}
+    body = bytearray()
+
+    async def send(message: Dict[str, Any]) -> None:
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            response_headers.update({k.decode("latin-1"): v.decode("latin-1") for k, v in message.get("headers", [])})
+        elif message["type"] == "http.response.body":
+            body.extend(message.get("body", b""))
+
+    try:
+        await app(scope, receive, send)
+    finally:
+        disconnect.set()
+    return status, response_headers, bytes(body)
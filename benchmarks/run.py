@@ -0,0 +1,280 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+# El bot exige estas variables al importar la configuración; para medir no hacen
+# falta valores reales (no se envía nada ni se sale a la red)
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "benchmark")
+os.environ.setdefault("TELEGRAM_CHAT_ID", "0")
+os.environ.setdefault("API_FOOTBALL_KEY", "benchmark")
+
+import numpy as np  # noqa: E402
+
+from bot_bet.config import settings  # noqa: E402
+
+
+# =========================
+# Benchmarks del pipeline y de la web
+# =========================
+#
+#   python -m benchmarks.run                       # todo, con datos sintéticos
+#   python -m benchmarks.run --suite pipeline --latency 0.05
+#   python -m benchmarks.run --suite pipeline --cassette data/cassettes/api.jsonl.gz
+#
+# - pipeline: build_daily_message_and_payload() para una jornada de 10 partidos
+#   (API sintética o un cassette grabado con main.py --record). La primera
+#   ejecución es "en frío" (almacén de partidos vacío); el resto, "en caliente".
+#   La caché de API-Football está desactivada: se cuentan todas las llamadas.
+# - stats: compute_stats() (todo el histórico) y compute_stats(365) (ventana de
+#   /stats), ambos sobre agregados materializados, con 1, 3 y 10 temporadas de
+#   predicciones sintéticas (bot_bet.synthetic_history; --leagues para más
+#   partidos por día).
+# - web: peticiones/s y p50/p99 de /, /day/{day} y /stats a través de la app
+#   ASGI, con la caché de páginas y sin ella.
+#
+# El resultado se escribe en JSON (por defecto benchmarks/results/<commit>.json,
+# ignorado por git) para comparar entre commits.
+
+BENCH_DAY = date(2025, 3, 15)
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+DAYS_PER_SEASON = 365
+
+
+@contextlib.contextmanager
+def _quiet() -> Any:
+    # El pipeline escribe mucho [DEBUG]/[CARDS]; fuera de la medida no interesa
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def _timings(seconds: Sequence[float]) -> Dict[str, float]:
+    values = np.asarray(seconds, dtype=np.float64)
+    return {
+        "n": int(len(values)),
+        "mean_ms": round(float(values.mean()) * 1000, 3),
+        "p50_ms": round(float(np.percentile(values, 50)) * 1000, 3),
+        "p99_ms": round(float(np.percentile(values, 99)) * 1000, 3),
+        "min_ms": round(float(values.min()) * 1000, 3),
+        "max_ms": round(float(values.max()) * 1000, 3),
+        "per_second": round(len(values) / float(values.sum()), 1) if values.sum() > 0 else None,
+    }
+
+
+def _measure(fn: Callable[[], Any], iterations: int) -> Dict[str, float]:
+    samples: List[float] = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return _timings(samples)
+
+
+# =========================
+# Pipeline diario
+# =========================
+
+def bench_pipeline(workdir: Path, iterations: int, latency: float, cassette: Optional[Path]) -> Dict[str, Any]:
+    from bot_bet.api_football_client import get_http_call_count, reset_http_call_count
+    from bot_bet.http_replay import configure_http_mode
+    from bot_bet.predictions import build_daily_message_and_payload
+
+    from .synthetic_api import SyntheticLeague, install_synthetic_api
+
+    if cassette is not None:
+        settings.http_replay_latency = str(latency)
+        configure_http_mode("replay", cassette)
+        source = f"cassette:{cassette}"
+    else:
+        settings.api_cache_enabled = False
+        settings.football_db_path = workdir / "football.db"
+        settings.run_date = BENCH_DAY.isoformat()
+        install_synthetic_api(SyntheticLeague(BENCH_DAY), latency=latency)
+        source = "synthetic"
+
+    runs: List[Dict[str, Any]] = []
+    for _ in range(iterations):
+        reset_http_call_count()
+        start = time.perf_counter()
+        with _quiet():
+            _text, payload = build_daily_message_and_payload()
+        runs.append({
+            "wall_s": time.perf_counter() - start,
+            "http_calls": get_http_call_count(),
+            "matches": len(payload["matches"]),
+        })
+
+    warm = runs[1:]
+    return {
+        "source": source,
+        "latency_s": latency,
+        "pipeline_workers": settings.pipeline_workers,
+        "matches": runs[0]["matches"],
+        "cold": {"wall_s": round(runs[0]["wall_s"], 4), "http_calls": runs[0]["http_calls"]},
+        "warm": {
+            "runs": len(warm),
+            "wall_s_p50": round(float(np.median([r["wall_s"] for r in warm])), 4) if warm else None,
+            "wall_s_min": round(min(r["wall_s"] for r in warm), 4) if warm else None,
+            "http_calls": warm[-1]["http_calls"] if warm else None,
+        },
+    }
+
+
+# =========================
+# Histórico sintético de predicciones
+# =========================
+
+def build_history_db(path: Path, days: int, last_day: date, leagues: int = 1) -> int:
+    """
+    predictions.db con `days` días seguidos hasta last_day (10 partidos por liga
+    y día), con bot_bet.synthetic_history. Devuelve las filas de partidos.
+    """
+    from bot_bet.synthetic_history import generate_history
+
+    with _quiet():
+        _days, matches = generate_history(path, days * leagues * 10, n_leagues=leagues, end_day=last_day)
+    return matches
+
+
+def _use_web_db(path: Path) -> Any:
+    import bot_bet.webapp.app as web
+
+    web.close_all_connections()
+    web.render_cache.clear()
+    web.DB_PATH = path
+    web.init_db()
+    return web
+
+
+# =========================
+# compute_stats
+# =========================
+
+def bench_stats(workdir: Path, seasons: Sequence[int], iterations: int, leagues: int) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+    for n in seasons:
+        path = workdir / f"history_{n}.db"
+        start = time.perf_counter()
+        match_rows = build_history_db(path, n * DAYS_PER_SEASON, date.today(), leagues)
+        build_s = time.perf_counter() - start
+
+        web = _use_web_db(path)
+
+        results[f"{n}_seasons"] = {
+            "days": n * DAYS_PER_SEASON,
+            "match_rows": match_rows,
+            "build_s": round(build_s, 3),
+            "compute_stats": _measure(web.compute_stats, iterations),
+            "compute_stats_365d": _measure(lambda: web.compute_stats(limit_days=365), iterations),
+        }
+    return results
+
+
+# =========================
+# Web (ASGI)
+# =========================
+
+def bench_web(workdir: Path, requests_per_route: int, leagues: int) -> Dict[str, Any]:
+    from .asgi_driver import asgi_get
+
+    path = workdir / "history_3.db"
+    if not path.exists():
+        build_history_db(path, 3 * DAYS_PER_SEASON, date.today(), leagues)
+    web = _use_web_db(path)
+    some_day = (date.today() - timedelta(days=40)).isoformat()
+    routes = {"/": "/", "/day/{day}": f"/day/{some_day}", "/stats": "/stats"}
+
+    async def run() -> Dict[str, Any]:
+        out: Dict[str, Any] = {}
+        for label, url in routes.items():
+            status, _headers, body = await asgi_get(web.app, url)
+            if status != 200:
+                raise RuntimeError(f"{url} devolvió {status}")
+            out[label] = {"bytes": len(body)}
+            for variant, clear in (("cached", False), ("uncached", True)):
+                samples: List[float] = []
+                for _ in range(requests_per_route):
+                    if clear:
+                        web.render_cache.clear()
+                    start = time.perf_counter()
+                    await asgi_get(web.app, url)
+                    samples.append(time.perf_counter() - start)
+                out[label][variant] = _timings(samples)
+        return out
+
+    with _quiet():
+        return asyncio.run(run())
+
+
+# =========================
+# CLI
+# =========================
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True, cwd=Path(__file__).resolve().parents[1],
+        ).stdout.strip() or None
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmarks del pipeline y de la web")
+    parser.add_argument("--suite", default="pipeline,stats,web", help="Lista separada por comas: pipeline,stats,web")
+    parser.add_argument("--iterations", type=int, default=5, help="Ejecuciones del pipeline / llamadas a compute_stats")
+    parser.add_argument("--latency", type=float, default=0.0, help="Latencia simulada por petición HTTP (segundos)")
+    parser.add_argument("--cassette", type=Path, default=None, help="Usar un cassette grabado en vez de la API sintética")
+    parser.add_argument("--seasons", default="1,3,10", help="Temporadas de histórico para compute_stats")
+    parser.add_argument("--leagues", type=int, default=1, help="Ligas por día en el histórico sintético")
+    parser.add_argument("--requests", type=int, default=200, help="Peticiones por ruta y variante en la web")
+    parser.add_argument("--out", type=Path, default=None, help="Fichero JSON de salida")
+    args = parser.parse_args(argv)
+
+    suites = {s.strip() for s in args.suite.split(",") if s.strip()}
+    commit = _git_commit()
+    report: Dict[str, Any] = {
+        "meta": {
+            "commit": commit,
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+    }
+
+    with tempfile.TemporaryDirectory(prefix="bot_bet_bench_") as tmp:
+        workdir = Path(tmp)
+        if "pipeline" in suites:
+            print("[INFO] Benchmark: pipeline...")
+            report["pipeline"] = bench_pipeline(workdir, max(args.iterations, 1), args.latency, args.cassette)
+        if "stats" in suites:
+            print("[INFO] Benchmark: compute_stats...")
+            seasons = [int(s) for s in args.seasons.split(",") if s.strip()]
+            report["stats"] = bench_stats(workdir, seasons, max(args.iterations, 1) * 20, args.leagues)
+        if "web" in suites:
+            print("[INFO] Benchmark: web...")
+            report["web"] = bench_web(workdir, args.requests, args.leagues)
+
+    out = args.out or RESULTS_DIR / f"{commit or 'local'}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    print(f"[INFO] Resultados en {out}")
+
+
+if __name__ == "__main__":
+    main()
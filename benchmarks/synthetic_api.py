@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import json
+import random
+import time
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+
+# =========================
+# API-Football sintética (adaptador de requests, sin red)
+# =========================
+#
+# Una liga de 20 equipos con calendario de 38 jornadas (una por semana). Las
+# jornadas anteriores a `today` están terminadas (con marcador y estadística de
+# tarjetas) y la de `today` tiene 10 partidos por jugar, que es la que
+# predice el bot. Los datos salen de una semilla fija: dos ejecuciones piden y
+# reciben exactamente lo mismo.
+
+TEAMS: List[Tuple[int, str]] = [(500 + i, f"Equipo {i + 1}") for i in range(20)]
+REFEREES = [f"Árbitro {i + 1}, Spain" for i in range(12)]
+
+
+def _round_robin(team_ids: List[int]) -> List[List[Tuple[int, int]]]:
+    # Método del círculo: 19 jornadas de ida y sus vueltas
+    ids = list(team_ids)
+    rounds: List[List[Tuple[int, int]]] = []
+    for r in range(len(ids) - 1):
+        pairs = [(ids[i], ids[-1 - i]) for i in range(len(ids) // 2)]
+        rounds.append([(a, b) if r % 2 == 0 else (b, a) for a, b in pairs])
+        ids = [ids[0]] + [ids[-1]] + ids[1:-1]
+    return rounds + [[(b, a) for a, b in rnd] for rnd in rounds]
+
+
+class SyntheticLeague:
+    def __init__(self, today: date, league_id: int = 140, season: int = 2025, seed: int = 7) -> None:
+        self.today = today
+        self.league_id = league_id
+        self.season = season
+        rnd = random.Random(seed)
+        names = dict(TEAMS)
+
+        strength = {t: rnd.uniform(0.8, 1.9) for t, _ in TEAMS}
+        cardy = {t: rnd.uniform(1.2, 3.2) for t, _ in TEAMS}
+
+        # La jornada "de hoy" es la 20ª: 19 ya jugadas
+        first_round = today - timedelta(weeks=19)
+        self.fixtures: List[Dict[str, Any]] = []
+        self.statistics: Dict[int, List[Dict[str, Any]]] = {}
+        fixture_id = 10_000
+        for rd, pairs in enumerate(_round_robin([t for t, _ in TEAMS])):
+            day = first_round + timedelta(weeks=rd)
+            for i, (home, away) in enumerate(pairs):
+                fixture_id += 1
+                finished = day < today
+                goals = (
+                    (min(7, int(rnd.expovariate(1 / strength[home]))), min(7, int(rnd.expovariate(1 / strength[away]))))
+                    if finished else (None, None)
+                )
+                self.fixtures.append({
+                    "fixture": {
+                        "id": fixture_id,
+                        "referee": REFEREES[(rd + i) % len(REFEREES)],
+                        "date": f"{day.isoformat()}T{16 + i % 5}:00:00+00:00",
+                        "status": {"short": "FT" if finished else "NS"},
+                    },
+                    "league": {"id": league_id, "season": season},
+                    "teams": {"home": {"id": home, "name": names[home]}, "away": {"id": away, "name": names[away]}},
+                    "goals": {"home": goals[0], "away": goals[1]},
+                })
+                if finished:
+                    self.statistics[fixture_id] = [
+                        {"team": {"id": team}, "statistics": [
+                            {"type": "Yellow Cards", "value": max(0, int(rnd.gauss(cardy[team], 1.2)))},
+                            {"type": "Red Cards", "value": 1 if rnd.random() < 0.08 else None},
+                        ]}
+                        for team in (home, away)
+                    ]
+
+        self._team_stats = {t: self._season_stats(t) for t, _ in TEAMS}
+
+    def _finished_for(self, team_id: int) -> List[Dict[str, Any]]:
+        return [
+            f for f in self.fixtures
+            if f["fixture"]["status"]["short"] == "FT" and team_id in (f["teams"]["home"]["id"], f["teams"]["away"]["id"])
+        ]
+
+    def _season_stats(self, team_id: int) -> Dict[str, Any]:
+        played = self._finished_for(team_id)
+        n = max(len(played), 1)
+        gf = ga = over_0_5 = over_1_5 = 0
+        yellow: Dict[str, int] = {}
+        red: Dict[str, int] = {}
+        for f in played:
+            home = f["teams"]["home"]["id"] == team_id
+            scored = f["goals"]["home"] if home else f["goals"]["away"]
+            conceded = f["goals"]["away"] if home else f["goals"]["home"]
+            gf += scored
+            ga += conceded
+            over_0_5 += scored > 0
+            over_1_5 += scored > 1
+            for entry in self.statistics.get(f["fixture"]["id"], []):
+                if entry["team"]["id"] != team_id:
+                    continue
+                for stat in entry["statistics"]:
+                    bucket = yellow if stat["type"] == "Yellow Cards" else red
+                    bucket["76-90"] = bucket.get("76-90", 0) + int(stat["value"] or 0)
+        return {
+            "fixtures": {"played": {"total": len(played)}},
+            "goals": {
+                "for": {"average": {"total": f"{gf / n:.1f}"}, "total": {"over_0_5": over_0_5, "over_1_5": over_1_5}},
+                "against": {"average": {"total": f"{ga / n:.1f}"}},
+            },
+            "cards": {
+                "yellow": {k: {"total": v} for k, v in yellow.items()},
+                "red": {k: {"total": v} for k, v in red.items()},
+            },
+        }
+
+    def _players(self, team_id: int) -> List[Dict[str, Any]]:
+        rnd = random.Random(team_id)
+        return [
+            {
+                "player": {"name": f"Jugador {team_id}-{i}"},
+                "statistics": [{"games": {"appearences": rnd.randint(5, 19)}, "cards": {"yellow": rnd.randint(0, 8), "red": rnd.randint(0, 1)}}],
+            }
+            for i in range(22)
+        ]
+
+    def _standings(self) -> List[Dict[str, Any]]:
+        table = []
+        for rank, (team_id, name) in enumerate(TEAMS, start=1):
+            table.append({
+                "rank": rank,
+                "team": {"id": team_id, "name": name},
+                "points": 60 - 2 * rank,
+                "all": {"played": 19, "win": 10, "draw": 4, "lose": 5, "goals": {"for": 30, "against": 20}},
+                "form": "WDLWW",
+            })
+        return [{"league": {"standings": [table]}}]
+
+    def respond(self, path: str, params: Dict[str, str]) -> Dict[str, Any]:
+        response: Any = []
+        if path == "/fixtures":
+            fixtures = self.fixtures
+            if "ids" in params:
+                ids = {int(i) for i in params["ids"].split("-")}
+                fixtures = [
+                    dict(f, statistics=self.statistics.get(f["fixture"]["id"], []))
+                    for f in fixtures if f["fixture"]["id"] in ids
+                ]
+            if "date" in params:
+                fixtures = [f for f in fixtures if f["fixture"]["date"][:10] == params["date"]]
+            if "team" in params:
+                team_id = int(params["team"])
+                fixtures = [f for f in fixtures if team_id in (f["teams"]["home"]["id"], f["teams"]["away"]["id"])]
+            if "last" in params:
+                fixtures = sorted(
+                    (f for f in fixtures if f["fixture"]["status"]["short"] == "FT"),
+                    key=lambda f: f["fixture"]["date"],
+                    reverse=True,
+                )[: int(params["last"])]
+            response = fixtures
+        elif path == "/fixtures/statistics":
+            response = self.statistics.get(int(params["fixture"]), [])
+        elif path == "/teams/statistics":
+            response = self._team_stats.get(int(params["team"]), {})
+        elif path == "/players":
+            response = self._players(int(params["team"]))
+        elif path == "/standings":
+            response = self._standings()
+        return {"get": path, "parameters": params, "errors": [], "results": len(response), "response": response}
+
+
+class SyntheticApiAdapter(BaseAdapter):
+    """
+    Responde las peticiones GET a API-Football con SyntheticLeague (latencia
+    opcional por petición). Cualquier otra URL devuelve {"ok": true}.
+    """
+
+    def __init__(self, league: SyntheticLeague, latency: float = 0.0) -> None:
+        super().__init__()
+        self.league = league
+        self.latency = latency
+        self.requests = 0
+
+    def send(self, request: requests.PreparedRequest, stream: bool = False, timeout: Any = None,
+             verify: Any = True, cert: Any = None, proxies: Any = None) -> requests.Response:
+        self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        parts = urlsplit(request.url or "")
+        if parts.netloc.endswith("api-sports.io"):
+            body = self.league.respond(parts.path, dict(parse_qsl(parts.query)))
+        else:
+            body = {"ok": True}
+
+        resp = requests.Response()
+        resp.status_code = 200
+        resp.reason = "OK"
+        resp.headers = CaseInsensitiveDict({
+            "content-type": "application/json",
+            "x-ratelimit-requests-limit": "75000",
+            "x-ratelimit-requests-remaining": "75000",
+        })
+        resp._content = json.dumps(body).encode("utf-8")
+        resp.encoding = "utf-8"
+        resp.url = request.url or ""
+        resp.request = request
+        return resp
+
+    def close(self) -> None:
+        pass
+
+
+def install_synthetic_api(league: SyntheticLeague, latency: float = 0.0, session: Optional[requests.Session] = None) -> SyntheticApiAdapter:
+    """
+    Monta el adaptador en la sesión HTTP compartida del bot.
+    """
+    from bot_bet.http_session import API_FOOTBALL_PREFIX, get_session
+
+    adapter = SyntheticApiAdapter(league, latency=latency)
+    session = session or get_session()
+    for prefix in ("https://", "http://", API_FOOTBALL_PREFIX):
+        session.mount(prefix, adapter)
+    return adapter
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from .config import settings
+
+
+# =========================
+# Caché persistente (SQLite) de respuestas de API-Football
+# =========================
+
+# TTLs en segundos. None = no caduca nunca.
+MINUTE = 60
+HOUR = 60 * MINUTE
+
+FINISHED_STATUSES = {"FT", "AET", "PEN"}
+
+ENDPOINT_TTLS: Dict[str, Optional[int]] = {
+    "/standings": 10 * MINUTE,
+    "/teams/statistics": 6 * HOUR,
+    "/players": 12 * HOUR,
+    "/fixtures": 15 * MINUTE,
+    "/fixtures/statistics": None,
+}
+DEFAULT_TTL = 10 * MINUTE
+
+_conn: Optional[sqlite3.Connection] = None
+_lock = threading.Lock()
+_hits = 0
+_misses = 0
+
+
+def make_key(path: str, params: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Clave normalizada: path + params ordenados y pasados a str
+    (así 140 y "140" son la misma petición).
+    """
+    norm = {str(k): str(v) for k, v in (params or {}).items()}
+    return f"{path}?{json.dumps(norm, sort_keys=True)}"
+
+
+def _all_finished(fixtures: Any) -> bool:
+    if not isinstance(fixtures, list) or not fixtures:
+        return False
+    for item in fixtures:
+        status = ((item.get("fixture") or {}).get("status") or {}).get("short")
+        if status not in FINISHED_STATUSES:
+            return False
+    return True
+
+
+def ttl_for(
+    path: str,
+    params: Optional[Dict[str, Any]],
+    data: Dict[str, Any],
+    finished: bool = False,
+) -> Optional[int]:
+    """
+    Decide cuánto vive una respuesta en caché según el endpoint y su contenido.
+    finished: el llamante sabe que el partido pedido ya ha terminado (la
+    respuesta de /fixtures/statistics no trae el estado).
+    """
+    params = params or {}
+    response = data.get("response")
+
+    if path == "/fixtures/statistics":
+        # Stats de un partido terminado no cambian nunca. Un partido en juego
+        # también trae las 2 entradas, pero parciales: TTL corto
+        complete = isinstance(response, list) and len(response) >= 2
+        return None if finished and complete else DEFAULT_TTL
+
+    if path == "/fixtures":
+        if ("id" in params or "ids" in params) and _all_finished(response):
+            return None
+        if "last" in params:
+            return HOUR
+
+    return ENDPOINT_TTLS.get(path, DEFAULT_TTL)
+
+
+def _get_conn() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        settings.api_cache_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(settings.api_cache_path, check_same_thread=False)
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS api_cache (
+                key TEXT PRIMARY KEY,
+                path TEXT NOT NULL,
+                body TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_api_cache_last_access ON api_cache(last_access)")
+        conn.commit()
+        _conn = conn
+    return _conn
+
+
+def cache_get(key: str) -> Optional[Dict[str, Any]]:
+    global _hits, _misses
+    if not settings.api_cache_enabled:
+        return None
+
+    now = time.time()
+    with _lock:
+        try:
+            conn = _get_conn()
+            row = conn.execute(
+                "SELECT body, expires_at FROM api_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (row[1] is not None and row[1] < now):
+                _misses += 1
+                return None
+            conn.execute("UPDATE api_cache SET last_access = ? WHERE key = ?", (now, key))
+            conn.commit()
+            _hits += 1
+        except sqlite3.Error as e:
+            print(f"[CACHE] Error leyendo caché: {e}")
+            _misses += 1
+            return None
+
+    return json.loads(row[0])
+
+
+def cache_put(
+    key: str,
+    path: str,
+    params: Optional[Dict[str, Any]],
+    data: Dict[str, Any],
+    finished: bool = False,
+) -> None:
+    if not settings.api_cache_enabled:
+        return
+
+    ttl = ttl_for(path, params, data, finished)
+    now = time.time()
+    expires_at = None if ttl is None else now + ttl
+
+    with _lock:
+        try:
+            conn = _get_conn()
+            conn.execute(
+                "INSERT OR REPLACE INTO api_cache(key, path, body, created_at, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, path, json.dumps(data, ensure_ascii=False), now, expires_at, now),
+            )
+            # LRU: nos quedamos con las N entradas usadas más recientemente
+            conn.execute(
+                "DELETE FROM api_cache WHERE key IN ("
+                "SELECT key FROM api_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (settings.api_cache_max_entries,),
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"[CACHE] Error escribiendo caché: {e}")
+
+
+def get_cache_stats() -> Dict[str, int]:
+    return {"hits": _hits, "misses": _misses}
+
+
+def reset_cache_stats() -> None:
+    global _hits, _misses
+    with _lock:
+        _hits = 0
+        _misses = 0
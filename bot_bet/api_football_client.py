@@ -1,29 +1,212 @@
-from typing import Any, Dict, Optional, List
+import asyncio
+import copy
+import threading
+from concurrent.futures import Future
+from typing import Any, Dict, Optional, List, Tuple
 import requests
+from .api_cache import cache_get, cache_put, make_key
+from .api_quota import CRITICAL, get_quota_scheduler, max_wait_for
 from .config import settings
+from .metrics import params_hash, span
+from .http_session import get_session, get_timeout
 
 API_FOOTBALL_BASE_URL = "https://v3.football.api-sports.io"
 
+# Contador de llamadas HTTP salientes a API-Football (por ejecución)
+_http_calls = 0
+_http_calls_lock = threading.Lock()
+
+# Single-flight: peticiones en curso por clave (path + params normalizados).
+# Compartida por la versión síncrona y la async: si dos llamadas piden lo mismo
+# a la vez, solo sale una petición y la otra espera su resultado.
+_inflight: Dict[str, Future] = {}
+_inflight_lock = threading.Lock()
+
 class ApiFootballError(Exception):
     pass
 
+class ApiQuotaExceeded(ApiFootballError):
+    """
+    Sin cuota de API-Football para esta llamada (diaria agotada, reserva para
+    llamadas críticas o sin token por minuto a tiempo).
+    """
+    pass
+
+def get_http_call_count() -> int:
+    """
+    Devuelve cuántas peticiones HTTP se han hecho a API-Football desde el último reset.
+    """
+    return _http_calls
+
+def reset_http_call_count() -> None:
+    global _http_calls
+    with _http_calls_lock:
+        _http_calls = 0
+
+def _count_http_call() -> None:
+    global _http_calls
+    with _http_calls_lock:
+        _http_calls += 1
+
 def _api_football_headers() -> Dict[str, str]:
     return {
         "x-apisports-key": settings.api_football_key,
     }
 
-def api_football_get(path: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+def _join_inflight(key: str) -> Tuple[Future, bool]:
+    """
+    Devuelve (future, es_lider). El líder hace la petición; el resto espera el future.
+    """
+    with _inflight_lock:
+        fut = _inflight.get(key)
+        if fut is not None:
+            return fut, False
+        fut = Future()
+        _inflight[key] = fut
+        return fut, True
+
+
+def _finish_inflight(key: str, fut: Future, data: Optional[Dict[str, Any]], error: Optional[BaseException]) -> None:
+    with _inflight_lock:
+        _inflight.pop(key, None)
+    if error is not None:
+        fut.set_exception(error)
+    else:
+        fut.set_result(data)
+
+
+def api_football_get(
+    path: str,
+    params: Optional[Dict[str, Any]] = None,
+    use_cache: bool = True,
+    priority: int = CRITICAL,
+    finished: bool = False,
+) -> Dict[str, Any]:
+    """
+    GET a API-Football. Primero mira la caché persistente (ver api_cache.py);
+    si no hay entrada válida, hace la petición y guarda la respuesta.
+    Peticiones idénticas simultáneas se agrupan en una sola.
+
+    priority: CRITICAL u OPTIONAL (ver api_quota.py). Si no hay cuota lanza
+    ApiQuotaExceeded.
+    finished: la petición es de un partido ya terminado (ver api_cache.ttl_for).
+    """
+    cache_key = make_key(path, params)
+    fut, leader = _join_inflight(cache_key)
+    if not leader:
+        # Copia: cada llamante puede modificar su respuesta sin afectar a los demás
+        return copy.deepcopy(fut.result())
+
+    try:
+        data = _api_football_get_uncoalesced(path, params, use_cache, cache_key, priority, finished)
+    except BaseException as e:
+        _finish_inflight(cache_key, fut, None, e)
+        raise
+    _finish_inflight(cache_key, fut, data, None)
+    return data
+
+
+async def api_football_get_async(
+    path: str,
+    params: Optional[Dict[str, Any]] = None,
+    use_cache: bool = True,
+    priority: int = CRITICAL,
+    finished: bool = False,
+) -> Dict[str, Any]:
+    """
+    Versión asyncio de api_football_get (misma caché y misma tabla single-flight).
+    La petición se hace en un hilo del pool por defecto, así el event loop no se bloquea.
+    """
+    cache_key = make_key(path, params)
+    fut, leader = _join_inflight(cache_key)
+    if not leader:
+        return copy.deepcopy(await asyncio.wrap_future(fut))
+
+    try:
+        data = await asyncio.to_thread(
+            _api_football_get_uncoalesced, path, params, use_cache, cache_key, priority, finished
+        )
+    except BaseException as e:
+        _finish_inflight(cache_key, fut, None, e)
+        raise
+    _finish_inflight(cache_key, fut, data, None)
+    return data
+
+
+def _api_football_get_uncoalesced(
+    path: str,
+    params: Optional[Dict[str, Any]],
+    use_cache: bool,
+    cache_key: str,
+    priority: int = CRITICAL,
+    finished: bool = False,
+) -> Dict[str, Any]:
+    with span("api_football_get", endpoint=path, params_hash=params_hash(params)) as s:
+        if use_cache:
+            cached = cache_get(cache_key)
+            if cached is not None:
+                s.set(cache="hit")
+                return cached
+        s.set(cache="miss")
+
+        # Un reintento si el servidor corta por ritmo pese al token (429 o
+        # errors.rateLimit: otro cliente con la misma clave, reloj desajustado...)
+        for attempt in range(2):
+            data, nbytes = _request_with_quota(path, params, priority)
+            s.set(bytes=nbytes)
+            errors = data.get("errors")
+            if isinstance(errors, dict) and "rateLimit" in errors and attempt == 0:
+                get_quota_scheduler().on_rate_limited()
+                continue
+            break
+
+    errors = data.get("errors")
+    if isinstance(errors, dict):
+        if "requests" in errors:
+            get_quota_scheduler().on_daily_exhausted()
+            raise ApiQuotaExceeded(f"Cuota diaria de API-Football agotada: {errors['requests']}")
+        if "rateLimit" in errors:
+            raise ApiQuotaExceeded(f"Límite por minuto de API-Football: {errors['rateLimit']}")
+
+    # API-Football devuelve 200 con "errors" cuando falla: no cachear
+    if use_cache and not errors:
+        cache_put(cache_key, path, params, data, finished)
+
+    return data
+
+
+def _request_with_quota(path: str, params: Optional[Dict[str, Any]], priority: int) -> Tuple[Dict[str, Any], int]:
+    """
+    Una petición de red (con su token de cuota). Devuelve (JSON, bytes recibidos).
+    """
+    scheduler = get_quota_scheduler()
+    with span("api_quota_wait", endpoint=path):
+        granted = scheduler.acquire(priority, max_wait=max_wait_for(priority))
+    if not granted:
+        status = scheduler.status()
+        raise ApiQuotaExceeded(
+            f"Sin cuota para {path} (prioridad {'crítica' if priority == CRITICAL else 'opcional'}; "
+            f"restantes hoy: {status.daily_remaining}, por minuto: {status.minute_available:.1f})"
+        )
+
     url = f"{API_FOOTBALL_BASE_URL}{path}"
+    _count_http_call()
     try:
-        resp = requests.get(
+        resp = get_session().get(
             url,
             headers=_api_football_headers(),
             params=params or {},
-            timeout=10,
+            timeout=get_timeout(),
         )
     except requests.RequestException as e:
         raise ApiFootballError(f"Error de red llamando a API-Football: {e}")
 
+    scheduler.update_from_headers(resp.headers)
+
+    if resp.status_code == 429:
+        # Sin reintento en urllib3 (http_session.py): se trata como
+        # errors.rateLimit y el reintento pasa por la cuota
+        return {"response": [], "errors": {"rateLimit": f"HTTP 429: {resp.text[:300]}"}}, len(resp.content)
     if resp.status_code != 200:
         raise ApiFootballError(f"Error API-Football {resp.status_code}: {resp.text[:300]}")
 
@@ -33,19 +216,26 @@ def api_football_get(path: str, params: Optional[Dict[str, Any]] = None) -> Dict
     if not isinstance(data, dict) or "response" not in data:
         raise ApiFootballError(f"Respuesta inesperada de API-Football: {data}")
 
-    return data
+    return data, len(resp.content)
 
-def get_standings(league_id: int, season: int) -> List[Dict[str, Any]]:
-    """
-    Devuelve la tabla de clasificación actual (posición, puntos, forma, etc.)
-    """
-    data = api_football_get("/standings", {"league": league_id, "season": season})
+def _extract_standings(data: Dict[str, Any]) -> List[Dict[str, Any]]:
     try:
         standings = data["response"][0]["league"]["standings"][0]
         return standings
     except (KeyError, IndexError, TypeError) as e:
         raise ApiFootballError(f"No se pudo extraer clasificación: {e}")
 
+def get_standings(league_id: int, season: int) -> List[Dict[str, Any]]:
+    """
+    Devuelve la tabla de clasificación actual (posición, puntos, forma, etc.)
+    """
+    data = api_football_get("/standings", {"league": league_id, "season": season})
+    return _extract_standings(data)
+
+async def get_standings_async(league_id: int, season: int, use_cache: bool = True) -> List[Dict[str, Any]]:
+    data = await api_football_get_async("/standings", {"league": league_id, "season": season}, use_cache=use_cache)
+    return _extract_standings(data)
+
 def get_last_matches(team_id: int, season: int, league_id: int, last_n: int = 5) -> List[Dict[str, Any]]:
     """
     Devuelve los últimos N partidos de un equipo en una liga y temporada.
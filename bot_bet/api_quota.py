@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Mapping, Optional
+
+from .config import settings
+
+
+# =========================
+# Cuota de API-Football (token bucket)
+# =========================
+#
+# API-Football limita peticiones por minuto y por día. Antes de cada petición
+# de red (no en aciertos de caché) se pide un token:
+# - El cubo se rellena a ritmo constante (límite por minuto / 60 por segundo)
+#   y se corrige con las cabeceras de cada respuesta:
+#     X-RateLimit-Limit / X-RateLimit-Remaining                 -> por minuto
+#     x-ratelimit-requests-limit / x-ratelimit-requests-remaining -> por día
+# - Las llamadas CRITICAL (partidos, stats de equipo) pasan antes que las
+#   OPTIONAL (jugadores...), que además no pueden gastar la reserva diaria
+#   (API_DAILY_RESERVE) y esperan poco: si no hay token, se rechazan y el
+#   pipeline sigue sin ese dato.
+
+CRITICAL = 0
+OPTIONAL = 1
+
+
+@dataclass
+class QuotaStatus:
+    minute_limit: int
+    minute_available: float
+    daily_limit: Optional[int]  # None hasta la primera respuesta con cabeceras
+    daily_remaining: Optional[int]
+    daily_reserve: int
+    waited_seconds: float  # tiempo total esperando token
+    rejected: int  # llamadas que no han conseguido token
+
+    @property
+    def optional_allowed(self) -> bool:
+        return self.daily_remaining is None or self.daily_remaining > self.daily_reserve
+
+
+def _header_int(headers: Mapping[str, str], name: str) -> Optional[int]:
+    value = headers.get(name)
+    if value is None:
+        return None
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+class QuotaScheduler:
+    def __init__(
+        self,
+        per_minute: int,
+        daily_reserve: int,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.minute_limit = max(per_minute, 1)
+        self.daily_reserve = daily_reserve
+        self.daily_limit: Optional[int] = None
+        self.daily_remaining: Optional[int] = None
+        self._clock = clock
+        self._tokens = float(self.minute_limit)
+        self._updated = clock()
+        self._critical_waiting = 0
+        self._cond = threading.Condition()
+        self.waited_seconds = 0.0
+        self.rejected = 0
+
+    def _refill(self, now: float) -> None:
+        rate = self.minute_limit / 60.0
+        self._tokens = min(float(self.minute_limit), self._tokens + (now - self._updated) * rate)
+        self._updated = now
+
+    def _daily_blocked(self, priority: int) -> bool:
+        if self.daily_remaining is None:
+            return False
+        floor = 0 if priority == CRITICAL else self.daily_reserve
+        return self.daily_remaining <= floor
+
+    def acquire(self, priority: int = CRITICAL, max_wait: float = 0.0) -> bool:
+        """
+        Consume un token, esperando como mucho max_wait segundos. Devuelve False
+        si no hay cuota (diaria agotada o sin token a tiempo).
+        """
+        start = self._clock()
+        deadline = start + max_wait
+        with self._cond:
+            if priority == CRITICAL:
+                self._critical_waiting += 1
+            try:
+                while True:
+                    if self._daily_blocked(priority):
+                        self.rejected += 1
+                        return False
+
+                    now = self._clock()
+                    self._refill(now)
+                    # Las opcionales ceden el turno mientras haya críticas esperando
+                    if self._tokens >= 1 and (priority == CRITICAL or self._critical_waiting == 0):
+                        self._tokens -= 1
+                        if self.daily_remaining is not None:
+                            self.daily_remaining -= 1
+                        self.waited_seconds += now - start
+                        return True
+
+                    if now >= deadline:
+                        self.rejected += 1
+                        self.waited_seconds += now - start
+                        return False
+
+                    next_token = max((1 - self._tokens) * 60.0 / self.minute_limit, 0.01)
+                    self._cond.wait(min(deadline - now, next_token))
+            finally:
+                if priority == CRITICAL:
+                    self._critical_waiting -= 1
+                    self._cond.notify_all()
+
+    def update_from_headers(self, headers: Mapping[str, str]) -> None:
+        """
+        Ajusta el cubo con lo que dice el servidor (manda sobre la estimación local).
+        """
+        minute_limit = _header_int(headers, "X-RateLimit-Limit")
+        minute_remaining = _header_int(headers, "X-RateLimit-Remaining")
+        daily_limit = _header_int(headers, "x-ratelimit-requests-limit")
+        daily_remaining = _header_int(headers, "x-ratelimit-requests-remaining")
+
+        with self._cond:
+            self._refill(self._clock())
+            if minute_limit:
+                self.minute_limit = minute_limit
+            if minute_remaining is not None:
+                self._tokens = min(self._tokens, float(minute_remaining))
+            if daily_limit is not None:
+                self.daily_limit = daily_limit
+            if daily_remaining is not None:
+                self.daily_remaining = daily_remaining
+            self._cond.notify_all()
+
+    def on_rate_limited(self) -> None:
+        """
+        El servidor ha cortado por ritmo (429 o errors.rateLimit): vaciamos el cubo.
+        """
+        with self._cond:
+            self._refill(self._clock())
+            self._tokens = min(self._tokens, 0.0)
+
+    def on_daily_exhausted(self) -> None:
+        with self._cond:
+            self.daily_remaining = 0
+
+    def status(self) -> QuotaStatus:
+        with self._cond:
+            self._refill(self._clock())
+            return QuotaStatus(
+                minute_limit=self.minute_limit,
+                minute_available=self._tokens,
+                daily_limit=self.daily_limit,
+                daily_remaining=self.daily_remaining,
+                daily_reserve=self.daily_reserve,
+                waited_seconds=self.waited_seconds,
+                rejected=self.rejected,
+            )
+
+
+_scheduler: Optional[QuotaScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_quota_scheduler() -> QuotaScheduler:
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = QuotaScheduler(
+                    per_minute=settings.api_rate_per_minute,
+                    daily_reserve=settings.api_daily_reserve,
+                )
+    return _scheduler
+
+
+def get_quota_status() -> QuotaStatus:
+    """
+    Cuota restante conocida (por minuto y por día) para que el pipeline decida
+    si pide datos opcionales.
+    """
+    return get_quota_scheduler().status()
+
+
+def max_wait_for(priority: int) -> float:
+    return settings.api_quota_max_wait if priority == CRITICAL else settings.api_quota_optional_max_wait
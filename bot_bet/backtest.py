@@ -0,0 +1,482 @@
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import sqlite3
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .api_football_client import api_football_get
+from .config import DATA_DIR, settings
+from .fixtures_store import FINISHED_STATUSES
+from .football_db import football_db
+from .parallel import parallel_map
+from .predictions_db import connect_predictions_db
+from .referee_cards_stats import cards_from_statistics
+
+
+# =========================
+# Backtest: picks guardados vs resultados reales
+# =========================
+#
+# 1) Se leen los picks de prediction_matches (goles, tarjetas y estrella),
+#    con predictions.db en solo lectura: el bot o la web la migran al abrirla.
+# 2) Se resuelven los resultados finales (goles y tarjetas) de cada partido:
+#    primero la tabla fixture_results, luego el almacén local de partidos y,
+#    para lo que falte, /fixtures?ids= (hasta 20 partidos por llamada). Los
+#    que aún no han empezado no se piden (hora de inicio del almacén o de
+#    fixture_pending, donde se apuntan los no terminados que devuelve la API).
+#    Un partido terminado sin estadística queda en fixture_results con las
+#    tarjetas a NULL y no se vuelve a pedir; si la sincronización del almacén
+#    trae luego la estadística, las tarjetas se completan desde ahí.
+# 3) La corrección y los agregados se calculan con NumPy sobre todos los picks
+#    a la vez: acierto por mercado y calibración por tramo de confianza.
+
+DEFAULT_PREDICTIONS_DB = DATA_DIR / "predictions.db"
+
+MARKETS = ("goles", "tarjetas", "estrella")
+
+# Tramos de confianza: [0, 0.5), [0.5, 0.6), ..., [0.9, 1.0]
+CONF_EDGES = np.array([0.0, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0])
+
+# /fixtures admite como máximo 20 ids por llamada
+FIXTURE_IDS_PER_CALL = 20
+
+# Un partido sin terminar (aplazado, en juego...) se vuelve a pedir como pronto
+# pasadas estas horas
+PENDING_RECHECK_HOURS = 2
+
+_PICK_RE = re.compile(r"^\s*(más|menos) de (\d+(?:[.,]\d+)?) (goles|tarjetas)", re.IGNORECASE)
+
+_METRIC_GOALS, _METRIC_CARDS = 0, 1
+
+
+@lru_cache(maxsize=None)
+def parse_pick(text: str) -> Optional[Tuple[int, float, int]]:
+    """
+    'Más de 1.5 goles' -> (+1, 1.5, goles); 'Menos de 3.5 goles' -> (-1, 3.5, goles);
+    'Más de 4.5 tarjetas totales' -> (+1, 4.5, tarjetas). None si no es una línea over/under.
+    """
+    m = _PICK_RE.match(text or "")
+    if not m:
+        return None
+    side = 1 if m.group(1).lower() == "más" else -1
+    line = float(m.group(2).replace(",", "."))
+    metric = _METRIC_GOALS if m.group(3).lower() == "goles" else _METRIC_CARDS
+    return side, line, metric
+
+
+# =========================
+# Picks guardados
+# =========================
+
+@dataclass
+class StoredPicks:
+    day: np.ndarray  # str (object)
+    fixture_id: np.ndarray  # int64
+    market: np.ndarray  # str (object): goles / tarjetas / estrella
+    pick: np.ndarray  # str (object)
+    conf: np.ndarray  # float64
+
+    def __len__(self) -> int:
+        return len(self.fixture_id)
+
+
+def _check_migrated(conn: sqlite3.Connection, db_path: Path) -> None:
+    tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    if "prediction_matches" not in tables:
+        raise ValueError(
+            f"{db_path} no tiene prediction_matches (versión anterior): "
+            "ejecuta el bot o la web una vez para migrarla"
+        )
+
+
+def load_stored_picks(
+    db_path: Path = DEFAULT_PREDICTIONS_DB,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+) -> StoredPicks:
+    """
+    Picks guardados entre date_from y date_to. Solo lee predictions.db (no la
+    crea ni la migra): ValueError si no existe o aún no está migrada.
+    """
+    if not Path(db_path).is_file():
+        raise ValueError(f"No existe {db_path}")
+
+    clauses, params = ["fixture_id IS NOT NULL"], []
+    if date_from:
+        clauses.append("day >= ?")
+        params.append(date_from)
+    if date_to:
+        clauses.append("day <= ?")
+        params.append(date_to)
+
+    conn = connect_predictions_db(db_path, read_only=True)
+    try:
+        _check_migrated(conn, db_path)
+        rows = conn.execute(
+            f"""
+            SELECT day, fixture_id, 'goles', goals_pick, goals_conf FROM prediction_matches
+            WHERE {" AND ".join(clauses)} AND goals_pick IS NOT NULL
+            UNION ALL
+            SELECT day, fixture_id, 'tarjetas', cards_pick, cards_conf FROM prediction_matches
+            WHERE {" AND ".join(clauses)} AND cards_pick IS NOT NULL
+            UNION ALL
+            SELECT day, fixture_id, 'estrella', star_pick, star_conf FROM prediction_matches
+            WHERE {" AND ".join(clauses)} AND star_pick IS NOT NULL
+            """,
+            params * 3,
+        ).fetchall()
+    finally:
+        conn.close()
+
+    columns = list(zip(*rows)) if rows else [(), (), (), (), ()]
+    return StoredPicks(
+        day=np.array(columns[0], dtype=object),
+        fixture_id=np.array(columns[1], dtype=np.int64),
+        market=np.array(columns[2], dtype=object),
+        pick=np.array(columns[3], dtype=object),
+        conf=np.array([c if c is not None else 0.0 for c in columns[4]], dtype=np.float64),
+    )
+
+
+# =========================
+# Resultados finales (caché local)
+# =========================
+
+def _result_row(item: Dict[str, Any]) -> Optional[Tuple[Any, ...]]:
+    fixture = item.get("fixture", {}) or {}
+    status = (fixture.get("status", {}) or {}).get("short")
+    if fixture.get("id") is None or status not in FINISHED_STATUSES:
+        return None
+
+    goals = item.get("goals", {}) or {}
+    cards = cards_from_statistics(item.get("statistics") or [])
+    return (
+        fixture["id"],
+        status,
+        goals.get("home"),
+        goals.get("away"),
+        cards["yellow"] if cards else None,
+        cards["red"] if cards else None,
+    )
+
+
+def _fetch_fixtures_by_ids(ids: Sequence[int]) -> List[Dict[str, Any]]:
+    data = api_football_get("/fixtures", {"ids": "-".join(str(i) for i in ids)})
+    return data.get("response", []) or []
+
+
+def _chunks(items: Sequence[int], size: int) -> Iterable[Sequence[int]]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _store_results(rows: List[Tuple[Any, ...]]) -> None:
+    if not rows:
+        return
+    with football_db() as conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO fixture_results(fixture_id, status, home_goals, away_goals, yellow, red) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+
+
+def _read_results(fixture_ids: Sequence[int]) -> Dict[int, Tuple[Any, ...]]:
+    out: Dict[int, Tuple[Any, ...]] = {}
+    with football_db() as conn:
+        for chunk in _chunks(list(fixture_ids), 500):
+            for r in conn.execute(
+                f"SELECT fixture_id, home_goals, away_goals, yellow, red FROM fixture_results "
+                f"WHERE fixture_id IN ({','.join('?' * len(chunk))})",
+                chunk,
+            ):
+                out[r["fixture_id"]] = (r["home_goals"], r["away_goals"], r["yellow"], r["red"])
+    return out
+
+
+def _import_from_warehouse(fixture_ids: Sequence[int]) -> None:
+    rows = []
+    with football_db() as conn:
+        for chunk in _chunks(list(fixture_ids), 500):
+            for r in conn.execute(
+                f"SELECT fixture_id, status, home_goals, away_goals, statistics_json FROM fixtures "
+                f"WHERE fixture_id IN ({','.join('?' * len(chunk))})",
+                chunk,
+            ):
+                row = _result_row({
+                    "fixture": {"id": r["fixture_id"], "status": {"short": r["status"]}},
+                    "goals": {"home": r["home_goals"], "away": r["away_goals"]},
+                    "statistics": json.loads(r["statistics_json"]) if r["statistics_json"] else None,
+                })
+                if row is not None:
+                    rows.append(row)
+    _store_results(rows)
+
+
+def _parse_utc(value: Optional[str]) -> Optional[datetime]:
+    try:
+        dt = datetime.fromisoformat(value or "")
+    except ValueError:
+        return None
+    return (dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)).astimezone(timezone.utc)
+
+
+def _not_due(fixture_ids: Sequence[int]) -> set:
+    """
+    Partidos que no merece la pena pedir todavía: empiezan en el futuro (según
+    el almacén local o fixture_pending) o se comprobaron sin terminar hace menos
+    de PENDING_RECHECK_HOURS.
+    """
+    now = datetime.now(timezone.utc)
+    skip = set()
+    with football_db() as conn:
+        for chunk in _chunks(list(fixture_ids), 500):
+            marks = ",".join("?" * len(chunk))
+            for r in conn.execute(f"SELECT fixture_id, kickoff FROM fixtures WHERE fixture_id IN ({marks})", chunk):
+                kickoff = _parse_utc(r["kickoff"])
+                if kickoff is not None and kickoff > now:
+                    skip.add(r["fixture_id"])
+            for r in conn.execute(
+                f"SELECT fixture_id, kickoff, checked_at FROM fixture_pending WHERE fixture_id IN ({marks})", chunk
+            ):
+                kickoff = _parse_utc(r["kickoff"])
+                checked = _parse_utc(r["checked_at"])
+                if (kickoff is not None and kickoff > now) or (
+                    checked is not None and now - checked < timedelta(hours=PENDING_RECHECK_HOURS)
+                ):
+                    skip.add(r["fixture_id"])
+    return skip
+
+
+def _store_pending(items: List[Dict[str, Any]]) -> None:
+    now = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    pending, finished = [], []
+    for item in items:
+        fixture = item.get("fixture", {}) or {}
+        status = (fixture.get("status", {}) or {}).get("short")
+        if fixture.get("id") is None:
+            continue
+        if status in FINISHED_STATUSES:
+            finished.append((fixture["id"],))
+        else:
+            pending.append((fixture["id"], status, fixture.get("date"), now))
+    with football_db() as conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO fixture_pending(fixture_id, status, kickoff, checked_at) VALUES (?, ?, ?, ?)",
+            pending,
+        )
+        conn.executemany("DELETE FROM fixture_pending WHERE fixture_id = ?", finished)
+
+
+def resolve_results(fixture_ids: Iterable[int], fetch_missing: bool = True) -> Dict[int, Tuple[Any, ...]]:
+    """
+    fixture_id -> (goles local, goles visitante, amarillas, rojas) de los partidos
+    terminados. Las tarjetas son None si el partido aún no tiene estadística.
+    """
+    wanted = sorted({int(i) for i in fixture_ids})
+    results = _read_results(wanted)
+
+    # Sin resultado o sin tarjetas: se completan desde el almacén local
+    without_cards = [i for i in wanted if i not in results or results[i][2] is None]
+    if without_cards:
+        _import_from_warehouse(without_cards)
+        results = _read_results(wanted)
+
+    # A la API solo van los que no tienen resultado: los terminados sin
+    # estadística ya están resueltos (tarjetas a NULL)
+    todo = [i for i in wanted if i not in results]
+    if fetch_missing and todo:
+        skip = _not_due(todo)
+        todo = [i for i in todo if i not in skip]
+        if skip:
+            print(f"[INFO] Backtest: {len(skip)} partidos aún sin jugar, no se piden")
+    if fetch_missing and todo:
+        print(f"[INFO] Backtest: pidiendo {len(todo)} resultados a API-Football")
+        batches = parallel_map(
+            _fetch_fixtures_by_ids,
+            list(_chunks(todo, FIXTURE_IDS_PER_CALL)),
+            max_workers=settings.pipeline_workers,
+        )
+        items = [item for batch in batches for item in batch]
+        _store_results([row for row in map(_result_row, items) if row is not None])
+        _store_pending(items)
+        results = _read_results(wanted)
+
+    return results
+
+
+# =========================
+# Corrección y agregados (vectorizados)
+# =========================
+
+@dataclass
+class BucketStats:
+    lo: float
+    hi: float
+    picks: int
+    hits: int
+    hit_rate: float
+    avg_conf: float
+
+
+@dataclass
+class MarketReport:
+    market: str
+    picks: int  # picks con resultado
+    hits: int
+    hit_rate: float
+    brier: float
+    buckets: List[BucketStats]
+
+
+@dataclass
+class BacktestReport:
+    total_picks: int
+    graded: int
+    pending: int  # sin resultado todavía (o sin estadística de tarjetas)
+    unparsed: int  # picks que no son una línea over/under
+    markets: List[MarketReport]
+
+
+def grade_picks(picks: StoredPicks, results: Dict[int, Tuple[Any, ...]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Devuelve (hit, graded, parsed) como arrays booleanos alineados con picks.
+    """
+    n = len(picks)
+    if n == 0:
+        empty = np.zeros(0, dtype=bool)
+        return empty, empty, empty
+
+    # Cada texto distinto se parsea una sola vez
+    uniq, inverse = np.unique(picks.pick.astype(str), return_inverse=True)
+    parsed_uniq = [parse_pick(t) for t in uniq]
+    ok_u = np.array([p is not None for p in parsed_uniq])
+    side_u = np.array([p[0] if p else 0 for p in parsed_uniq], dtype=np.int8)
+    line_u = np.array([p[1] if p else np.nan for p in parsed_uniq], dtype=np.float64)
+    metric_u = np.array([p[2] if p else -1 for p in parsed_uniq], dtype=np.int8)
+
+    parsed = ok_u[inverse]
+    side, line, metric = side_u[inverse], line_u[inverse], metric_u[inverse]
+
+    # Resultados alineados por partido (NaN si no hay)
+    fids, fid_inverse = np.unique(picks.fixture_id, return_inverse=True)
+    res = np.array(
+        [results.get(int(f), (None, None, None, None)) for f in fids], dtype=np.float64
+    ).reshape(len(fids), 4)
+    goals = (res[:, 0] + res[:, 1])[fid_inverse]
+    cards = (res[:, 2] + res[:, 3])[fid_inverse]
+
+    actual = np.where(metric == _METRIC_GOALS, goals, cards)
+    graded = parsed & ~np.isnan(actual)
+    hit = graded & np.where(side > 0, actual > line, actual < line)
+    return hit, graded, parsed
+
+
+def _market_report(market: str, conf: np.ndarray, hit: np.ndarray) -> MarketReport:
+    n = len(conf)
+    hits = int(hit.sum())
+    outcome = hit.astype(np.float64)
+
+    bucket = np.clip(np.digitize(conf, CONF_EDGES[1:-1]), 0, len(CONF_EDGES) - 2)
+    nb = len(CONF_EDGES) - 1
+    counts = np.bincount(bucket, minlength=nb)
+    bucket_hits = np.bincount(bucket, weights=outcome, minlength=nb)
+    conf_sums = np.bincount(bucket, weights=conf, minlength=nb)
+
+    buckets = [
+        BucketStats(
+            lo=float(CONF_EDGES[i]),
+            hi=float(CONF_EDGES[i + 1]),
+            picks=int(counts[i]),
+            hits=int(bucket_hits[i]),
+            hit_rate=float(bucket_hits[i] / counts[i]),
+            avg_conf=float(conf_sums[i] / counts[i]),
+        )
+        for i in range(nb)
+        if counts[i]
+    ]
+
+    return MarketReport(
+        market=market,
+        picks=n,
+        hits=hits,
+        hit_rate=hits / n if n else 0.0,
+        brier=float(np.mean((conf - outcome) ** 2)) if n else 0.0,
+        buckets=buckets,
+    )
+
+
+def run_backtest(
+    db_path: Path = DEFAULT_PREDICTIONS_DB,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    fetch_missing: bool = True,
+) -> BacktestReport:
+    picks = load_stored_picks(db_path, date_from, date_to)
+    results = resolve_results(picks.fixture_id.tolist(), fetch_missing=fetch_missing) if len(picks) else {}
+    hit, graded, parsed = grade_picks(picks, results)
+
+    markets = [
+        _market_report(market, picks.conf[graded & (picks.market == market)], hit[graded & (picks.market == market)])
+        for market in MARKETS
+    ]
+    return BacktestReport(
+        total_picks=len(picks),
+        graded=int(graded.sum()),
+        pending=int((parsed & ~graded).sum()),
+        unparsed=int((~parsed).sum()),
+        markets=markets,
+    )
+
+
+def format_report(report: BacktestReport) -> str:
+    lines = [
+        f"Picks: {report.total_picks} | corregidos: {report.graded} | "
+        f"pendientes: {report.pending} | no evaluables: {report.unparsed}",
+    ]
+    for m in report.markets:
+        if not m.picks:
+            continue
+        lines.append("")
+        lines.append(
+            f"== {m.market}: {m.hits}/{m.picks} aciertos ({m.hit_rate:.1%}) | Brier {m.brier:.3f}"
+        )
+        lines.append("   confianza      picks   acierto   conf. media")
+        for b in m.buckets:
+            lines.append(
+                f"   [{b.lo:.1f}, {b.hi:.1f}{']' if b.hi >= 1.0 else ')'}   "
+                f"{b.picks:6d}   {b.hit_rate:6.1%}     {b.avg_conf:.2f}"
+            )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Backtest de los picks guardados en predictions.db")
+    parser.add_argument("--db", type=Path, default=DEFAULT_PREDICTIONS_DB, help="Ruta a predictions.db")
+    parser.add_argument("--from", dest="date_from", help="Primer día (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="date_to", help="Último día (YYYY-MM-DD)")
+    parser.add_argument(
+        "--no-fetch",
+        action="store_true",
+        help="No pedir a la API los resultados que falten (solo datos locales)",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        report = run_backtest(args.db, args.date_from, args.date_to, fetch_missing=not args.no_fetch)
+    except ValueError as e:
+        print(f"[ERROR] {e}")
+        raise SystemExit(1)
+    print(format_report(report))
+
+
+if __name__ == "__main__":
+    main()
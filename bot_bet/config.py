@@ -1,8 +1,13 @@
 import os
+from datetime import date
+from pathlib import Path
 from dotenv import load_dotenv
 
 load_dotenv()
 
+BASE_DIR = Path(__file__).resolve().parents[1]
+DATA_DIR = BASE_DIR / "data"
+
 class Settings:
     def __init__(self) -> None:
         self.telegram_bot_token = os.getenv("TELEGRAM_BOT_TOKEN")
@@ -12,6 +17,55 @@ class Settings:
         self.api_football_league_id = int(os.getenv("API_FOOTBALL_LEAGUE_ID", "140"))
         self.api_football_season = int(os.getenv("API_FOOTBALL_SEASON", "2025"))
 
+        # Caché persistente de respuestas de API-Football
+        self.api_cache_enabled = os.getenv("API_CACHE_ENABLED", "1") not in ("0", "false", "False")
+        self.api_cache_path = Path(os.getenv("API_CACHE_PATH", str(DATA_DIR / "api_cache.db")))
+        self.api_cache_max_entries = int(os.getenv("API_CACHE_MAX_ENTRIES", "5000"))
+
+        # Transporte HTTP compartido (pool de conexiones + reintentos)
+        self.http_connect_timeout = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+        self.http_read_timeout = float(os.getenv("HTTP_READ_TIMEOUT", "15"))
+        self.http_max_retries = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+        self.http_backoff_factor = float(os.getenv("HTTP_BACKOFF_FACTOR", "0.5"))
+        self.http_pool_size = int(os.getenv("HTTP_POOL_SIZE", "16"))
+        # live / record / replay (ver http_replay.py); main.py --record/--replay lo cambian
+        self.http_mode = os.getenv("BOT_BET_HTTP_MODE", "live")
+        self.http_cassette_path = Path(os.getenv("HTTP_CASSETTE_PATH", str(DATA_DIR / "cassettes" / "api.jsonl.gz")))
+        # Latencia simulada en replay: segundos por respuesta o "recorded"
+        self.http_replay_latency = os.getenv("HTTP_REPLAY_LATENCY", "0")
+        # Día de ejecución fijo (YYYY-MM-DD); el replay lo toma del cassette
+        self.run_date = os.getenv("BOT_BET_RUN_DATE") or None
+
+        # Cuota de API-Football (ver api_quota.py). El límite por minuto se corrige
+        # con las cabeceras x-ratelimit-*; la reserva diaria queda para llamadas críticas
+        self.api_rate_per_minute = int(os.getenv("API_RATE_PER_MINUTE", "300"))
+        self.api_daily_reserve = int(os.getenv("API_DAILY_RESERVE", "50"))
+        self.api_quota_max_wait = float(os.getenv("API_QUOTA_MAX_WAIT", "90"))
+        self.api_quota_optional_max_wait = float(os.getenv("API_QUOTA_OPTIONAL_MAX_WAIT", "5"))
+
+        # BD local de datos de fútbol (índice de árbitros, partidos...)
+        self.football_db_path = Path(os.getenv("FOOTBALL_DB_PATH", str(DATA_DIR / "football.db")))
+        # Horas que vale una sincronización del calendario local (se repite antes
+        # si algún partido ha empezado desde entonces)
+        self.fixtures_sync_max_age_hours = float(os.getenv("FIXTURES_SYNC_MAX_AGE_HOURS", "6"))
+        # Estadísticas de partidos terminados que rellena cada sincronización
+        # automática del pipeline (main.py --sync-fixtures usa un tope mayor)
+        self.fixtures_sync_statistics_per_run = int(os.getenv("FIXTURES_SYNC_STATISTICS_PER_RUN", "15"))
+
+        # SQLite de predicciones (WAL + caché de páginas y mmap por conexión)
+        self.sqlite_cache_size_kib = int(os.getenv("SQLITE_CACHE_SIZE_KIB", "16384"))
+        self.sqlite_mmap_size = int(os.getenv("SQLITE_MMAP_SIZE", str(64 * 1024 * 1024)))
+        self.sqlite_busy_timeout = float(os.getenv("SQLITE_BUSY_TIMEOUT", "5"))
+        self.sqlite_cached_statements = int(os.getenv("SQLITE_CACHED_STATEMENTS", "128"))
+
+        # Web: segundos que se sirve la clasificación en memoria antes de refrescarla
+        self.standings_cache_ttl = float(os.getenv("STANDINGS_CACHE_TTL", "600"))
+        # Web: nº máximo de páginas renderizadas (/ y /day/{day}) en memoria
+        self.render_cache_max_entries = int(os.getenv("RENDER_CACHE_MAX_ENTRIES", "256"))
+
+        # Nº de hilos para procesar partidos en paralelo (1 = secuencial)
+        self.pipeline_workers = int(os.getenv("PIPELINE_WORKERS", "4"))
+
         if not self.telegram_bot_token:
             raise ValueError("Falta TELEGRAM_BOT_TOKEN en el .env")
         if not self.telegram_chat_id:
@@ -20,3 +74,11 @@ class Settings:
             raise ValueError("Falta API_FOOTBALL_KEY en el .env")
 
 settings = Settings()
+
+
+def run_date() -> date:
+    """
+    Día para el que se generan los pronósticos: hoy, salvo que se fije
+    BOT_BET_RUN_DATE (p. ej. para repetir una ejecución grabada).
+    """
+    return date.fromisoformat(settings.run_date) if settings.run_date else date.today()
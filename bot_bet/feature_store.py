@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .football_db import football_db
+from .scoring import NUMERIC_FEATURES, FeatureArrays, MatchFeatures
+from .team_players_cards_stats import PlayerCardsStats
+
+
+# =========================
+# Feature store: entradas del scoring de cada ejecución
+# =========================
+#
+# Cada ejecución diaria guarda, por partido, las MatchFeatures que ha reunido
+# (goles de temporada y recientes, tarjetas, árbitro) y los jugadores
+# propensos a tarjeta, con el día de ejecución (as_of). Con eso se puede
+# volver a puntuar una jornada, o barrer umbrales sobre lo que el bot vio en
+# su momento, sin llamar a API-Football.
+#
+# Tablas (football.db): match_features (una columna tipada por campo de
+# MatchFeatures) y match_feature_players.
+
+MatchDict = Dict[str, Any]
+CardPlayers = Tuple[List[PlayerCardsStats], List[PlayerCardsStats]]
+CollectedInputs = Tuple[MatchFeatures, CardPlayers]
+
+# Contexto del partido que hace falta para volver a generar el texto
+_MATCH_COLUMNS = (
+    "match_date",
+    "kickoff",
+    "kickoff_iso",
+    "home_team_id",
+    "away_team_id",
+    "home_team",
+    "away_team",
+    "referee",
+)
+_FEATURE_COLUMNS = NUMERIC_FEATURES + ("referee_name",)
+_PLAYER_COLUMNS = ("name", "matches", "yellow", "red", "total_cards", "cards_per_match")
+_INT_FEATURES = frozenset(
+    name for name in NUMERIC_FEATURES if name == "has_team_ids" or name.endswith("_matches")
+)
+
+
+def _feature_value(features: MatchFeatures, name: str) -> Any:
+    value = getattr(features, name)
+    if name in _INT_FEATURES:
+        return int(value)
+    if name == "referee_name":
+        return value
+    return float(value)
+
+
+def save_match_features(as_of: str, matches: Sequence[MatchDict], collected: Sequence[CollectedInputs]) -> int:
+    """
+    Guarda las entradas de una jornada (mismo orden que matches). Si ya había
+    una foto de ese partido en ese día, se sustituye. Devuelve los partidos
+    guardados (los que tienen fixture_id).
+    """
+    feature_rows: List[Tuple[Any, ...]] = []
+    player_rows: List[Tuple[Any, ...]] = []
+
+    for idx, (match, (features, (home_players, away_players))) in enumerate(zip(matches, collected)):
+        fixture_id = match.get("fixture_id")
+        if fixture_id is None:
+            continue
+        feature_rows.append(
+            (fixture_id, as_of, idx)
+            + tuple(match.get(col) for col in _MATCH_COLUMNS)
+            + tuple(_feature_value(features, name) for name in _FEATURE_COLUMNS)
+        )
+        for side, players in (("home", home_players), ("away", away_players)):
+            for rank, p in enumerate(players):
+                player_rows.append(
+                    (fixture_id, as_of, side, rank, p.name, p.matches, p.yellow, p.red, p.total_cards, p.cards_per_match)
+                )
+
+    if not feature_rows:
+        return 0
+
+    columns = ("fixture_id", "as_of", "idx") + _MATCH_COLUMNS + _FEATURE_COLUMNS
+    with football_db() as conn:
+        conn.executemany(
+            "DELETE FROM match_feature_players WHERE fixture_id = ? AND as_of = ?",
+            [(row[0], as_of) for row in feature_rows],
+        )
+        conn.executemany(
+            f"INSERT OR REPLACE INTO match_features ({', '.join(columns)}) "
+            f"VALUES ({', '.join('?' * len(columns))})",
+            feature_rows,
+        )
+        conn.executemany(
+            "INSERT INTO match_feature_players "
+            "(fixture_id, as_of, side, rank, name, matches, yellow, red, total_cards, cards_per_match) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            player_rows,
+        )
+    return len(feature_rows)
+
+
+def list_feature_days() -> List[str]:
+    """
+    Días de ejecución con features guardadas (más reciente primero).
+    """
+    with football_db() as conn:
+        rows = conn.execute("SELECT DISTINCT as_of FROM match_features ORDER BY as_of DESC").fetchall()
+    return [r["as_of"] for r in rows]
+
+
+def _features_from_row(row: Any) -> MatchFeatures:
+    values = {name: row[name] for name in _FEATURE_COLUMNS}
+    values["has_team_ids"] = bool(values["has_team_ids"])
+    return MatchFeatures(fixture_id=row["fixture_id"], **values)
+
+
+def load_matchday(as_of: str) -> Tuple[List[MatchDict], List[CollectedInputs]]:
+    """
+    Partidos y entradas guardadas de una ejecución, en el orden original.
+    Listo para predictions.score_and_render().
+    """
+    with football_db() as conn:
+        rows = conn.execute(
+            "SELECT * FROM match_features WHERE as_of = ? ORDER BY idx",
+            (as_of,),
+        ).fetchall()
+        player_rows = conn.execute(
+            f"SELECT fixture_id, side, {', '.join(_PLAYER_COLUMNS)} FROM match_feature_players "
+            "WHERE as_of = ? ORDER BY fixture_id, side, rank",
+            (as_of,),
+        ).fetchall()
+
+    players: Dict[Tuple[int, str], List[PlayerCardsStats]] = {}
+    for r in player_rows:
+        players.setdefault((r["fixture_id"], r["side"]), []).append(
+            PlayerCardsStats(**{col: r[col] for col in _PLAYER_COLUMNS})
+        )
+
+    matches: List[MatchDict] = []
+    collected: List[CollectedInputs] = []
+    for row in rows:
+        match: MatchDict = {"fixture_id": row["fixture_id"]}
+        match.update({col: row[col] for col in _MATCH_COLUMNS})
+        matches.append(match)
+        collected.append((
+            _features_from_row(row),
+            (players.get((row["fixture_id"], "home"), []), players.get((row["fixture_id"], "away"), [])),
+        ))
+    return matches, collected
+
+
+def load_feature_arrays(
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+) -> Tuple[np.ndarray, FeatureArrays]:
+    """
+    (fixture_ids, FeatureArrays) de los partidos guardados con match_date en
+    [date_from, date_to]. Si un partido se guardó en varias ejecuciones, se usa
+    la última foto (la más cercana al partido).
+    """
+    where = ["1 = 1"]
+    params: List[Any] = []
+    if date_from:
+        where.append("match_date >= ?")
+        params.append(date_from)
+    if date_to:
+        where.append("match_date <= ?")
+        params.append(date_to)
+
+    with football_db() as conn:
+        rows = conn.execute(
+            f"""
+            SELECT f.fixture_id, {', '.join(f'f.{name}' for name in NUMERIC_FEATURES)}
+            FROM match_features f
+            JOIN (
+                SELECT fixture_id, MAX(as_of) AS as_of
+                FROM match_features
+                WHERE {' AND '.join(where)}
+                GROUP BY fixture_id
+            ) latest ON latest.fixture_id = f.fixture_id AND latest.as_of = f.as_of
+            ORDER BY f.match_date, f.fixture_id
+            """,
+            params,
+        ).fetchall()
+
+    data = np.array([tuple(r) for r in rows], dtype=np.float64).reshape(len(rows), len(NUMERIC_FEATURES) + 1)
+    columns = {name: data[:, i + 1].copy() for i, name in enumerate(NUMERIC_FEATURES)}
+    return data[:, 0].astype(np.int64), FeatureArrays(n=len(rows), columns=columns)
@@ -0,0 +1,356 @@
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from .api_football_client import ApiQuotaExceeded, api_football_get
+from .api_quota import OPTIONAL
+from .config import run_date, settings
+from .football_db import football_db
+from .parallel import parallel_map
+
+
+# =========================
+# Almacén local de partidos (liga/temporada configuradas)
+# =========================
+#
+# sync_fixtures() trae /fixtures?league=&season= (1 llamada), escribe solo los
+# partidos que han cambiado y pide /fixtures/statistics únicamente para los
+# recién terminados. El resto del bot (forma reciente, árbitros, /form) lee de aquí.
+# Las estadísticas son un relleno OPTIONAL: no gastan la reserva diaria que
+# necesitan las llamadas de los pronósticos del día.
+
+FINISHED_STATUSES = ("FT", "AET", "PEN")
+# Tope de /fixtures/statistics para una sincronización explícita (--sync-fixtures)
+MAX_NEW_STATISTICS = 100
+
+
+@dataclass
+class FixturesSyncResult:
+    fetched: int  # partidos devueltos por la API
+    changed: int  # partidos nuevos o con estado/marcador/árbitro distinto
+    statistics_fetched: int  # partidos terminados a los que se ha añadido estadística
+
+
+def _fixture_row(item: Dict[str, Any]) -> Optional[Tuple[Any, ...]]:
+    fixture = item.get("fixture", {}) or {}
+    teams = item.get("teams", {}) or {}
+    goals = item.get("goals", {}) or {}
+    home = teams.get("home", {}) or {}
+    away = teams.get("away", {}) or {}
+
+    fixture_id = fixture.get("id")
+    if fixture_id is None:
+        return None
+
+    return (
+        fixture_id,
+        fixture.get("date"),
+        (fixture.get("status", {}) or {}).get("short"),
+        home.get("id"),
+        home.get("name"),
+        away.get("id"),
+        away.get("name"),
+        goals.get("home"),
+        goals.get("away"),
+        fixture.get("referee"),
+    )
+
+
+def _fetch_statistics(fixture_id: int) -> Optional[List[Dict[str, Any]]]:
+    try:
+        # Solo se piden para partidos terminados: la caché puede guardarlas sin caducidad
+        data = api_football_get(
+            "/fixtures/statistics", {"fixture": fixture_id}, priority=OPTIONAL, finished=True
+        )
+    except ApiQuotaExceeded:
+        # Se queda pendiente para la próxima sincronización
+        return None
+    response = data.get("response", []) or []
+    # Sin las 2 entradas (una por equipo) aún no hay estadística útil
+    return response if len(response) >= 2 else None
+
+
+def sync_fixtures(max_new_statistics: int = MAX_NEW_STATISTICS) -> FixturesSyncResult:
+    """
+    Sincronización incremental del almacén local.
+
+    max_new_statistics limita las llamadas a /fixtures/statistics por
+    sincronización (la primera carga de una temporada se completa en varias).
+    """
+    league_id = settings.api_football_league_id
+    season = settings.api_football_season
+
+    # Sin la caché persistente: el almacén ya hace de caché y una respuesta de
+    # antes del inicio de un partido dejaría su estado y marcador sin actualizar
+    data = api_football_get("/fixtures", {"league": league_id, "season": season}, use_cache=False)
+    items = data.get("response", []) or []
+
+    with football_db() as conn:
+        stored = {
+            r["fixture_id"]: (
+                r["fixture_id"], r["kickoff"], r["status"], r["home_id"], r["home_name"],
+                r["away_id"], r["away_name"], r["home_goals"], r["away_goals"], r["referee"],
+            )
+            for r in conn.execute(
+                "SELECT fixture_id, kickoff, status, home_id, home_name, away_id, away_name, "
+                "home_goals, away_goals, referee FROM fixtures WHERE league_id = ? AND season = ?",
+                (league_id, season),
+            )
+        }
+
+        changed = 0
+        for item in items:
+            row = _fixture_row(item)
+            if row is None or stored.get(row[0]) == row:
+                continue
+            conn.execute(
+                """
+                INSERT INTO fixtures(
+                    fixture_id, kickoff, status, home_id, home_name, away_id, away_name,
+                    home_goals, away_goals, referee, league_id, season
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(fixture_id) DO UPDATE SET
+                    kickoff = excluded.kickoff,
+                    status = excluded.status,
+                    home_id = excluded.home_id,
+                    home_name = excluded.home_name,
+                    away_id = excluded.away_id,
+                    away_name = excluded.away_name,
+                    home_goals = excluded.home_goals,
+                    away_goals = excluded.away_goals,
+                    referee = excluded.referee,
+                    updated_at = datetime('now')
+                """,
+                row + (league_id, season),
+            )
+            changed += 1
+
+        # Terminados sin estadística: los más recientes primero
+        pending = [
+            r["fixture_id"]
+            for r in conn.execute(
+                f"""
+                SELECT fixture_id FROM fixtures
+                WHERE league_id = ? AND season = ? AND statistics_json IS NULL
+                  AND status IN ({",".join("?" * len(FINISHED_STATUSES))})
+                ORDER BY kickoff DESC LIMIT ?
+                """,
+                (league_id, season, *FINISHED_STATUSES, max_new_statistics),
+            )
+        ]
+
+    statistics = parallel_map(_fetch_statistics, pending, max_workers=settings.pipeline_workers)
+
+    statistics_fetched = 0
+    with football_db() as conn:
+        for fixture_id, stats in zip(pending, statistics):
+            if stats is None:
+                continue
+            conn.execute(
+                "UPDATE fixtures SET statistics_json = ?, updated_at = datetime('now') WHERE fixture_id = ?",
+                (json.dumps(stats, ensure_ascii=False), fixture_id),
+            )
+            statistics_fetched += 1
+
+        conn.execute(
+            "INSERT OR REPLACE INTO fixtures_sync_state(league_id, season, last_sync_at) VALUES (?, ?, ?)",
+            (league_id, season, datetime.now().isoformat(timespec="seconds")),
+        )
+
+    return FixturesSyncResult(fetched=len(items), changed=changed, statistics_fetched=statistics_fetched)
+
+
+def get_last_sync_at() -> Optional[str]:
+    with football_db() as conn:
+        row = conn.execute(
+            "SELECT last_sync_at FROM fixtures_sync_state WHERE league_id = ? AND season = ?",
+            (settings.api_football_league_id, settings.api_football_season),
+        ).fetchone()
+    return row["last_sync_at"] if row else None
+
+
+def _kicked_off_since(since: datetime, now: datetime) -> bool:
+    """
+    True si algún partido del almacén ha empezado entre since y now (su
+    resultado, árbitro o estado han podido cambiar desde la sincronización).
+    """
+    with football_db() as conn:
+        rows = conn.execute(
+            "SELECT kickoff FROM fixtures "
+            "WHERE league_id = ? AND season = ? AND substr(kickoff, 1, 10) BETWEEN ? AND ?",
+            (
+                settings.api_football_league_id, settings.api_football_season,
+                (since.date() - timedelta(days=1)).isoformat(), (now.date() + timedelta(days=1)).isoformat(),
+            ),
+        ).fetchall()
+    for r in rows:
+        try:
+            kickoff = datetime.fromisoformat(r["kickoff"])
+        except (TypeError, ValueError):
+            continue
+        if kickoff.tzinfo is None:
+            kickoff = kickoff.astimezone()
+        if since < kickoff <= now:
+            return True
+    return False
+
+
+def ensure_fixtures_synced() -> Optional[FixturesSyncResult]:
+    """
+    Sincroniza si hace falta y devuelve el resultado (None si no ha hecho falta):
+    - nunca se ha sincronizado, o la última vez fue antes del día de ejecución
+      (run_date),
+    - la sincronización tiene más de FIXTURES_SYNC_MAX_AGE_HOURS horas,
+    - algún partido del almacén ha empezado desde entonces.
+
+    Va dentro del pipeline: solo rellena FIXTURES_SYNC_STATISTICS_PER_RUN
+    estadísticas por ejecución.
+    """
+    max_new_statistics = settings.fixtures_sync_statistics_per_run
+    last_sync_at = get_last_sync_at()
+    if not last_sync_at:
+        return sync_fixtures(max_new_statistics)
+
+    # last_sync_at está en hora local sin zona
+    synced = datetime.fromisoformat(last_sync_at).astimezone()
+    now = datetime.now().astimezone()
+    if (
+        synced.date() < run_date()
+        or now - synced > timedelta(hours=settings.fixtures_sync_max_age_hours)
+        or _kicked_off_since(synced, now)
+    ):
+        return sync_fixtures(max_new_statistics)
+    return None
+
+
+# =========================
+# Lecturas
+# =========================
+
+def get_next_matchday(from_day: date, max_lookahead_days: int = 7) -> List[Dict[str, Any]]:
+    """
+    Partidos del primer día con partidos entre from_day y from_day + max_lookahead_days
+    (ordenados por hora de inicio), leídos del calendario local.
+    """
+    to_day = from_day + timedelta(days=max_lookahead_days)
+    with football_db() as conn:
+        first = conn.execute(
+            "SELECT substr(kickoff, 1, 10) AS day FROM fixtures "
+            "WHERE league_id = ? AND season = ? AND kickoff >= ? AND substr(kickoff, 1, 10) <= ? "
+            "ORDER BY kickoff LIMIT 1",
+            (settings.api_football_league_id, settings.api_football_season, from_day.isoformat(), to_day.isoformat()),
+        ).fetchone()
+        if first is None:
+            return []
+
+        rows = conn.execute(
+            "SELECT * FROM fixtures "
+            "WHERE league_id = ? AND season = ? AND kickoff >= ? AND kickoff < ? "
+            "ORDER BY kickoff",
+            (
+                settings.api_football_league_id, settings.api_football_season,
+                first["day"], (date.fromisoformat(first["day"]) + timedelta(days=1)).isoformat(),
+            ),
+        ).fetchall()
+    return [dict(r) for r in rows]
+
+
+def has_fixtures() -> bool:
+    """
+    True si el almacén tiene partidos de la liga/temporada configuradas.
+    """
+    with football_db() as conn:
+        row = conn.execute(
+            "SELECT 1 FROM fixtures WHERE league_id = ? AND season = ? LIMIT 1",
+            (settings.api_football_league_id, settings.api_football_season),
+        ).fetchone()
+    return row is not None
+
+
+def get_team_finished_state(team_id: int) -> Tuple[int, Optional[int]]:
+    """
+    (nº de partidos terminados, fixture_id del último) de un equipo en el
+    almacén local. Cambia en cuanto la sincronización añade un partido nuevo.
+    """
+    placeholders = ",".join("?" * len(FINISHED_STATUSES))
+    with football_db() as conn:
+        row = conn.execute(
+            f"""
+            SELECT COUNT(*) AS n,
+                   (SELECT fixture_id FROM fixtures
+                    WHERE (home_id = ? OR away_id = ?) AND league_id = ? AND season = ?
+                      AND status IN ({placeholders})
+                    ORDER BY kickoff DESC LIMIT 1) AS last_id
+            FROM fixtures
+            WHERE (home_id = ? OR away_id = ?) AND league_id = ? AND season = ?
+              AND status IN ({placeholders})
+            """,
+            (
+                team_id, team_id, settings.api_football_league_id, settings.api_football_season, *FINISHED_STATUSES,
+                team_id, team_id, settings.api_football_league_id, settings.api_football_season, *FINISHED_STATUSES,
+            ),
+        ).fetchone()
+    return int(row["n"]), row["last_id"]
+
+
+def get_team_finished_fixtures(team_id: int, last_n: int = 10) -> List[Dict[str, Any]]:
+    """
+    Últimos N partidos terminados de un equipo (más recientes primero).
+    """
+    placeholders = ",".join("?" * len(FINISHED_STATUSES))
+    with football_db() as conn:
+        rows = conn.execute(
+            f"""
+            SELECT * FROM (
+                SELECT * FROM fixtures WHERE home_id = ? AND league_id = ? AND season = ?
+                UNION ALL
+                SELECT * FROM fixtures WHERE away_id = ? AND league_id = ? AND season = ?
+            )
+            WHERE status IN ({placeholders})
+            ORDER BY kickoff DESC LIMIT ?
+            """,
+            (
+                team_id, settings.api_football_league_id, settings.api_football_season,
+                team_id, settings.api_football_league_id, settings.api_football_season,
+                *FINISHED_STATUSES, last_n,
+            ),
+        ).fetchall()
+    return [dict(r) for r in rows]
+
+
+def get_finished_fixtures_with_statistics(exclude_ids: Optional[set] = None) -> List[Dict[str, Any]]:
+    """
+    Partidos terminados con estadística de la liga/temporada configuradas.
+    """
+    exclude_ids = exclude_ids or set()
+    with football_db() as conn:
+        rows = conn.execute(
+            "SELECT fixture_id, kickoff, referee, statistics_json FROM fixtures "
+            "WHERE league_id = ? AND season = ? AND statistics_json IS NOT NULL",
+            (settings.api_football_league_id, settings.api_football_season),
+        ).fetchall()
+    return [dict(r) for r in rows if r["fixture_id"] not in exclude_ids]
+
+
+def fixture_row_to_api(row: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convierte una fila del almacén al formato de /fixtures de API-Football
+    (lo que esperan las plantillas), con las estadísticas en "statistics".
+    """
+    return {
+        "fixture": {
+            "id": row["fixture_id"],
+            "date": row["kickoff"],
+            "referee": row["referee"],
+            "status": {"short": row["status"]},
+        },
+        "teams": {
+            "home": {"id": row["home_id"], "name": row["home_name"]},
+            "away": {"id": row["away_id"], "name": row["away_name"]},
+        },
+        "goals": {"home": row["home_goals"], "away": row["away_goals"]},
+        "statistics": json.loads(row["statistics_json"]) if row.get("statistics_json") else None,
+    }
@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Set
+
+from .config import settings
+
+
+# =========================
+# BD local de datos de fútbol (data/football.db)
+# =========================
+#
+# En modo WAL y con busy timeout (como predictions.db): la sincronización y el
+# backtest escriben desde varios hilos mientras la web lee.
+
+# Rutas (resueltas) cuyo esquema ya se ha creado en este proceso: la ruta puede
+# cambiar en ejecución (cassettes, benchmarks)
+_schema_ready: Set[str] = set()
+_schema_lock = threading.Lock()
+
+
+def _init_schema(conn: sqlite3.Connection) -> None:
+    # Almacén local de partidos de la liga/temporada (ver fixtures_store.py)
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS fixtures (
+            fixture_id INTEGER PRIMARY KEY,
+            league_id INTEGER NOT NULL,
+            season INTEGER NOT NULL,
+            kickoff TEXT,
+            status TEXT,
+            home_id INTEGER,
+            home_name TEXT,
+            away_id INTEGER,
+            away_name TEXT,
+            home_goals INTEGER,
+            away_goals INTEGER,
+            referee TEXT,
+            statistics_json TEXT,  -- respuesta de /fixtures/statistics (solo terminados)
+            updated_at TEXT NOT NULL DEFAULT (datetime('now'))
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_fixtures_season ON fixtures(league_id, season, kickoff)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_fixtures_home ON fixtures(home_id, kickoff)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_fixtures_away ON fixtures(away_id, kickoff)")
+
+    # Última sincronización por liga/temporada
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS fixtures_sync_state (
+            league_id INTEGER NOT NULL,
+            season INTEGER NOT NULL,
+            last_sync_at TEXT NOT NULL,
+            PRIMARY KEY (league_id, season)
+        )
+        """
+    )
+
+    # Partidos terminados con árbitro y tarjetas (para el índice de árbitros)
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS referee_fixtures (
+            fixture_id INTEGER PRIMARY KEY,
+            league_id INTEGER NOT NULL,
+            season INTEGER NOT NULL,
+            referee_key TEXT NOT NULL,
+            referee_name TEXT NOT NULL,
+            kickoff TEXT,
+            yellow INTEGER NOT NULL,
+            red INTEGER NOT NULL,
+            total_cards INTEGER NOT NULL  -- amarillas + 2 * rojas
+        )
+        """
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_referee_fixtures_ref "
+        "ON referee_fixtures(league_id, season, referee_key, kickoff DESC)"
+    )
+
+    # Agregado móvil por árbitro (últimos N partidos), recalculado al refrescar
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS referee_card_index (
+            league_id INTEGER NOT NULL,
+            season INTEGER NOT NULL,
+            referee_key TEXT NOT NULL,
+            referee_name TEXT NOT NULL,
+            window INTEGER NOT NULL,
+            matches INTEGER NOT NULL,
+            total_cards_sum INTEGER NOT NULL,
+            total_cards_avg REAL NOT NULL,
+            PRIMARY KEY (league_id, season, referee_key)
+        )
+        """
+    )
+
+    # Resultados finales ya resueltos (backtest): goles y tarjetas por partido
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS fixture_results (
+            fixture_id INTEGER PRIMARY KEY,
+            status TEXT NOT NULL,
+            home_goals INTEGER,
+            away_goals INTEGER,
+            yellow INTEGER,  -- NULL si aún no hay estadística del partido
+            red INTEGER,
+            updated_at TEXT NOT NULL DEFAULT (datetime('now'))
+        )
+        """
+    )
+
+    # Partidos pedidos por el backtest que aún no habían terminado: su hora de
+    # inicio evita volver a pedirlos a la API antes de que se jueguen
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS fixture_pending (
+            fixture_id INTEGER PRIMARY KEY,
+            status TEXT,
+            kickoff TEXT,
+            checked_at TEXT NOT NULL
+        )
+        """
+    )
+
+    # Feature store: entradas del scoring de cada partido tal y como se vieron
+    # en una ejecución (as_of = día de la ejecución). Ver feature_store.py
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS match_features (
+            fixture_id INTEGER NOT NULL,
+            as_of TEXT NOT NULL,
+            idx INTEGER NOT NULL,  -- orden del partido en la jornada
+            match_date TEXT,
+            kickoff TEXT,
+            kickoff_iso TEXT,
+            home_team_id INTEGER,
+            away_team_id INTEGER,
+            home_team TEXT,
+            away_team TEXT,
+            referee TEXT,  -- árbitro tal y como venía en el partido
+            has_team_ids INTEGER NOT NULL,
+            home_season_over_0_5 REAL NOT NULL,
+            home_season_over_1_5 REAL NOT NULL,
+            home_season_goals_avg REAL NOT NULL,
+            away_season_over_0_5 REAL NOT NULL,
+            away_season_over_1_5 REAL NOT NULL,
+            away_season_goals_avg REAL NOT NULL,
+            home_recent_matches INTEGER NOT NULL,
+            home_recent_over_0_5 REAL NOT NULL,
+            home_recent_over_1_5 REAL NOT NULL,
+            home_recent_goals_avg REAL NOT NULL,
+            away_recent_matches INTEGER NOT NULL,
+            away_recent_over_0_5 REAL NOT NULL,
+            away_recent_over_1_5 REAL NOT NULL,
+            away_recent_goals_avg REAL NOT NULL,
+            home_cards_matches INTEGER NOT NULL,
+            home_yellow_avg REAL NOT NULL,
+            home_red_avg REAL NOT NULL,
+            home_cards_weighted_avg REAL NOT NULL,
+            away_cards_matches INTEGER NOT NULL,
+            away_yellow_avg REAL NOT NULL,
+            away_red_avg REAL NOT NULL,
+            away_cards_weighted_avg REAL NOT NULL,
+            referee_name TEXT,  -- nombre usado para buscar en el índice de árbitros
+            referee_matches INTEGER NOT NULL,
+            referee_cards_avg REAL NOT NULL,
+            PRIMARY KEY (fixture_id, as_of)
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_match_features_as_of ON match_features(as_of)")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS match_feature_players (
+            fixture_id INTEGER NOT NULL,
+            as_of TEXT NOT NULL,
+            side TEXT NOT NULL,  -- 'home' / 'away'
+            rank INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            matches INTEGER NOT NULL,
+            yellow INTEGER NOT NULL,
+            red INTEGER NOT NULL,
+            total_cards INTEGER NOT NULL,
+            cards_per_match REAL NOT NULL,
+            PRIMARY KEY (fixture_id, as_of, side, rank)
+        )
+        """
+    )
+    conn.commit()
+
+
+@contextmanager
+def football_db() -> Iterator[sqlite3.Connection]:
+    """
+    Abre una conexión a la BD local (creando el esquema la primera vez).
+    Commit al salir sin errores; siempre cierra.
+    """
+    path = settings.football_db_path.resolve()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    key = str(path)
+    if not path.exists():
+        # Fichero nuevo (o borrado, p. ej. la BD temporal de un cassette)
+        _schema_ready.discard(key)
+    conn = sqlite3.connect(path, timeout=settings.sqlite_busy_timeout)
+    conn.row_factory = sqlite3.Row
+    try:
+        if key not in _schema_ready:
+            with _schema_lock:
+                if key not in _schema_ready:
+                    try:
+                        # Queda guardado en el fichero: basta con la primera conexión
+                        conn.execute("PRAGMA journal_mode=WAL")
+                    except sqlite3.OperationalError:
+                        pass
+                    _init_schema(conn)
+                    _schema_ready.add(key)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        yield conn
+        conn.commit()
+    finally:
+        conn.close()
@@ -2,9 +2,8 @@ from dataclasses import dataclass
 from datetime import datetime
 from typing import Dict, Any, List
 
-import requests
-
 from .config import settings
+from .http_session import get_session, get_timeout
 from .la_liga_client import BASE_URL, LALIGA_COMPETITION_ID
 
 
@@ -42,7 +41,7 @@ def get_h2h_stats(team_a_id: int, team_b_id: int, limit: int = 10) -> H2HStats:
         "limit": 50,  # pedimos un buen histórico y luego cortamos nosotros a 'limit'
     }
 
-    resp = requests.get(url, headers=_headers(), params=params)
+    resp = get_session().get(url, headers=_headers(), params=params, timeout=get_timeout())
     if resp.status_code != 200:
         raise FootballDataError(
             f"Error al obtener H2H ({team_a_id} vs {team_b_id}): "
@@ -0,0 +1,266 @@
+from __future__ import annotations
+
+import atexit
+import gzip
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from .config import run_date, settings
+
+
+# =========================
+# Grabación / reproducción de HTTP (cassettes)
+# =========================
+#
+# BOT_BET_HTTP_MODE:
+#   live   -> red normal (por defecto)
+#   record -> red normal, y cada GET con su respuesta se guarda en el cassette
+#             (HTTP_CASSETTE_PATH, JSON lines comprimido con gzip)
+#   replay -> sin red: cada GET se responde desde el cassette, con una latencia
+#             simulada (HTTP_REPLAY_LATENCY: segundos fijos o "recorded" para
+#             usar la que se midió al grabar). Lo que no esté grabado falla
+#             como un error de conexión.
+#
+# El adaptador se monta en la sesión compartida (http_session.py), así que
+# cubre API-Football y football-data.org. No se guardan cabeceras de la
+# petición (claves de API) ni peticiones POST (Telegram).
+#
+# La primera línea del cassette guarda el día de ejecución: en replay se fija
+# ese día (settings.run_date) para que el bot elija la misma jornada.
+
+HTTP_MODES = ("live", "record", "replay")
+
+# Cabeceras de respuesta que se conservan (el resto no afecta al bot)
+_KEPT_HEADERS = (
+    "content-type",
+    "x-ratelimit-limit",
+    "x-ratelimit-remaining",
+    "x-ratelimit-requests-limit",
+    "x-ratelimit-requests-remaining",
+)
+
+
+def request_key(method: str, url: str) -> str:
+    """
+    Método + URL con los parámetros ordenados (y el token de Telegram oculto).
+    """
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    normalized = urlunsplit((parts.scheme, parts.netloc, parts.path, query, ""))
+    token = settings.telegram_bot_token
+    if token:
+        normalized = normalized.replace(token, "<token>")
+    return f"{method.upper()} {normalized}"
+
+
+class Cassette:
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: Dict[str, List[Dict[str, Any]]] = {}
+        self._served: Dict[str, int] = {}
+        self._recorded: List[Dict[str, Any]] = []
+        self.meta: Dict[str, Any] = {}
+
+    @classmethod
+    def load(cls, path: Path) -> "Cassette":
+        cassette = cls(path)
+        with gzip.open(path, "rt", encoding="utf-8") as fh:
+            for line in fh:
+                if line.strip():
+                    entry = json.loads(line)
+                    if "meta" in entry:
+                        cassette.meta = entry["meta"]
+                        continue
+                    cassette._entries.setdefault(entry["key"], []).append(entry)
+        return cassette
+
+    def __len__(self) -> int:
+        return sum(len(v) for v in self._entries.values()) + len(self._recorded)
+
+    def next(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Siguiente respuesta grabada para la clave (si se pidió varias veces se
+        sirven en orden; después se repite la última).
+        """
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                return None
+            i = self._served.get(key, 0)
+            self._served[key] = i + 1
+            return entries[min(i, len(entries) - 1)]
+
+    def add(self, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self._recorded.append(entry)
+
+    def save(self) -> int:
+        with self._lock:
+            recorded = list(self._recorded)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with gzip.open(self.path, "wt", encoding="utf-8") as fh:
+            fh.write(json.dumps({"meta": self.meta}) + "\n")
+            for entry in recorded:
+                fh.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        return len(recorded)
+
+
+def _build_response(request: requests.PreparedRequest, entry: Dict[str, Any]) -> requests.Response:
+    resp = requests.Response()
+    resp.status_code = entry["status"]
+    resp.reason = entry.get("reason") or ""
+    resp.headers = CaseInsensitiveDict(entry.get("headers") or {})
+    resp._content = entry["body"].encode("utf-8")
+    resp.encoding = "utf-8"
+    resp.url = request.url or ""
+    resp.request = request
+    return resp
+
+
+class CassetteAdapter(BaseAdapter):
+    def __init__(self, mode: str, cassette: Cassette, inner: Optional[HTTPAdapter] = None, latency: str = "0") -> None:
+        super().__init__()
+        self.mode = mode
+        self.cassette = cassette
+        self.inner = inner
+        self.latency = latency
+
+    def _delay(self, entry: Dict[str, Any]) -> float:
+        if self.latency == "recorded":
+            return float(entry.get("elapsed") or 0.0)
+        try:
+            return float(self.latency)
+        except ValueError:
+            return 0.0
+
+    def send(self, request: requests.PreparedRequest, stream: bool = False, timeout: Any = None,
+             verify: Any = True, cert: Any = None, proxies: Any = None) -> requests.Response:
+        key = request_key(request.method or "GET", request.url or "")
+
+        if self.mode == "replay":
+            entry = self.cassette.next(key)
+            if entry is None:
+                raise requests.ConnectionError(f"Modo replay: no hay respuesta grabada para {key}", request=request)
+            delay = self._delay(entry)
+            if delay > 0:
+                time.sleep(delay)
+            return _build_response(request, entry)
+
+        assert self.inner is not None
+        start = time.perf_counter()
+        resp = self.inner.send(request, stream=False, timeout=timeout, verify=verify, cert=cert, proxies=proxies)
+        elapsed = time.perf_counter() - start
+        if (request.method or "").upper() == "GET":
+            self.cassette.add({
+                "key": key,
+                "status": resp.status_code,
+                "reason": resp.reason,
+                "headers": {k: v for k, v in resp.headers.items() if k.lower() in _KEPT_HEADERS},
+                "body": resp.content.decode(resp.encoding or "utf-8", errors="replace"),
+                "elapsed": round(elapsed, 4),
+            })
+        return resp
+
+    def close(self) -> None:
+        if self.inner is not None:
+            self.inner.close()
+
+
+_cassette: Optional[Cassette] = None
+_cassette_mode: Optional[str] = None  # "record" / "replay": para qué se abrió _cassette
+
+
+def get_cassette() -> Optional[Cassette]:
+    return _cassette
+
+
+def build_cassette_adapter(inner: HTTPAdapter) -> CassetteAdapter:
+    """
+    Adaptador para el modo actual (settings.http_mode). En record, el cassette
+    se escribe al salir del proceso (o antes con save_cassette()).
+    """
+    global _cassette, _cassette_mode
+    mode = settings.http_mode
+    if mode not in ("record", "replay"):
+        raise ValueError(f"BOT_BET_HTTP_MODE no válido para cassette: {mode!r}")
+
+    path = settings.http_cassette_path
+    if mode == "replay":
+        if not path.exists():
+            raise FileNotFoundError(f"No existe el cassette {path} (grábalo antes con BOT_BET_HTTP_MODE=record)")
+        if _cassette is None or _cassette.path != path or _cassette_mode != "replay":
+            _cassette = Cassette.load(path)
+            _cassette_mode = "replay"
+            print(f"[INFO] HTTP replay: {len(_cassette)} respuestas desde {path}")
+        return CassetteAdapter(mode, _cassette, latency=settings.http_replay_latency)
+
+    # La sesión monta varios adaptadores: todos graban en el mismo cassette
+    if _cassette is None or _cassette.path != path or _cassette_mode != "record":
+        _cassette = Cassette(path)
+        _cassette_mode = "record"
+        _cassette.meta = {
+            "run_date": run_date().isoformat(),
+            "league_id": settings.api_football_league_id,
+            "season": settings.api_football_season,
+        }
+        atexit.register(save_cassette)
+        print(f"[INFO] HTTP record: grabando en {path}")
+    return CassetteAdapter(mode, _cassette, inner=inner)
+
+
+def save_cassette() -> None:
+    if _cassette is None or settings.http_mode != "record":
+        return
+    atexit.unregister(save_cassette)
+    saved = _cassette.save()
+    print(f"[INFO] Cassette guardado: {saved} respuestas en {_cassette.path}")
+
+
+def configure_http_mode(mode: str, cassette_path: Optional[Path] = None) -> None:
+    """
+    Prepara una ejecución grabada o reproducida (main.py --record/--replay).
+    Llamar antes de la primera petición HTTP.
+
+    Para que grabación y reproducción hagan exactamente las mismas peticiones:
+    - se desactiva la caché de API-Football,
+    - el almacén local de partidos se empieza de cero en un fichero aparte,
+      junto al cassette,
+    - en replay, el día de ejecución es el de la grabación.
+    """
+    global _cassette, _cassette_mode
+    if mode not in HTTP_MODES:
+        raise ValueError(f"Modo HTTP no válido: {mode!r} (opciones: {', '.join(HTTP_MODES)})")
+
+    settings.http_mode = mode
+    if cassette_path is not None:
+        settings.http_cassette_path = cassette_path
+    if mode == "live":
+        return
+
+    path = settings.http_cassette_path
+    settings.api_cache_enabled = False
+
+    scratch_db = path.parent / f"{path.name.split('.')[0]}.football.db"
+    scratch_db.parent.mkdir(parents=True, exist_ok=True)
+    for suffix in ("", "-wal", "-shm"):
+        Path(f"{scratch_db}{suffix}").unlink(missing_ok=True)
+    settings.football_db_path = scratch_db
+
+    if mode == "replay":
+        if not path.exists():
+            raise FileNotFoundError(f"No existe el cassette {path} (grábalo antes con --record)")
+        _cassette = Cassette.load(path)
+        _cassette_mode = "replay"
+        print(f"[INFO] HTTP replay: {len(_cassette)} respuestas desde {path}")
+        recorded_day = _cassette.meta.get("run_date")
+        if recorded_day and not settings.run_date:
+            settings.run_date = recorded_day
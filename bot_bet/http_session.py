@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import threading
+from typing import Optional, Tuple
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .config import settings
+from .http_replay import build_cassette_adapter
+
+
+# =========================
+# Transporte HTTP compartido por todos los clientes
+# =========================
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# API-Football: los 429 los gestiona QuotaScheduler (api_quota.py). Si urllib3
+# los reintentara, cada reintento sería una petición más sin pasar por la cuota.
+API_FOOTBALL_PREFIX = "https://v3.football.api-sports.io"
+API_FOOTBALL_RETRY_STATUSES = (500, 502, 503, 504)
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_timeout() -> Tuple[float, float]:
+    """
+    (connect, read) en segundos, configurables vía HTTP_CONNECT_TIMEOUT / HTTP_READ_TIMEOUT.
+    """
+    return settings.http_connect_timeout, settings.http_read_timeout
+
+
+def _build_adapter(statuses: Tuple[int, ...]) -> HTTPAdapter:
+    # Reintentos con backoff exponencial en los estados indicados, respetando
+    # Retry-After. Solo para métodos idempotentes: un POST a Telegram no se
+    # repite si el servidor ya lo ha podido procesar (los errores de conexión sí
+    # se reintentan).
+    retry = Retry(
+        total=settings.http_max_retries,
+        connect=settings.http_max_retries,
+        read=settings.http_max_retries,
+        status=settings.http_max_retries,
+        backoff_factor=settings.http_backoff_factor,
+        status_forcelist=statuses,
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    return HTTPAdapter(
+        max_retries=retry,
+        pool_connections=settings.http_pool_size,
+        pool_maxsize=settings.http_pool_size,
+    )
+
+
+def _build_session() -> requests.Session:
+    default: BaseAdapter = _build_adapter(RETRY_STATUSES)
+    api_football: BaseAdapter = _build_adapter(API_FOOTBALL_RETRY_STATUSES)
+    if settings.http_mode != "live":
+        # Grabación/reproducción de respuestas (el adaptador real queda debajo al grabar)
+        default = build_cassette_adapter(default)
+        api_football = build_cassette_adapter(api_football)
+
+    session = requests.Session()
+    session.mount("https://", default)
+    session.mount("http://", default)
+    # requests usa el prefijo más largo que coincida
+    session.mount(API_FOOTBALL_PREFIX, api_football)
+    return session
+
+
+def get_session() -> requests.Session:
+    """
+    Sesión HTTP única (keep-alive) para API-Football, football-data.org y Telegram.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
@@ -1,9 +1,8 @@
 from datetime import datetime, date
 from typing import List, Dict
 
-import requests
-
 from .config import settings
+from .http_session import get_session, get_timeout
 
 # En football-data.org LaLiga suele tener el código 2014.
 LALIGA_COMPETITION_ID = 2014
@@ -36,7 +35,7 @@ def get_laliga_matches_for_date(target_date: date) -> List[Dict]:
         "status": "SCHEDULED"
     }
 
-    response = requests.get(url, headers=_get_headers(), params=params)
+    response = get_session().get(url, headers=_get_headers(), params=params, timeout=get_timeout())
 
     if response.status_code != 200:
         raise FootballDataError(
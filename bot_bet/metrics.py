@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+import functools
+import hashlib
+import json
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+# =========================
+# Métricas del pipeline (spans de tiempo + resumen por ejecución)
+# =========================
+#
+# span("api_football_get", endpoint="/fixtures", ...) mide un tramo y acumula:
+# - agregados por (nombre, endpoint, cache, table) -> nº, segundos, máximo y bytes
+#   (se exportan en formato Prometheus en /metrics de la web)
+# - los últimos MAX_SPANS spans con todas sus etiquetas (params_hash, bytes...)
+#   para el resumen de la ejecución, que se guarda junto a la predicción.
+#
+# Las etiquetas que entran en los agregados son pocas a propósito (endpoint,
+# cache y table); params_hash y bytes van en los spans individuales.
+
+MAX_SPANS = 5000
+AGGREGATE_LABELS = ("endpoint", "cache", "table")
+
+AggKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+@dataclass
+class Span:
+    name: str
+    labels: Dict[str, Any] = field(default_factory=dict)
+    start: float = 0.0
+    seconds: float = 0.0
+
+    def set(self, **labels: Any) -> None:
+        self.labels.update(labels)
+
+
+@dataclass
+class _Aggregate:
+    count: int = 0
+    seconds: float = 0.0
+    max_seconds: float = 0.0
+    bytes: int = 0
+    errors: int = 0
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._aggregates: Dict[AggKey, _Aggregate] = {}
+        self._spans: List[Span] = []
+        self._dropped = 0
+        self._started = time.time()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._aggregates.clear()
+            self._spans.clear()
+            self._dropped = 0
+            self._started = time.time()
+
+    def record(self, span: Span, error: bool = False) -> None:
+        key: AggKey = (
+            span.name,
+            tuple((k, str(span.labels[k])) for k in AGGREGATE_LABELS if span.labels.get(k) is not None),
+        )
+        with self._lock:
+            agg = self._aggregates.get(key)
+            if agg is None:
+                agg = self._aggregates[key] = _Aggregate()
+            agg.count += 1
+            agg.seconds += span.seconds
+            agg.max_seconds = max(agg.max_seconds, span.seconds)
+            agg.bytes += int(span.labels.get("bytes") or 0)
+            agg.errors += 1 if error else 0
+            if len(self._spans) < MAX_SPANS:
+                self._spans.append(span)
+            else:
+                self._dropped += 1
+
+    def aggregates(self) -> Dict[AggKey, _Aggregate]:
+        with self._lock:
+            return {k: _Aggregate(**vars(v)) for k, v in self._aggregates.items()}
+
+    def run_summary(self, slowest: int = 10) -> Dict[str, Any]:
+        """
+        Resumen de la ejecución: totales por tramo y los spans más lentos.
+        """
+        with self._lock:
+            spans = list(self._spans)
+            aggregates = dict(self._aggregates)
+            dropped = self._dropped
+            started = self._started
+
+        by_name: Dict[str, Dict[str, Any]] = {}
+        for (name, labels), agg in sorted(aggregates.items()):
+            entry = by_name.setdefault(name, {"count": 0, "seconds": 0.0, "max_seconds": 0.0, "bytes": 0, "errors": 0})
+            entry["count"] += agg.count
+            entry["seconds"] += agg.seconds
+            entry["max_seconds"] = max(entry["max_seconds"], agg.max_seconds)
+            entry["bytes"] += agg.bytes
+            entry["errors"] += agg.errors
+            if dict(labels).get("cache") == "hit":
+                entry["cache_hits"] = entry.get("cache_hits", 0) + agg.count
+
+        for entry in by_name.values():
+            entry["seconds"] = round(entry["seconds"], 4)
+            entry["max_seconds"] = round(entry["max_seconds"], 4)
+
+        top = sorted(spans, key=lambda s: s.seconds, reverse=True)[:slowest]
+        return {
+            "wall_seconds": round(time.time() - started, 3),
+            "spans": by_name,
+            "slowest": [
+                {"name": s.name, "seconds": round(s.seconds, 4), **{k: v for k, v in s.labels.items()}}
+                for s in top
+            ],
+            "dropped_spans": dropped,
+        }
+
+
+registry = MetricsRegistry()
+
+
+def params_hash(params: Optional[Dict[str, Any]]) -> str:
+    """
+    Hash corto y estable de los parámetros (para agrupar spans sin guardar los valores).
+    """
+    raw = json.dumps(params or {}, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:10]
+
+
+@contextmanager
+def span(name: str, **labels: Any) -> Iterator[Span]:
+    """
+    Mide el bloque. Dentro se pueden añadir etiquetas con s.set(cache="hit", bytes=...).
+    """
+    s = Span(name=name, labels=labels, start=time.perf_counter())
+    error = False
+    try:
+        yield s
+    except BaseException:
+        error = True
+        raise
+    finally:
+        s.seconds = time.perf_counter() - s.start
+        registry.record(s, error=error)
+
+
+def timed(name: Optional[str] = None) -> Callable[[F], F]:
+    """
+    Decorador: un span por llamada con el nombre de la función (o el indicado).
+    """
+    def decorator(fn: F) -> F:
+        span_name = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with span(span_name):
+                return fn(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
+
+
+# =========================
+# Formato Prometheus (texto)
+# =========================
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(pairs: Tuple[Tuple[str, str], ...]) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def render_prometheus(
+    reg: Optional[MetricsRegistry] = None,
+    last_run: Optional[Dict[str, Any]] = None,
+    extra_gauges: Optional[Dict[str, Tuple[str, float]]] = None,
+) -> str:
+    """
+    Texto en formato de exposición de Prometheus:
+    - bot_bet_span_seconds (summary: _count/_sum), _max y bytes/errores del proceso
+    - bot_bet_last_run_* con el resumen guardado de la última ejecución diaria
+    - extra_gauges: {nombre: (ayuda, valor)}
+    """
+    reg = reg or registry
+    lines: List[str] = []
+    aggregates = sorted(reg.aggregates().items())
+
+    lines.append("# HELP bot_bet_span_seconds Duración de los tramos instrumentados en este proceso.")
+    lines.append("# TYPE bot_bet_span_seconds summary")
+    for (name, labels), agg in aggregates:
+        lbl = _labels((("span", name),) + labels)
+        lines.append(f"bot_bet_span_seconds_count{lbl} {agg.count}")
+        lines.append(f"bot_bet_span_seconds_sum{lbl} {agg.seconds:.6f}")
+
+    lines.append("# HELP bot_bet_span_max_seconds Duración máxima de un tramo.")
+    lines.append("# TYPE bot_bet_span_max_seconds gauge")
+    for (name, labels), agg in aggregates:
+        lines.append(f"bot_bet_span_max_seconds{_labels((('span', name),) + labels)} {agg.max_seconds:.6f}")
+
+    lines.append("# HELP bot_bet_span_bytes_total Bytes transferidos en los tramos que los miden.")
+    lines.append("# TYPE bot_bet_span_bytes_total counter")
+    for (name, labels), agg in aggregates:
+        if agg.bytes:
+            lines.append(f"bot_bet_span_bytes_total{_labels((('span', name),) + labels)} {agg.bytes}")
+
+    lines.append("# HELP bot_bet_span_errors_total Tramos que terminaron con excepción.")
+    lines.append("# TYPE bot_bet_span_errors_total counter")
+    for (name, labels), agg in aggregates:
+        if agg.errors:
+            lines.append(f"bot_bet_span_errors_total{_labels((('span', name),) + labels)} {agg.errors}")
+
+    if last_run:
+        lines.append("# HELP bot_bet_last_run_wall_seconds Duración total de la última ejecución diaria.")
+        lines.append("# TYPE bot_bet_last_run_wall_seconds gauge")
+        lines.append(f"bot_bet_last_run_wall_seconds {float(last_run.get('wall_seconds', 0.0)):.3f}")
+        lines.append("# HELP bot_bet_last_run_span_seconds Segundos por tramo en la última ejecución diaria.")
+        lines.append("# TYPE bot_bet_last_run_span_seconds gauge")
+        for name, entry in sorted((last_run.get("spans") or {}).items()):
+            lines.append(f"bot_bet_last_run_span_seconds{_labels((('span', name),))} {float(entry.get('seconds', 0.0)):.6f}")
+        lines.append("# HELP bot_bet_last_run_span_count Nº de tramos en la última ejecución diaria.")
+        lines.append("# TYPE bot_bet_last_run_span_count gauge")
+        for name, entry in sorted((last_run.get("spans") or {}).items()):
+            lines.append(f"bot_bet_last_run_span_count{_labels((('span', name),))} {int(entry.get('count', 0))}")
+
+    for metric, (help_text, value) in sorted((extra_gauges or {}).items()):
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} gauge")
+        lines.append(f"{metric} {value}")
+
+    return "\n".join(lines) + "\n"
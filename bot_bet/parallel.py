@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, List, Optional, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# Marca los hilos de un pool de parallel_map: dentro de uno, los parallel_map
+# anidados van en secuencial y la concurrencia total sigue acotada por el
+# max_workers del pool exterior (p. ej. PIPELINE_WORKERS), no por su cuadrado.
+_worker = threading.local()
+
+
+def in_parallel_worker() -> bool:
+    return getattr(_worker, "active", False)
+
+
+def parallel_map(fn: Callable[[T], R], items: Iterable[T], max_workers: Optional[int] = None) -> List[R]:
+    """
+    Aplica fn a cada elemento con un pool de hilos acotado y devuelve los
+    resultados en el MISMO orden que la entrada.
+
+    Con max_workers <= 1 (o un solo elemento), o si ya se está dentro de un
+    hilo de otro parallel_map, se ejecuta en secuencial.
+    Si alguna llamada lanza excepción, se propaga al llamante.
+    """
+    items = list(items)
+    workers = min(max_workers or 1, len(items))
+
+    if workers <= 1 or in_parallel_worker():
+        return [fn(item) for item in items]
+
+    def run(item: T) -> R:
+        _worker.active = True
+        try:
+            return fn(item)
+        finally:
+            _worker.active = False
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(run, items))
+
+
+def parallel_calls(*fns: Callable[[], R], max_workers: Optional[int] = None) -> List[R]:
+    """
+    Ejecuta varias funciones sin argumentos en paralelo y devuelve sus
+    resultados en orden. Atajo para lanzar lookups independientes.
+    """
+    return parallel_map(lambda fn: fn(), fns, max_workers=max_workers or len(fns))
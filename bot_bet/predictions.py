@@ -1,10 +1,16 @@
 from __future__ import annotations
 
+from dataclasses import dataclass
 from datetime import date, datetime
 from typing import Any, Dict, List, Optional, Tuple
 
 from .api_football_client import api_football_get
-from .config import settings
+from .api_quota import get_quota_status
+from .config import run_date, settings
+from .feature_store import CollectedInputs, load_matchday, save_match_features
+from .fixtures_store import ensure_fixtures_synced, fixture_row_to_api, get_next_matchday
+from .metrics import span, timed
+from .parallel import parallel_calls, parallel_map
 from .team_goals_stats import (
     get_team_goals_stats,
     TeamGoalsStats,
@@ -12,8 +18,18 @@ from .team_goals_stats import (
     TeamRecentGoalsStats,
 )
 from .team_cards_stats import get_team_cards_stats, TeamCardsStats
-from .referee_cards_stats import get_referee_cards_stats, RefereeCardsStats
+from .referee_cards_stats import get_referee_cards_stats, refresh_referee_index, RefereeCardsStats
 from .team_players_cards_stats import get_team_players_cards_stats, PlayerCardsStats
+from .team_season_snapshot import clear_team_season_snapshots
+from .scoring import (
+    DEFAULT_PARAMS,
+    GOALS_NO_PICK,
+    GOALS_OVER_0_5,
+    GOALS_OVER_1_5,
+    MatchFeatures,
+    ScoringParams,
+    score_features,
+)
 
 
 MatchDict = Dict[str, Any]
@@ -38,13 +54,36 @@ def _format_kickoff(kickoff_iso: Optional[str]) -> str:
     except Exception:
         return kickoff_iso
 
-def get_todays_matches(max_lookahead_days: int = 7) -> List[MatchDict]:
+def _match_from_fixture(item: Dict[str, Any], target_str: str) -> MatchDict:
+    fixture = item.get("fixture", {}) or {}
+    teams = item.get("teams", {}) or {}
+
+    home = teams.get("home", {}) or {}
+    away = teams.get("away", {}) or {}
+
+    kickoff_iso = fixture.get("date")
+    kickoff_display = _format_kickoff(kickoff_iso)
+
+    return {
+        "fixture_id": fixture.get("id"),
+        "referee": fixture.get("referee"),
+        "home_team": home.get("name"),
+        "away_team": away.get("name"),
+        "home_team_id": home.get("id"),
+        "away_team_id": away.get("id"),
+        "kickoff": kickoff_display,
+        "kickoff_iso": kickoff_iso,
+        "match_date": target_str,  # 👈 extra útil para la web
+    }
+
+
+def _get_todays_matches_by_date(max_lookahead_days: int) -> List[MatchDict]:
     """
-    Obtiene los partidos de LaLiga para hoy.
-    Si hoy no hay partidos, busca el próximo día con partidos (hasta max_lookahead_days).
+    Versión antigua: una llamada /fixtures?date= por día hasta encontrar partidos.
+    Solo se usa si no se puede sincronizar el calendario local.
     """
     for delta in range(0, max_lookahead_days + 1):
-        target = date.today().fromordinal(date.today().toordinal() + delta)
+        target = date.fromordinal(run_date().toordinal() + delta)
         target_str = target.strftime("%Y-%m-%d")
 
         data = api_football_get(
@@ -56,259 +95,250 @@ def get_todays_matches(max_lookahead_days: int = 7) -> List[MatchDict]:
             },
         )
 
-        matches: List[MatchDict] = []
-        for item in data.get("response", []):
-            fixture = item.get("fixture", {}) or {}
-            teams = item.get("teams", {}) or {}
-
-            home = teams.get("home", {}) or {}
-            away = teams.get("away", {}) or {}
-
-            kickoff_iso = fixture.get("date")
-            kickoff_display = _format_kickoff(kickoff_iso)
-
-            matches.append(
-                {
-                    "fixture_id": fixture.get("id"),
-                    "referee": fixture.get("referee"),
-                    "home_team": home.get("name"),
-                    "away_team": away.get("name"),
-                    "home_team_id": home.get("id"),
-                    "away_team_id": away.get("id"),
-                    "kickoff": kickoff_display,
-                    "match_date": target_str,  # 👈 extra útil para la web
-                }
-            )
+        matches = [_match_from_fixture(item, target_str) for item in data.get("response", [])]
 
         if matches:
+            # Orden por hora de inicio (la API no lo garantiza)
+            matches.sort(key=lambda m: m.get("kickoff_iso") or "")
             return matches
 
     return []
 
+
+def get_todays_matches(max_lookahead_days: int = 7) -> List[MatchDict]:
+    """
+    Obtiene los partidos de LaLiga para hoy.
+    Si hoy no hay partidos, busca el próximo día con partidos (hasta max_lookahead_days).
+
+    Sale del calendario local (fixtures_store), que se sincroniza con una sola
+    llamada /fixtures?league=&season= cuando está desactualizado (ver
+    ensure_fixtures_synced).
+    """
+    try:
+        sync = ensure_fixtures_synced()
+        if sync is not None:
+            print(
+                f"[INFO] Partidos sincronizados: {sync.changed} cambiados de {sync.fetched}, "
+                f"{sync.statistics_fetched} estadísticas nuevas."
+            )
+    except Exception as e:
+        print(f"[DEBUG] Error sincronizando el calendario: {e}")
+        return _get_todays_matches_by_date(max_lookahead_days)
+
+    rows = get_next_matchday(run_date(), max_lookahead_days)
+    return [
+        _match_from_fixture(fixture_row_to_api(r), (r["kickoff"] or "")[:10])
+        for r in rows
+    ]
+
 # =========================
-# 2. Bloque de pronóstico de GOLES
+# 2. Features por partido (API-Football / almacén local)
 # =========================
 
-def build_goals_prediction_block(match: MatchDict) -> Tuple[str, str, float]:
+def collect_match_features(match: MatchDict) -> MatchFeatures:
     """
-    Construye el bloque de GOLES para un partido y devuelve:
-    - el bloque de texto
-    - la apuesta candidata en goles
-    - una puntuación de confianza (0.0 - 1.0)
+    Reúne las entradas numéricas del scoring para un partido:
+    - goles de temporada (teams/statistics) y forma reciente (últimos 10 partidos)
+    - tarjetas de temporada de ambos equipos
+    - media de tarjetas del árbitro (índice local), si hay datos de tarjetas
 
-    Combina:
-    - estadísticas de la temporada (teams/statistics)
-    - forma reciente (últimos N partidos vía fixtures)
+    Aquí es donde se hacen las llamadas a API-Football.
     """
     home_id = match["home_team_id"]
     away_id = match["away_team_id"]
-    home_name = match["home_team"]
-    away_name = match["away_team"]
 
     if home_id is None or away_id is None:
-        block_lines = [
-            "🔹 Goles: Sin datos suficientes de los equipos en API-Football",
-            "   💬 No se han encontrado IDs válidos de equipo para este partido.",
-        ]
-        return "\n".join(block_lines), "Sin apuesta clara en goles", 0.0
-
-    # Stats de temporada
-    home_season: TeamGoalsStats = get_team_goals_stats(home_id)
-    away_season: TeamGoalsStats = get_team_goals_stats(away_id)
-
-    # Forma reciente (últimos 10 partidos)
-    home_recent: TeamRecentGoalsStats = get_team_recent_goals_stats(home_id, last_n=10)
-    away_recent: TeamRecentGoalsStats = get_team_recent_goals_stats(away_id, last_n=10)
-
-    # Pesos temporada / reciente según nº partidos recientes
-    def compute_weights(matches_recent: int) -> Tuple[float, float]:
-        if matches_recent >= 8:
-            return 0.5, 0.5
-        elif matches_recent >= 5:
-            return 0.6, 0.4
-        elif matches_recent >= 3:
-            return 0.7, 0.3
-        else:
-            return 0.8, 0.2
-
-    home_w_season, home_w_recent = compute_weights(home_recent.matches)
-    away_w_season, away_w_recent = compute_weights(away_recent.matches)
-
-    # % over 0.5 y 1.5 por equipo (combina temporada + reciente)
-    home_over_0_5_comb = (
-        home_season.over_0_5_rate * home_w_season
-        + home_recent.over_0_5_rate * home_w_recent
-    )
-    home_over_1_5_comb = (
-        home_season.over_1_5_rate * home_w_season
-        + home_recent.over_1_5_rate * home_w_recent
+        return MatchFeatures(fixture_id=match.get("fixture_id"), has_team_ids=False)
+
+    home_season: TeamGoalsStats
+    away_season: TeamGoalsStats
+    home_recent: TeamRecentGoalsStats
+    away_recent: TeamRecentGoalsStats
+    home_cards: TeamCardsStats
+    away_cards: TeamCardsStats
+    home_season, away_season, home_recent, away_recent, home_cards, away_cards = parallel_calls(
+        lambda: get_team_goals_stats(home_id),
+        lambda: get_team_goals_stats(away_id),
+        lambda: get_team_recent_goals_stats(home_id, last_n=10),
+        lambda: get_team_recent_goals_stats(away_id, last_n=10),
+        lambda: get_team_cards_stats(home_id),
+        lambda: get_team_cards_stats(away_id),
+        max_workers=settings.pipeline_workers,
     )
 
-    away_over_0_5_comb = (
-        away_season.over_0_5_rate * away_w_season
-        + away_recent.over_0_5_rate * away_w_recent
-    )
-    away_over_1_5_comb = (
-        away_season.over_1_5_rate * away_w_season
-        + away_recent.over_1_5_rate * away_w_recent
+    features = MatchFeatures(
+        fixture_id=match.get("fixture_id"),
+        has_team_ids=True,
+        home_season_over_0_5=home_season.over_0_5_rate,
+        home_season_over_1_5=home_season.over_1_5_rate,
+        home_season_goals_avg=home_season.goals_for_avg + home_season.goals_against_avg,
+        away_season_over_0_5=away_season.over_0_5_rate,
+        away_season_over_1_5=away_season.over_1_5_rate,
+        away_season_goals_avg=away_season.goals_for_avg + away_season.goals_against_avg,
+        home_recent_matches=home_recent.matches,
+        home_recent_over_0_5=home_recent.over_0_5_rate,
+        home_recent_over_1_5=home_recent.over_1_5_rate,
+        home_recent_goals_avg=home_recent.goals_for_avg + home_recent.goals_against_avg,
+        away_recent_matches=away_recent.matches,
+        away_recent_over_0_5=away_recent.over_0_5_rate,
+        away_recent_over_1_5=away_recent.over_1_5_rate,
+        away_recent_goals_avg=away_recent.goals_for_avg + away_recent.goals_against_avg,
+        home_cards_matches=home_cards.matches,
+        home_yellow_avg=home_cards.yellow_avg,
+        home_red_avg=home_cards.red_avg,
+        home_cards_weighted_avg=home_cards.cards_weighted_avg,
+        away_cards_matches=away_cards.matches,
+        away_yellow_avg=away_cards.yellow_avg,
+        away_red_avg=away_cards.red_avg,
+        away_cards_weighted_avg=away_cards.cards_weighted_avg,
     )
 
-    # Combinados del partido (media de ambos equipos)
-    combined_over_0_5_rate = (home_over_0_5_comb + away_over_0_5_comb) / 2
-    combined_over_1_5_rate = (home_over_1_5_comb + away_over_1_5_comb) / 2
+    # Sin partidos de alguno de los dos no hay bloque de tarjetas (ni árbitro)
+    if home_cards.matches == 0 or away_cards.matches == 0:
+        return features
+
+    referee_name = match.get("referee")
+    raw_ref_name = referee_name.strip() if isinstance(referee_name, str) else None
+    print(f"[DEBUG] Árbitro para {match['home_team']} – {match['away_team']}: {raw_ref_name!r}")
+
+    features.referee_name = raw_ref_name or None
+    if raw_ref_name:
+        try:
+            ref_stats: RefereeCardsStats = get_referee_cards_stats(raw_ref_name, last_n=15)
+            features.referee_matches = ref_stats.matches
+            features.referee_cards_avg = ref_stats.total_cards_avg
+        except Exception as e:
+            print(f"[DEBUG] Error obteniendo stats del árbitro '{raw_ref_name}': {e}")
+
+    return features
+
+
+def collect_card_players(match: MatchDict) -> Tuple[List[PlayerCardsStats], List[PlayerCardsStats]]:
+    """
+    Jugadores más propensos a tarjeta de cada equipo (solo para el texto).
+    """
+    try:
+        home_players, away_players = parallel_calls(
+            lambda: get_team_players_cards_stats(match["home_team_id"], top_n=2),
+            lambda: get_team_players_cards_stats(match["away_team_id"], top_n=2),
+            max_workers=settings.pipeline_workers,
+        )
+    except Exception:
+        return [], []
+    return home_players, away_players
+
+
+# =========================
+# 3. Texto de los bloques de GOLES, TARJETAS y FALTAS
+# =========================
+
+@timed()
+def format_goals_block(match: MatchDict, f: MatchFeatures, goals_code: int) -> str:
+    """
+    Texto del bloque de GOLES a partir de las features y del pick elegido
+    por el scoring (scoring.GOALS_*).
+    """
+    home_name = match["home_team"]
+    away_name = match["away_team"]
 
     lines: List[str] = []
 
-    if combined_over_0_5_rate >= 0.9:
+    if goals_code == GOALS_NO_PICK:
+        lines.append("🔹 Goles: Sin datos suficientes de los equipos en API-Football")
+        lines.append("   💬 No se han encontrado IDs válidos de equipo para este partido.")
+
+    elif goals_code == GOALS_OVER_0_5:
         lines.append("🔹 Goles: Más de 0.5 goles en el partido")
         lines.append(
             f"   💬 {home_name} y {away_name} presentan un porcentaje combinado altísimo de partidos con gol.\n"
-            f"       • Temporada: {home_season.over_0_5_rate * 100:.0f}% / {away_season.over_0_5_rate * 100:.0f}% over 0.5\n"
-            f"       • Últimos {home_recent.matches} y {away_recent.matches} partidos: "
-            f"{home_recent.over_0_5_rate * 100:.0f}% / {away_recent.over_0_5_rate * 100:.0f}% over 0.5."
+            f"       • Temporada: {f.home_season_over_0_5 * 100:.0f}% / {f.away_season_over_0_5 * 100:.0f}% over 0.5\n"
+            f"       • Últimos {f.home_recent_matches} y {f.away_recent_matches} partidos: "
+            f"{f.home_recent_over_0_5 * 100:.0f}% / {f.away_recent_over_0_5 * 100:.0f}% over 0.5."
         )
-        estrella = "Más de 0.5 goles"
-        confidence = 0.95
 
-    elif combined_over_1_5_rate >= 0.7:
+    elif goals_code == GOALS_OVER_1_5:
         lines.append("🔹 Goles: Más de 1.5 goles en el partido")
         lines.append(
             f"   💬 El % combinado de over 1.5 es sólido considerando temporada y forma reciente.\n"
-            f"       • Temporada: {home_season.over_1_5_rate * 100:.0f}% / {away_season.over_1_5_rate * 100:.0f}% over 1.5\n"
-            f"       • Últimos {home_recent.matches} y {away_recent.matches} partidos: "
-            f"{home_recent.over_1_5_rate * 100:.0f}% / {away_recent.over_1_5_rate * 100:.0f}% over 1.5."
+            f"       • Temporada: {f.home_season_over_1_5 * 100:.0f}% / {f.away_season_over_1_5 * 100:.0f}% over 1.5\n"
+            f"       • Últimos {f.home_recent_matches} y {f.away_recent_matches} partidos: "
+            f"{f.home_recent_over_1_5 * 100:.0f}% / {f.away_recent_over_1_5 * 100:.0f}% over 1.5."
         )
-        estrella = "Más de 1.5 goles"
-        confidence = 0.85
 
     else:
         lines.append("🔹 Goles: Menos de 3.5 goles en el partido")
         lines.append(
             f"   💬 Tendencia moderada en goles según temporada y forma reciente.\n"
-            f"       • Temporada: {home_season.goals_for_avg + home_season.goals_against_avg:.2f} / "
-            f"{away_season.goals_for_avg + away_season.goals_against_avg:.2f} goles totales de media\n"
-            f"       • Últimos {home_recent.matches} y {away_recent.matches} partidos: "
-            f"{home_recent.goals_for_avg + home_recent.goals_against_avg:.2f} / "
-            f"{away_recent.goals_for_avg + away_recent.goals_against_avg:.2f} goles totales de media.\n"
+            f"       • Temporada: {f.home_season_goals_avg:.2f} / "
+            f"{f.away_season_goals_avg:.2f} goles totales de media\n"
+            f"       • Últimos {f.home_recent_matches} y {f.away_recent_matches} partidos: "
+            f"{f.home_recent_goals_avg:.2f} / "
+            f"{f.away_recent_goals_avg:.2f} goles totales de media.\n"
             "       Preferimos una línea conservadora a la baja (under 3.5)."
         )
-        estrella = "Menos de 3.5 goles"
-        confidence = 0.65
 
-    return "\n".join(lines), estrella, confidence
+    return "\n".join(lines)
 
 
-# =========================
-# 3. Bloque de TARJETAS y FALTAS
-# =========================
-
-def build_cards_prediction_block(match: MatchDict) -> Tuple[str, Optional[str], float]:
+@timed()
+def format_cards_block(
+    match: MatchDict,
+    f: MatchFeatures,
+    cards_pick: Optional[str],
+    players: Tuple[List[PlayerCardsStats], List[PlayerCardsStats]] = ([], []),
+) -> str:
     """
-    Construye el bloque de TARJETAS para un partido usando:
-    - estadísticas de tarjetas de los equipos (teams/statistics, cards_weighted_avg)
-    - media de tarjetas del árbitro (últimos partidos)
-    - jugadores más propensos a tarjeta en cada equipo
-
-    Devuelve:
-    - bloque de texto
-    - apuesta candidata de tarjetas (o None si no la hay)
-    - confianza (0.0 - 1.0)
+    Texto del bloque de TARJETAS: línea elegida (o aviso de pocas tarjetas),
+    árbitro y jugadores propensos a tarjeta.
     """
-    home_id = match["home_team_id"]
-    away_id = match["away_team_id"]
     home_name = match["home_team"]
     away_name = match["away_team"]
-    referee_name = match.get("referee")
 
-    if home_id is None or away_id is None:
+    if not f.has_team_ids:
         return (
             "🔹 Tarjetas: Sin datos suficientes de los equipos en API-Football\n"
-            "   💬 Faltan IDs válidos de equipo para poder calcular tarjetas.",
-            None,
-            0.0,
+            "   💬 Faltan IDs válidos de equipo para poder calcular tarjetas."
         )
 
-    home_stats: TeamCardsStats = get_team_cards_stats(home_id)
-    away_stats: TeamCardsStats = get_team_cards_stats(away_id)
-
     # Si alguno no tiene partidos, mejor no forzar nada
-    if home_stats.matches == 0 or away_stats.matches == 0:
+    if f.home_cards_matches == 0 or f.away_cards_matches == 0:
         return (
             "🔹 Tarjetas: Sin datos suficientes de la temporada\n"
-            "   💬 Alguno de los equipos tiene 0 partidos registrados en la temporada actual.",
-            None,
-            0.0,
+            "   💬 Alguno de los equipos tiene 0 partidos registrados en la temporada actual."
         )
 
-    combined_weighted = home_stats.cards_weighted_avg + away_stats.cards_weighted_avg
+    combined_weighted = f.home_cards_weighted_avg + f.away_cards_weighted_avg
 
     lines: List[str] = []
 
     # 🔒 Caso conservador: medias muy bajas -> NO recomendar apuesta de tarjetas
-    if combined_weighted < 3.0:
+    if cards_pick is None:
         lines.append("🔹 Tarjetas: Partido a priori de pocas tarjetas")
         lines.append(
             "   💬 Las medias de tarjetas de ambos equipos son bajas en la temporada actual.\n"
-            f"       • {home_name}: {home_stats.yellow_avg:.2f} amarillas y {home_stats.red_avg:.2f} rojas de media\n"
-            f"       • {away_name}: {away_stats.yellow_avg:.2f} amarillas y {away_stats.red_avg:.2f} rojas de media\n"
+            f"       • {home_name}: {f.home_yellow_avg:.2f} amarillas y {f.home_red_avg:.2f} rojas de media\n"
+            f"       • {away_name}: {f.away_yellow_avg:.2f} amarillas y {f.away_red_avg:.2f} rojas de media\n"
             "       Preferimos no forzar una línea alta de tarjetas en este encuentro."
         )
-        cards_candidate: Optional[str] = None
-        confidence = 0.4
     else:
-        # Decidir la línea en función de la media combinada de tarjetas
-        if combined_weighted >= 7.0:
-            line_value = 5.5
-            confidence = 0.85
-        elif combined_weighted >= 5.5:
-            line_value = 4.5
-            confidence = 0.8
-        elif combined_weighted >= 4.0:
-            line_value = 3.5
-            confidence = 0.7
-        else:
-            line_value = 3.5
-            confidence = 0.55
-
-        lines.append(f"🔹 Tarjetas: Más de {line_value:.1f} tarjetas totales")
+        lines.append(f"🔹 Tarjetas: {cards_pick}")
         lines.append(
             "   💬 En la temporada actual, los partidos de "
             f"{home_name} y {away_name} acumulan una media combinada cercana a "
             f"{combined_weighted:.2f} tarjetas por partido "
-            f"({home_name}: {home_stats.cards_weighted_avg:.2f}, "
-            f"{away_name}: {away_stats.cards_weighted_avg:.2f})."
+            f"({home_name}: {f.home_cards_weighted_avg:.2f}, "
+            f"{away_name}: {f.away_cards_weighted_avg:.2f})."
         )
 
-        cards_candidate = f"Más de {line_value:.1f} tarjetas totales"
-
-    # ===== Árbitro: media de tarjetas (si hay info) =====
-    ref_stats: Optional[RefereeCardsStats] = None
-    raw_ref_name = referee_name.strip() if isinstance(referee_name, str) else None
-    print(f"[DEBUG] Árbitro para {home_name} – {away_name}: {raw_ref_name!r}")
-
-    if raw_ref_name:
-        try:
-            ref_stats = get_referee_cards_stats(raw_ref_name, last_n=15)
-        except Exception as e:
-            print(f"[DEBUG] Error obteniendo stats del árbitro '{raw_ref_name}': {e}")
-            ref_stats = None
-
-    if ref_stats and ref_stats.matches > 0:
-        lines.append(f"   👨‍⚖️ Árbitro: {ref_stats.name}")
+    # ===== Árbitro =====
+    if f.referee_name and f.referee_matches > 0:
+        lines.append(f"   👨‍⚖️ Árbitro: {f.referee_name}")
         lines.append(
-            f"       • Media de {ref_stats.total_cards_avg:.2f} tarjetas por partido "
-            f"en sus últimos {ref_stats.matches} encuentros de liga."
+            f"       • Media de {f.referee_cards_avg:.2f} tarjetas por partido "
+            f"en sus últimos {f.referee_matches} encuentros de liga."
         )
-
-        # Ajuste suave de confianza según lo tarjetero que sea el árbitro
-        if cards_candidate is not None:
-            if ref_stats.total_cards_avg >= 6.5:
-                confidence += 0.05
-            elif ref_stats.total_cards_avg <= 4.0:
-                confidence -= 0.05
-
-    elif raw_ref_name:
-        lines.append(f"   👨‍⚖️ Árbitro: {raw_ref_name}")
+    elif f.referee_name:
+        lines.append(f"   👨‍⚖️ Árbitro: {f.referee_name}")
         lines.append(
             "       • No hay suficientes datos recientes en la API para estimar su media de tarjetas."
         )
@@ -318,19 +348,8 @@ def build_cards_prediction_block(match: MatchDict) -> Tuple[str, Optional[str],
             "       • La API todavía no proporciona el árbitro asignado a este partido."
         )
 
-    # Normalizar confianza
-    confidence = max(0.4, min(confidence, 0.95))
-
     # ===== Jugadores propensos a tarjeta =====
-    home_players: List[PlayerCardsStats] = []
-    away_players: List[PlayerCardsStats] = []
-
-    try:
-        home_players = get_team_players_cards_stats(home_id, top_n=2)
-        away_players = get_team_players_cards_stats(away_id, top_n=2)
-    except Exception:
-        home_players = []
-        away_players = []
+    home_players, away_players = players
 
     if home_players or away_players:
         lines.append("   🧨 Jugadores propensos a tarjeta:")
@@ -349,8 +368,9 @@ def build_cards_prediction_block(match: MatchDict) -> Tuple[str, Optional[str],
             )
             lines.append(f"       • {away_name}: {desc}")
 
-    return "\n".join(lines), cards_candidate, confidence
+    return "\n".join(lines)
 
+@timed()
 def build_fouls_prediction_block(match: MatchDict) -> str:
     """
     De momento mantenemos un placeholder para FALTAS.
@@ -365,7 +385,108 @@ def build_fouls_prediction_block(match: MatchDict) -> str:
 # 4. Predicciones por partido
 # =========================
 
-def build_predictions_for_match(match: MatchDict) -> str:
+@dataclass
+class MatchPrediction:
+    """
+    Resultado estructurado de un partido: se calcula UNA vez por ejecución y
+    de él se renderizan tanto el texto de Telegram como el payload JSON.
+    """
+    match: MatchDict
+    goals_block: str
+    goals_pick: str
+    goals_conf: float
+    cards_block: str
+    cards_pick: Optional[str]
+    cards_conf: float
+    fouls_block: str
+    star_type: str
+    star_pick: str
+    star_conf: float
+    features: Optional[MatchFeatures] = None
+
+
+def _collect(match: MatchDict) -> CollectedInputs:
+    with span("collect_match_features"):
+        features = collect_match_features(match)
+    players: Tuple[List[PlayerCardsStats], List[PlayerCardsStats]] = ([], [])
+    # Jugadores: dato opcional, se omite si la cuota diaria está en la reserva
+    has_cards = features.home_cards_matches > 0 and features.away_cards_matches > 0
+    if has_cards and get_quota_status().optional_allowed:
+        players = collect_card_players(match)
+    return features, players
+
+
+def collect_matches(matches: List[MatchDict]) -> List[CollectedInputs]:
+    """
+    Features y jugadores de cada partido (en paralelo, PIPELINE_WORKERS hilos).
+    Dentro de cada hilo, los parallel_calls de collect_match_features y
+    collect_card_players van en secuencial (ver parallel.py).
+    """
+    return parallel_map(_collect, matches, max_workers=settings.pipeline_workers)
+
+
+def score_and_render(
+    matches: List[MatchDict],
+    collected: List[CollectedInputs],
+    params: ScoringParams = DEFAULT_PARAMS,
+) -> List[MatchPrediction]:
+    """
+    Puntúa toda la jornada de una vez (scoring.score_features) y genera los
+    bloques de texto. No hace llamadas a la API.
+    """
+    with span("score_matches"):
+        scores = score_features([features for features, _players in collected], params)
+
+    predictions: List[MatchPrediction] = []
+    for i, (match, (features, players)) in enumerate(zip(matches, collected)):
+        goals_pick = scores.goals_pick(i)
+        cards_pick = scores.cards_pick(i)
+        star_type, star_pick, star_conf = scores.star(i)
+
+        predictions.append(MatchPrediction(
+            match=match,
+            goals_block=format_goals_block(match, features, int(scores.goals_code[i])),
+            goals_pick=goals_pick,
+            goals_conf=float(scores.goals_conf[i]),
+            cards_block=format_cards_block(match, features, cards_pick, players),
+            cards_pick=cards_pick,
+            cards_conf=float(scores.cards_conf[i]),
+            fouls_block=build_fouls_prediction_block(match),
+            star_type=star_type,
+            star_pick=star_pick,
+            star_conf=star_conf,
+            features=features,
+        ))
+    return predictions
+
+
+def predict_matches(matches: List[MatchDict], params: ScoringParams = DEFAULT_PARAMS) -> List[MatchPrediction]:
+    """
+    1) Reúne las features de cada partido (en paralelo).
+    2) Puntúa toda la jornada de una vez.
+    3) Genera los bloques de texto.
+    """
+    return score_and_render(matches, collect_matches(matches), params)
+
+
+def replay_match_predictions(as_of: str, params: ScoringParams = DEFAULT_PARAMS) -> List[MatchPrediction]:
+    """
+    Vuelve a generar las predicciones de una ejecución pasada a partir del
+    feature store (sin llamadas a la API). Útil para probar cambios del modelo
+    o de los umbrales sobre exactamente lo que vio el bot ese día.
+    """
+    matches, collected = load_matchday(as_of)
+    return score_and_render(matches, collected, params)
+
+
+def build_match_prediction(match: MatchDict) -> MatchPrediction:
+    """
+    Calcula goles, tarjetas, faltas y apuesta estrella de un partido.
+    """
+    return predict_matches([match])[0]
+
+
+def render_match_text(prediction: MatchPrediction) -> str:
     """
     Construye el bloque completo de un partido:
     - Cabecera
@@ -374,6 +495,7 @@ def build_predictions_for_match(match: MatchDict) -> str:
     - Faltas
     - Apuesta estrella (elige entre goles y tarjetas)
     """
+    match = prediction.match
     home = match["home_team"]
     away = match["away_team"]
     kickoff = match["kickoff"]
@@ -386,139 +508,149 @@ def build_predictions_for_match(match: MatchDict) -> str:
     lines.append(f"🟩 <b>{home} – {away}</b>  <i>({kickoff})</i>")
     lines.append("")  # línea en blanco antes de los bloques de goles/tarjetas/faltas
 
-    # 1) Goles
-    goals_block, goals_star_bet, goals_conf = build_goals_prediction_block(match)
-    lines.append(goals_block)
-
-    # 2) Tarjetas
-    cards_block, cards_star_bet, cards_conf = build_cards_prediction_block(match)
-    lines.append(cards_block)
-
-    # 3) Faltas (placeholder)
-    fouls_block = build_fouls_prediction_block(match)
-    lines.append(fouls_block)
-
-    # 4) Apuesta estrella (según confianza)
-    if goals_conf >= 0.9:
-        star_bet = goals_star_bet
-        star_source = "goles"
-    elif cards_star_bet is not None and cards_conf > goals_conf:
-        star_bet = cards_star_bet
-        star_source = "tarjetas"
-    else:
-        star_bet = goals_star_bet
-        star_source = "goles"
+    lines.append(prediction.goals_block)
+    lines.append(prediction.cards_block)
+    lines.append(prediction.fouls_block)
 
-    lines.append(f"⭐ Apuesta estrella ({star_source}): {star_bet}")
+    lines.append(f"⭐ Apuesta estrella ({prediction.star_type}): {prediction.star_pick}")
     lines.append("   💬 Basada en la probabilidad estadística de la línea seleccionada (goles/tarjetas).")
 
     return "\n".join(lines)
 
 
+def build_predictions_for_match(match: MatchDict) -> str:
+    return render_match_text(build_match_prediction(match))
+
+
 # =========================
 # 5. Mensaje diario completo
 # =========================
 
-def build_daily_message() -> str:
+def render_daily_message(predictions: List[MatchPrediction]) -> str:
     """
     Construye el mensaje completo que se enviará a Telegram:
     - Título del día
     - Bloques por partido
     """
-    matches = get_todays_matches()
-    today_str = date.today().strftime("%d/%m/%Y")
+    today_str = run_date().strftime("%d/%m/%Y")
 
-    if not matches:
+    if not predictions:
         return f"🏆 LaLiga – Pronósticos ({today_str})\n\nHoy no hay partidos de LaLiga programados."
 
     blocks: List[str] = [f"🏆 LaLiga – Pronósticos ({today_str})", ""]
 
-    for idx, match in enumerate(matches, start=1):
-        blocks.append(f"{idx}️⃣ {build_predictions_for_match(match)}")
+    for idx, prediction in enumerate(predictions, start=1):
+        blocks.append(f"{idx}️⃣ {render_match_text(prediction)}")
         blocks.append("")  # Línea en blanco entre partidos
 
     return "\n".join(blocks).strip()
 
-# =========================
-# 6. Payload estructurado (para web/stats)
-# =========================
 
-def _clamp(x: float, lo: float = 0.0, hi: float = 1.0) -> float:
+def build_match_predictions(matches: List[MatchDict]) -> List[MatchPrediction]:
+    """
+    Predicciones de la jornada, en el mismo orden que los partidos (hora de inicio).
+
+    Antes de empezar, vacía el memo de snapshots de equipo y actualiza el
+    índice de árbitros con lo que get_todays_matches ha sincronizado. Las
+    entradas de cada partido quedan en el feature store (día de ejecución).
+    """
+    clear_team_season_snapshots()
+
+    if matches:
+        try:
+            added = refresh_referee_index()
+            print(f"[INFO] Índice de árbitros actualizado: {added} partidos nuevos.")
+        except Exception as e:
+            print(f"[DEBUG] Error actualizando el índice de árbitros: {e}")
+
+    collected = collect_matches(matches)
+
+    quota = get_quota_status()
+    if quota.daily_remaining is not None:
+        print(
+            f"[INFO] Cuota API-Football restante hoy: {quota.daily_remaining}"
+            f"{f'/{quota.daily_limit}' if quota.daily_limit else ''} "
+            f"(esperas: {quota.waited_seconds:.1f}s, llamadas sin cuota: {quota.rejected})"
+        )
+    if not quota.optional_allowed:
+        print("[WARN] Cuota diaria en la reserva: se omiten los datos opcionales (jugadores).")
+
+    # Guardamos las entradas del scoring para poder repetir la jornada sin API
     try:
-        v = float(x)
-    except Exception:
-        v = 0.0
-    if v < lo:
-        return lo
-    if v > hi:
-        return hi
-    return v
+        with span("db_write", table="match_features"):
+            saved = save_match_features(run_date().isoformat(), matches, collected)
+        if saved:
+            print(f"[INFO] Feature store: {saved} partidos guardados.")
+    except Exception as e:
+        print(f"[DEBUG] Error guardando features de la jornada: {e}")
 
+    return score_and_render(matches, collected)
 
-def build_match_payload(match: MatchDict) -> Dict[str, Any]:
-    home = match.get("home_team")
-    away = match.get("away_team")
-    kickoff = match.get("kickoff")
-    fixture_id = match.get("fixture_id")
-    referee = match.get("referee")
-
-    goals_block, goals_pick, goals_conf = build_goals_prediction_block(match)
-    cards_block, cards_pick, cards_conf = build_cards_prediction_block(match)
-
-    goals_conf = _clamp(goals_conf)
-    cards_conf = _clamp(cards_conf)
-
-    cards_pick_str: Optional[str] = str(cards_pick) if cards_pick is not None else None
-
-    # ⭐ Star logic
-    if goals_conf >= 0.90:
-        star_type = "goles"
-        star_pick = goals_pick
-        star_conf = goals_conf
-    elif cards_pick_str is not None and cards_conf > goals_conf:
-        star_type = "tarjetas"
-        star_pick = cards_pick_str
-        star_conf = cards_conf
-    else:
-        star_type = "goles"
-        star_pick = goals_pick
-        star_conf = goals_conf
 
+def build_daily_message() -> str:
+    return render_daily_message(build_match_predictions(get_todays_matches()))
+
+# =========================
+# 6. Payload estructurado (para web/stats)
+# =========================
+
+def render_match_payload(prediction: MatchPrediction) -> Dict[str, Any]:
+    match = prediction.match
     return {
-        "home": home,
-        "away": away,
-        "kickoff": kickoff,
-        "fixture_id": fixture_id,
-        "referee": referee,
+        "home": match.get("home_team"),
+        "away": match.get("away_team"),
+        "kickoff": match.get("kickoff"),
+        "fixture_id": match.get("fixture_id"),
+        "referee": match.get("referee"),
         "picks": {
-            "goles": {"pick": goals_pick, "confidence": goals_conf, "block": goals_block},
-            "tarjetas": {"pick": cards_pick_str, "confidence": cards_conf, "block": cards_block},
+            "goles": {
+                "pick": prediction.goals_pick,
+                "confidence": prediction.goals_conf,
+                "block": prediction.goals_block,
+            },
+            "tarjetas": {
+                "pick": prediction.cards_pick,
+                "confidence": prediction.cards_conf,
+                "block": prediction.cards_block,
+            },
+        },
+        "star": {
+            "type": prediction.star_type,
+            "pick": prediction.star_pick,
+            "confidence": prediction.star_conf,
         },
-        "star": {"type": star_type, "pick": star_pick, "confidence": star_conf},
     }
 
-def build_daily_payload() -> Dict[str, Any]:
-    matches = get_todays_matches()
-    today_str = date.today().isoformat()
+
+def build_match_payload(match: MatchDict) -> Dict[str, Any]:
+    return render_match_payload(build_match_prediction(match))
+
+
+def render_daily_payload(predictions: List[MatchPrediction]) -> Dict[str, Any]:
+    today_str = run_date().isoformat()
 
     # Si hemos añadido match_date en cada match, tomamos la primera
     target_day = today_str
-    if matches and isinstance(matches[0].get("match_date"), str):
-        target_day = matches[0]["match_date"]
-
-    payload_matches: List[Dict[str, Any]] = []
-    for m in matches:
-        payload_matches.append(build_match_payload(m))
+    if predictions and isinstance(predictions[0].match.get("match_date"), str):
+        target_day = predictions[0].match["match_date"]
 
     return {
         "day": today_str,          # día de ejecución
         "target_day": target_day,  # día real con partidos
         "league": "LaLiga",
         "season": settings.api_football_season,
-        "matches": payload_matches,
+        "matches": [render_match_payload(p) for p in predictions],
     }
 
+def build_daily_payload() -> Dict[str, Any]:
+    return render_daily_payload(build_match_predictions(get_todays_matches()))
+
 def build_daily_message_and_payload() -> Tuple[str, Dict[str, Any]]:
-    text = build_daily_message()
-    payload = build_daily_payload()
+    """
+    Una sola pasada: pedimos los partidos y calculamos cada predicción una vez,
+    y de ahí sacamos tanto el texto como el payload.
+    """
+    predictions = build_match_predictions(get_todays_matches())
+    text = render_daily_message(predictions)
+    payload = render_daily_payload(predictions)
     return text, payload
@@ -0,0 +1,376 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from .config import settings
+
+
+# =========================
+# Esquema de predictions.db (compartido por main.py y la web)
+# =========================
+#
+# - predictions: una fila por día con el texto y el payload JSON completos.
+# - prediction_matches: una fila por partido (normalizada e indexada) para
+#   stats y filtros en SQL sin tener que parsear los payloads.
+# - prediction_daily_stats / prediction_totals / prediction_daily_picks /
+#   prediction_daily_teams: agregados materializados que se actualizan en cada
+#   escritura (restando lo anterior si se reemplaza un día), para que /stats
+#   sume filas por día ya calculadas en vez de recorrer prediction_matches.
+#   Las confianzas se suman en puntos básicos (enteros, CONF_SCALE): así las
+#   sumas incrementales coinciden exactamente con las de
+#   rebuild_prediction_aggregates. prediction_totals.version sube con cada
+#   escritura: la web lo usa como versión de la lista de días.
+#
+# La BD va en modo WAL: la web lee mientras el cron escribe sin bloquearse.
+
+
+def connect_predictions_db(
+    path: Union[str, Path],
+    check_same_thread: bool = True,
+    read_only: bool = False,
+) -> sqlite3.Connection:
+    """
+    Abre predictions.db con la configuración común (WAL, synchronous=NORMAL,
+    caché de páginas, mmap y caché de sentencias preparadas).
+    read_only: solo lectura (mode=ro); no crea el fichero ni cambia el journal.
+    """
+    conn = sqlite3.connect(
+        f"{Path(path).resolve().as_uri()}?mode=ro" if read_only else path,
+        timeout=settings.sqlite_busy_timeout,
+        check_same_thread=check_same_thread,
+        cached_statements=settings.sqlite_cached_statements,
+        uri=read_only,
+    )
+    if not read_only:
+        try:
+            # El modo WAL queda guardado en el fichero; si otro proceso tiene la BD
+            # bloqueada justo ahora, lo activará la siguiente conexión
+            conn.execute("PRAGMA journal_mode=WAL")
+        except sqlite3.OperationalError:
+            pass
+        conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA cache_size=-{int(settings.sqlite_cache_size_kib)}")
+    conn.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+    return conn
+
+
+def init_predictions_db(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS predictions (
+            day TEXT PRIMARY KEY,
+            content TEXT NOT NULL,
+            payload_json TEXT,
+            created_at TEXT NOT NULL DEFAULT (datetime('now'))
+        )
+        """
+    )
+
+    # Migración suave: columnas añadidas después de crear la tabla
+    cols = [r[1] for r in conn.execute("PRAGMA table_info(predictions)").fetchall()]
+    if "payload_json" not in cols:
+        conn.execute("ALTER TABLE predictions ADD COLUMN payload_json TEXT")
+    if "matches_indexed" not in cols:
+        # 1 = el payload es válido y sus partidos están en prediction_matches
+        conn.execute("ALTER TABLE predictions ADD COLUMN matches_indexed INTEGER NOT NULL DEFAULT 0")
+    if "metrics_json" not in cols:
+        # Resumen de tiempos/llamadas de la ejecución que generó el día (ver metrics.py)
+        conn.execute("ALTER TABLE predictions ADD COLUMN metrics_json TEXT")
+
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS prediction_matches (
+            day TEXT NOT NULL,
+            idx INTEGER NOT NULL,  -- posición del partido en el payload
+            fixture_id INTEGER,
+            home TEXT,
+            away TEXT,
+            kickoff TEXT,
+            referee TEXT,
+            goals_pick TEXT,
+            goals_conf REAL,
+            cards_pick TEXT,
+            cards_conf REAL,
+            star_type TEXT,
+            star_pick TEXT,
+            star_conf REAL,
+            PRIMARY KEY (day, idx)
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_pm_home ON prediction_matches(home)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_pm_away ON prediction_matches(away)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_pm_star_type ON prediction_matches(star_type, day)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_pm_star_conf ON prediction_matches(star_conf)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_pm_fixture ON prediction_matches(fixture_id)")
+
+    _init_aggregates(conn)
+    backfill_prediction_matches(conn)
+    conn.commit()
+
+
+CONF_SCALE = 10_000  # confianza 0.0-1.0 -> puntos básicos
+
+
+def _conf_bp(x: Optional[float]) -> int:
+    return int(round((x or 0.0) * CONF_SCALE))
+
+
+def _init_aggregates(conn: sqlite3.Connection) -> None:
+    # Migración: las primeras versiones sumaban las confianzas en REAL
+    cols = [r[1] for r in conn.execute("PRAGMA table_info(prediction_totals)").fetchall()]
+    if cols and "conf_bp_sum" not in cols:
+        conn.execute("DROP TABLE prediction_totals")
+        conn.execute("DROP TABLE IF EXISTS prediction_daily_stats")
+    # Migración: contadores globales de picks/equipos -> contadores por día
+    conn.execute("DROP TABLE IF EXISTS prediction_pick_counts")
+    conn.execute("DROP TABLE IF EXISTS prediction_team_counts")
+    daily_counts_exist = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'prediction_daily_picks'"
+    ).fetchone() is not None
+
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS prediction_daily_stats (
+            day TEXT PRIMARY KEY,
+            has_payload INTEGER NOT NULL,
+            matches INTEGER NOT NULL,
+            stars_goles INTEGER NOT NULL,
+            stars_tarjetas INTEGER NOT NULL,
+            stars_other INTEGER NOT NULL,
+            conf_bp_sum INTEGER NOT NULL,  -- suma de confianzas en puntos básicos
+            conf_n INTEGER NOT NULL  -- nº de estrellas con confianza != 0
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS prediction_totals (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            days INTEGER NOT NULL,
+            days_with_payload INTEGER NOT NULL,
+            matches INTEGER NOT NULL,
+            stars_goles INTEGER NOT NULL,
+            stars_tarjetas INTEGER NOT NULL,
+            stars_other INTEGER NOT NULL,
+            conf_bp_sum INTEGER NOT NULL,
+            conf_n INTEGER NOT NULL,
+            version INTEGER NOT NULL DEFAULT 0  -- +1 en cada escritura de un día
+        )
+        """
+    )
+    cols = [r[1] for r in conn.execute("PRAGMA table_info(prediction_totals)").fetchall()]
+    if "version" not in cols:
+        conn.execute("ALTER TABLE prediction_totals ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+
+    # Estrellas por pick y partidos por equipo de cada día: una ventana de N
+    # días suma como mucho N * (picks o equipos de un día) filas
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS prediction_daily_picks (
+            day TEXT NOT NULL,
+            pick TEXT NOT NULL,
+            n INTEGER NOT NULL,
+            PRIMARY KEY (day, pick)
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS prediction_daily_teams (
+            day TEXT NOT NULL,
+            team TEXT NOT NULL,
+            n INTEGER NOT NULL,
+            PRIMARY KEY (day, team)
+        )
+        """
+    )
+
+    if not daily_counts_exist or conn.execute("SELECT 1 FROM prediction_totals WHERE id = 1").fetchone() is None:
+        rebuild_prediction_aggregates(conn)
+
+
+def rebuild_prediction_aggregates(conn: sqlite3.Connection) -> None:
+    """
+    Recalcula desde cero todos los agregados a partir de predictions + prediction_matches.
+    Solo hace falta la primera vez (o si se han tocado las tablas a mano).
+    """
+    conn.execute("DELETE FROM prediction_daily_stats")
+    conn.execute("DELETE FROM prediction_daily_picks")
+    conn.execute("DELETE FROM prediction_daily_teams")
+    # version sigue subiendo (no vuelve a 0): no debe repetir una ya servida
+    conn.execute(
+        "INSERT OR REPLACE INTO prediction_totals VALUES (1, 0, 0, 0, 0, 0, 0, 0, 0, "
+        "COALESCE((SELECT version FROM prediction_totals WHERE id = 1), 0) + 1)"
+    )
+
+    days = conn.execute("SELECT day, matches_indexed FROM predictions").fetchall()
+    for day, matches_indexed in days:
+        rows = conn.execute(
+            "SELECT * FROM prediction_matches WHERE day = ? ORDER BY idx", (day,)
+        ).fetchall() if matches_indexed else []
+        _apply_day(conn, day, bool(matches_indexed), [tuple(r) for r in rows])
+
+
+def _as_float(x: Any) -> Optional[float]:
+    try:
+        return float(x)
+    except Exception:
+        return None
+
+
+def _as_str(x: Any) -> Optional[str]:
+    return str(x) if x is not None and x != "" else None
+
+
+def _match_row(day: str, idx: int, m: Dict[str, Any]) -> Tuple[Any, ...]:
+    picks = m.get("picks") if isinstance(m.get("picks"), dict) else {}
+    goals = picks.get("goles") if isinstance(picks.get("goles"), dict) else {}
+    cards = picks.get("tarjetas") if isinstance(picks.get("tarjetas"), dict) else {}
+    star = m.get("star") if isinstance(m.get("star"), dict) else None
+
+    return (
+        day,
+        idx,
+        m.get("fixture_id"),
+        _as_str(m.get("home")),
+        _as_str(m.get("away")),
+        _as_str(m.get("kickoff")),
+        _as_str(m.get("referee")),
+        _as_str(goals.get("pick")),
+        _as_float(goals.get("confidence")),
+        _as_str(cards.get("pick")),
+        _as_float(cards.get("confidence")),
+        _as_str(star.get("type")) if star is not None else None,
+        _as_str(star.get("pick")) if star is not None else None,
+        (_as_float(star.get("confidence")) or 0.0) if star is not None else None,
+    )
+
+
+def iter_match_rows(day: str, payload: Optional[Dict[str, Any]]) -> Iterator[Tuple[Any, ...]]:
+    matches = payload.get("matches") if isinstance(payload, dict) else None
+    if not isinstance(matches, list):
+        return
+    for idx, m in enumerate(matches):
+        if isinstance(m, dict):
+            yield _match_row(day, idx, m)
+
+
+# Posiciones de las columnas en una fila de prediction_matches
+_HOME, _AWAY, _STAR_TYPE, _STAR_PICK, _STAR_CONF = 3, 4, 11, 12, 13
+
+
+def _replace_daily_counts(conn: sqlite3.Connection, table: str, column: str, day: str, counts: Counter) -> None:
+    conn.execute(f"DELETE FROM {table} WHERE day = ?", (day,))
+    conn.executemany(
+        f"INSERT INTO {table}(day, {column}, n) VALUES (?, ?, ?)",
+        [(day, key, n) for key, n in counts.items() if n],
+    )
+
+
+def _apply_day(conn: sqlite3.Connection, day: str, has_payload: bool, rows: List[Tuple[Any, ...]]) -> None:
+    """
+    Sustituye la aportación de un día a los agregados: resta la fila anterior de
+    prediction_daily_stats (si existía) y suma la nueva. Los contadores de picks y
+    equipos del día se reemplazan enteros.
+    """
+    old = conn.execute("SELECT * FROM prediction_daily_stats WHERE day = ?", (day,)).fetchone()
+
+    goles = sum(1 for r in rows if r[_STAR_TYPE] == "goles")
+    tarjetas = sum(1 for r in rows if r[_STAR_TYPE] == "tarjetas")
+    new = (
+        day,
+        1 if has_payload else 0,
+        len(rows),
+        goles,
+        tarjetas,
+        len(rows) - goles - tarjetas,
+        sum(_conf_bp(r[_STAR_CONF]) for r in rows),
+        sum(1 for r in rows if r[_STAR_CONF]),
+    )
+    old_values = tuple(old)[1:] if old is not None else (0,) * 7
+
+    diff = [n - o for n, o in zip(new[1:], old_values)]
+    conn.execute(
+        "UPDATE prediction_totals SET days = days + ?, days_with_payload = days_with_payload + ?, "
+        "matches = matches + ?, stars_goles = stars_goles + ?, stars_tarjetas = stars_tarjetas + ?, "
+        "stars_other = stars_other + ?, conf_bp_sum = conf_bp_sum + ?, conf_n = conf_n + ?, "
+        "version = version + 1 WHERE id = 1",
+        (0 if old is not None else 1, *diff),
+    )
+    conn.execute("INSERT OR REPLACE INTO prediction_daily_stats VALUES (?, ?, ?, ?, ?, ?, ?, ?)", new)
+
+    picks: Counter = Counter(r[_STAR_PICK] for r in rows if r[_STAR_PICK])
+    _replace_daily_counts(conn, "prediction_daily_picks", "pick", day, picks)
+
+    teams: Counter = Counter(t for r in rows for t in (r[_HOME], r[_AWAY]) if t)
+    _replace_daily_counts(conn, "prediction_daily_teams", "team", day, teams)
+
+
+def write_prediction_matches(conn: sqlite3.Connection, day: str, payload: Optional[Dict[str, Any]]) -> None:
+    """
+    Sustituye las filas de prediction_matches de un día por las del payload y
+    actualiza los agregados materializados.
+    No hace commit: se llama dentro de la transacción que guarda la predicción.
+    """
+    indexed = isinstance(payload, dict) and isinstance(payload.get("matches"), list)
+    rows = list(iter_match_rows(day, payload))
+
+    _apply_day(conn, day, indexed, rows)
+
+    conn.execute("DELETE FROM prediction_matches WHERE day = ?", (day,))
+    conn.executemany(
+        "INSERT INTO prediction_matches("
+        "day, idx, fixture_id, home, away, kickoff, referee, "
+        "goals_pick, goals_conf, cards_pick, cards_conf, star_type, star_pick, star_conf"
+        ") VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        rows,
+    )
+    conn.execute("UPDATE predictions SET matches_indexed = ? WHERE day = ?", (1 if indexed else 0, day))
+
+
+def write_run_metrics(conn: sqlite3.Connection, day: str, summary: Optional[Dict[str, Any]]) -> None:
+    """
+    Guarda el resumen de métricas de la ejecución junto a la predicción del día.
+    No toca created_at: no invalida las páginas cacheadas de la web.
+    """
+    metrics_json = json.dumps(summary, ensure_ascii=False) if summary else None
+    conn.execute("UPDATE predictions SET metrics_json = ? WHERE day = ?", (metrics_json, day))
+
+
+def fetch_latest_run_metrics(conn: sqlite3.Connection) -> Optional[Dict[str, Any]]:
+    row = conn.execute(
+        "SELECT metrics_json FROM predictions WHERE metrics_json IS NOT NULL ORDER BY day DESC LIMIT 1"
+    ).fetchone()
+    return _parse_payload(row[0]) if row else None
+
+
+def _parse_payload(payload_json: Optional[str]) -> Optional[Dict[str, Any]]:
+    try:
+        payload = json.loads(payload_json or "")
+        return payload if isinstance(payload, dict) else None
+    except Exception:
+        return None
+
+
+def backfill_prediction_matches(conn: sqlite3.Connection) -> int:
+    """
+    Migra los días guardados antes de existir prediction_matches.
+    Solo mira los que tienen payload y aún no están indexados.
+    """
+    rows = conn.execute(
+        "SELECT day, payload_json FROM predictions WHERE matches_indexed = 0 AND payload_json IS NOT NULL"
+    ).fetchall()
+
+    migrated = 0
+    for day, payload_json in rows:
+        payload = _parse_payload(payload_json)
+        if payload is None or not isinstance(payload.get("matches"), list):
+            continue
+        write_prediction_matches(conn, day, payload)
+        migrated += 1
+    return migrated
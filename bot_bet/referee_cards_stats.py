@@ -1,8 +1,17 @@
+import json
+import re
+import unicodedata
 from dataclasses import dataclass
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Set
 
-from .api_football_client import api_football_get
 from .config import settings
+from .fixtures_store import get_finished_fixtures_with_statistics
+from .football_db import football_db
+from .metrics import timed
+
+
+# Ventana del agregado móvil por árbitro (últimos N partidos)
+INDEX_WINDOW = 15
 
 
 @dataclass
@@ -29,62 +38,138 @@ def _get_stat_value(statistics: List[Dict[str, Any]], stat_type: str) -> int:
     return 0
 
 
-def get_referee_cards_stats(referee_name: str, last_n: int = 15) -> RefereeCardsStats:
+def normalize_referee_name(name: str) -> str:
     """
-    Calcula la media de tarjetas mostradas por un árbitro en sus últimos N partidos de liga,
-    usando:
-      - /fixtures?league=...&season=...&referee={name}&last={N}
-      - /fixtures/statistics?fixture={fixture_id}
+    'J. Martínez Munuera, Spain' -> 'j martinez munuera'
+    (sin país, sin tildes, sin puntos, minúsculas y espacios colapsados).
     """
-    fixtures_data = api_football_get(
-        "/fixtures",
-        {
-            "league": settings.api_football_league_id,
-            "season": settings.api_football_season,
-            "referee": referee_name,
-            "last": last_n,
-        },
-    )
-
-    fixtures = fixtures_data.get("response", []) or []
-
-    matches = 0
-    total_cards_sum = 0
-
-    for item in fixtures:
-        fixture = item.get("fixture", {}) or {}
-        fixture_id = fixture.get("id")
-        if fixture_id is None:
+    base = name.split(",")[0]
+    base = unicodedata.normalize("NFKD", base)
+    base = "".join(c for c in base if not unicodedata.combining(c))
+    base = base.replace(".", " ").lower()
+    return re.sub(r"\s+", " ", base).strip()
+
+
+# =========================
+# Índice local de árbitros (refresco incremental)
+# =========================
+
+def cards_from_statistics(stats_response: List[Dict[str, Any]]) -> Optional[Dict[str, int]]:
+    if len(stats_response) < 2:
+        return None
+
+    # stats_response debería tener 2 entradas, una por equipo
+    team1 = stats_response[0].get("statistics", []) or []
+    team2 = stats_response[1].get("statistics", []) or []
+
+    yellow = _get_stat_value(team1, "Yellow Cards") + _get_stat_value(team2, "Yellow Cards")
+    red = _get_stat_value(team1, "Red Cards") + _get_stat_value(team2, "Red Cards")
+    return {"yellow": yellow, "red": red}
+
+
+def _update_window_aggregates(conn: Any, league_id: int, season: int, referee_keys: Set[str]) -> None:
+    for key in referee_keys:
+        rows = conn.execute(
+            "SELECT referee_name, total_cards FROM referee_fixtures "
+            "WHERE league_id = ? AND season = ? AND referee_key = ? "
+            "ORDER BY kickoff DESC LIMIT ?",
+            (league_id, season, key, INDEX_WINDOW),
+        ).fetchall()
+        if not rows:
             continue
 
-        stats_data = api_football_get(
-            "/fixtures/statistics",
-            {"fixture": fixture_id},
+        matches = len(rows)
+        cards_sum = sum(r["total_cards"] for r in rows)
+        conn.execute(
+            "INSERT OR REPLACE INTO referee_card_index("
+            "league_id, season, referee_key, referee_name, window, matches, total_cards_sum, total_cards_avg"
+            ") VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (league_id, season, key, rows[0]["referee_name"], INDEX_WINDOW, matches, cards_sum, cards_sum / matches),
         )
 
-        stats_response = stats_data.get("response", []) or []
-        if len(stats_response) < 2:
-            continue
-
-        # stats_response debería tener 2 entradas, una por equipo
-        team1 = stats_response[0].get("statistics", []) or []
-        team2 = stats_response[1].get("statistics", []) or []
-
-        yellow1 = _get_stat_value(team1, "Yellow Cards")
-        red1 = _get_stat_value(team1, "Red Cards")
-        yellow2 = _get_stat_value(team2, "Yellow Cards")
-        red2 = _get_stat_value(team2, "Red Cards")
 
-        # usamos la misma idea de ponderación que en equipos: amarilla + 2*roja
-        total_cards = (yellow1 + yellow2) + 2 * (red1 + red2)
-
-        matches += 1
-        total_cards_sum += total_cards
+def refresh_referee_index() -> int:
+    """
+    Añade al índice de árbitros los partidos terminados del almacén local
+    (fixtures_store) que aún no estaban indexados. No hace llamadas de red:
+    las estadísticas nuevas las trae sync_fixtures().
 
-    if matches > 0:
-        total_cards_avg = total_cards_sum / matches
-    else:
-        total_cards_avg = 0.0
+    Devuelve cuántos partidos se han añadido.
+    """
+    league_id = settings.api_football_league_id
+    season = settings.api_football_season
+
+    with football_db() as conn:
+        known = {
+            r["fixture_id"]
+            for r in conn.execute(
+                "SELECT fixture_id FROM referee_fixtures WHERE league_id = ? AND season = ?",
+                (league_id, season),
+            )
+        }
+
+    fixtures = get_finished_fixtures_with_statistics(exclude_ids=known)
+
+    touched: Set[str] = set()
+    added = 0
+    with football_db() as conn:
+        for fixture in fixtures:
+            referee = fixture.get("referee")
+            if not isinstance(referee, str) or not referee.strip():
+                continue
+            cards = cards_from_statistics(json.loads(fixture["statistics_json"]))
+            if cards is None:
+                continue
+
+            referee_name = referee.strip()
+            key = normalize_referee_name(referee_name)
+            conn.execute(
+                "INSERT OR REPLACE INTO referee_fixtures("
+                "fixture_id, league_id, season, referee_key, referee_name, kickoff, yellow, red, total_cards"
+                ") VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    fixture["fixture_id"], league_id, season, key, referee_name, fixture["kickoff"],
+                    cards["yellow"], cards["red"], cards["yellow"] + 2 * cards["red"],
+                ),
+            )
+            touched.add(key)
+            added += 1
+
+        _update_window_aggregates(conn, league_id, season, touched)
+
+    return added
+
+
+@timed()
+def get_referee_cards_stats(referee_name: str, last_n: int = INDEX_WINDOW) -> RefereeCardsStats:
+    """
+    Media de tarjetas mostradas por un árbitro en sus últimos N partidos de liga,
+    leída del índice local (sin llamadas de red; ver refresh_referee_index).
+    Con last_n == INDEX_WINDOW es una búsqueda por clave en el agregado precalculado.
+    """
+    league_id = settings.api_football_league_id
+    season = settings.api_football_season
+    key = normalize_referee_name(referee_name)
+
+    with football_db() as conn:
+        if last_n == INDEX_WINDOW:
+            row = conn.execute(
+                "SELECT matches, total_cards_avg FROM referee_card_index "
+                "WHERE league_id = ? AND season = ? AND referee_key = ?",
+                (league_id, season, key),
+            ).fetchone()
+            matches = row["matches"] if row else 0
+            total_cards_avg = row["total_cards_avg"] if row else 0.0
+        else:
+            row = conn.execute(
+                "SELECT COUNT(*) AS n, COALESCE(SUM(total_cards), 0) AS s FROM ("
+                "SELECT total_cards FROM referee_fixtures "
+                "WHERE league_id = ? AND season = ? AND referee_key = ? "
+                "ORDER BY kickoff DESC LIMIT ?)",
+                (league_id, season, key, last_n),
+            ).fetchone()
+            matches = row["n"]
+            total_cards_avg = row["s"] / matches if matches else 0.0
 
     return RefereeCardsStats(
         name=referee_name,
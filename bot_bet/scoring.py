@@ -0,0 +1,278 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, fields
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+# =========================
+# Scoring vectorizado de una jornada (goles, tarjetas y estrella)
+# =========================
+#
+# Capas:
+#   1) MatchFeatures: números de cada partido (los reúne predictions.py, o el
+#      backtest/tuning a partir del histórico).
+#   2) score_matches(): umbrales y confianzas para N partidos a la vez, con
+#      arrays de NumPy. No hace llamadas de red ni genera texto.
+#   3) El texto de Telegram/web se genera aparte (predictions.py) a partir de
+#      las features y de la puntuación.
+#
+# Con ScoringParams por defecto el resultado es el mismo que daban los bloques
+# escalares de predictions.py.
+
+# Códigos del pick de goles
+GOALS_NO_PICK = -1
+GOALS_OVER_0_5 = 0
+GOALS_OVER_1_5 = 1
+GOALS_UNDER_3_5 = 2
+
+GOALS_PICK_TEXT = {
+    GOALS_NO_PICK: "Sin apuesta clara en goles",
+    GOALS_OVER_0_5: "Más de 0.5 goles",
+    GOALS_OVER_1_5: "Más de 1.5 goles",
+    GOALS_UNDER_3_5: "Menos de 3.5 goles",
+}
+
+
+def cards_pick_text(line: float) -> str:
+    return f"Más de {line:.1f} tarjetas totales"
+
+
+@dataclass(frozen=True)
+class ScoringParams:
+    # Pesos temporada / reciente según nº de partidos recientes:
+    # (mínimo de partidos recientes, peso temporada, peso reciente)
+    weight_bands: Tuple[Tuple[int, float, float], ...] = (
+        (8, 0.5, 0.5),
+        (5, 0.6, 0.4),
+        (3, 0.7, 0.3),
+        (0, 0.8, 0.2),
+    )
+
+    # Goles
+    over_0_5_cutoff: float = 0.9
+    over_1_5_cutoff: float = 0.7
+    over_0_5_conf: float = 0.95
+    over_1_5_conf: float = 0.85
+    under_3_5_conf: float = 0.65
+
+    # Tarjetas: por debajo de cards_min_combined no hay pick; si no, la primera
+    # banda (media combinada mínima, línea, confianza) que se cumpla
+    cards_min_combined: float = 3.0
+    cards_no_pick_conf: float = 0.4
+    cards_bands: Tuple[Tuple[float, float, float], ...] = (
+        (7.0, 5.5, 0.85),
+        (5.5, 4.5, 0.8),
+        (4.0, 3.5, 0.7),
+        (0.0, 3.5, 0.55),
+    )
+    referee_high_avg: float = 6.5
+    referee_low_avg: float = 4.0
+    referee_adjust: float = 0.05
+    cards_conf_min: float = 0.4
+    cards_conf_max: float = 0.95
+
+    # Estrella: goles si su confianza llega a este mínimo
+    star_goals_min_conf: float = 0.90
+
+
+DEFAULT_PARAMS = ScoringParams()
+
+
+@dataclass
+class MatchFeatures:
+    """
+    Entradas numéricas de un partido. Las tasas van de 0.0 a 1.0; las medias de
+    goles son totales por partido (a favor + en contra).
+    """
+    fixture_id: Optional[int]
+    has_team_ids: bool
+
+    home_season_over_0_5: float = 0.0
+    home_season_over_1_5: float = 0.0
+    home_season_goals_avg: float = 0.0
+    away_season_over_0_5: float = 0.0
+    away_season_over_1_5: float = 0.0
+    away_season_goals_avg: float = 0.0
+
+    home_recent_matches: int = 0
+    home_recent_over_0_5: float = 0.0
+    home_recent_over_1_5: float = 0.0
+    home_recent_goals_avg: float = 0.0
+    away_recent_matches: int = 0
+    away_recent_over_0_5: float = 0.0
+    away_recent_over_1_5: float = 0.0
+    away_recent_goals_avg: float = 0.0
+
+    home_cards_matches: int = 0
+    home_yellow_avg: float = 0.0
+    home_red_avg: float = 0.0
+    home_cards_weighted_avg: float = 0.0  # amarillas + 2 * rojas
+    away_cards_matches: int = 0
+    away_yellow_avg: float = 0.0
+    away_red_avg: float = 0.0
+    away_cards_weighted_avg: float = 0.0
+
+    referee_name: Optional[str] = None
+    referee_matches: int = 0
+    referee_cards_avg: float = 0.0
+
+
+# Campos numéricos (los que entran en el scoring)
+NUMERIC_FEATURES: Tuple[str, ...] = tuple(
+    f.name for f in fields(MatchFeatures) if f.name not in ("fixture_id", "referee_name")
+)
+
+
+class FeatureArrays:
+    """
+    MatchFeatures de N partidos en columnas: un array float64 por campo
+    numérico, accesible como atributo (x.home_recent_matches, ...).
+    """
+
+    def __init__(self, n: int, columns: Dict[str, np.ndarray]) -> None:
+        self.n = n
+        self.__dict__.update(columns)
+
+    def __len__(self) -> int:
+        return self.n
+
+    def take(self, idx: Any) -> "FeatureArrays":
+        """
+        Subconjunto de partidos (máscara booleana o índices).
+        """
+        columns = {name: getattr(self, name)[idx] for name in NUMERIC_FEATURES}
+        return FeatureArrays(n=len(columns[NUMERIC_FEATURES[0]]), columns=columns)
+
+
+def features_to_arrays(features: Sequence[MatchFeatures]) -> FeatureArrays:
+    columns = {
+        name: np.array([getattr(f, name) for f in features], dtype=np.float64)
+        for name in NUMERIC_FEATURES
+    }
+    return FeatureArrays(n=len(features), columns=columns)
+
+
+@dataclass
+class MatchScores:
+    goals_code: np.ndarray  # int8, GOALS_*
+    goals_conf: np.ndarray
+    cards_line: np.ndarray  # NaN si no hay pick de tarjetas
+    cards_conf: np.ndarray
+    star_is_cards: np.ndarray  # bool
+    star_conf: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.goals_code)
+
+    def goals_pick(self, i: int) -> str:
+        return GOALS_PICK_TEXT[int(self.goals_code[i])]
+
+    def cards_pick(self, i: int) -> Optional[str]:
+        line = self.cards_line[i]
+        return None if np.isnan(line) else cards_pick_text(float(line))
+
+    def star(self, i: int) -> Tuple[str, str, float]:
+        """
+        (tipo, pick, confianza) de la apuesta estrella del partido i.
+        """
+        if self.star_is_cards[i]:
+            return "tarjetas", self.cards_pick(i) or "", float(self.star_conf[i])
+        return "goles", self.goals_pick(i), float(self.star_conf[i])
+
+
+def _weights(recent_matches: np.ndarray, params: ScoringParams) -> Tuple[np.ndarray, np.ndarray]:
+    bands = params.weight_bands
+    conds = [recent_matches >= min_matches for min_matches, _s, _r in bands]
+    season_w = np.select(conds, [s for _m, s, _r in bands], default=bands[-1][1])
+    recent_w = np.select(conds, [r for _m, _s, r in bands], default=bands[-1][2])
+    return season_w, recent_w
+
+
+def score_goals(x: FeatureArrays, params: ScoringParams = DEFAULT_PARAMS) -> Tuple[np.ndarray, np.ndarray]:
+    home_ws, home_wr = _weights(x.home_recent_matches, params)
+    away_ws, away_wr = _weights(x.away_recent_matches, params)
+
+    # % over por equipo combinando temporada + reciente; luego media de ambos
+    home_0_5 = x.home_season_over_0_5 * home_ws + x.home_recent_over_0_5 * home_wr
+    home_1_5 = x.home_season_over_1_5 * home_ws + x.home_recent_over_1_5 * home_wr
+    away_0_5 = x.away_season_over_0_5 * away_ws + x.away_recent_over_0_5 * away_wr
+    away_1_5 = x.away_season_over_1_5 * away_ws + x.away_recent_over_1_5 * away_wr
+    over_0_5 = (home_0_5 + away_0_5) / 2
+    over_1_5 = (home_1_5 + away_1_5) / 2
+
+    has_ids = x.has_team_ids.astype(bool)
+    is_0_5 = over_0_5 >= params.over_0_5_cutoff
+    is_1_5 = ~is_0_5 & (over_1_5 >= params.over_1_5_cutoff)
+
+    code = np.select(
+        [~has_ids, is_0_5, is_1_5],
+        [GOALS_NO_PICK, GOALS_OVER_0_5, GOALS_OVER_1_5],
+        default=GOALS_UNDER_3_5,
+    ).astype(np.int8)
+    conf = np.select(
+        [~has_ids, is_0_5, is_1_5],
+        [0.0, params.over_0_5_conf, params.over_1_5_conf],
+        default=params.under_3_5_conf,
+    )
+    return code, conf
+
+
+def cards_have_data(x: FeatureArrays) -> np.ndarray:
+    return x.has_team_ids.astype(bool) & (x.home_cards_matches > 0) & (x.away_cards_matches > 0)
+
+
+def score_cards(x: FeatureArrays, params: ScoringParams = DEFAULT_PARAMS) -> Tuple[np.ndarray, np.ndarray]:
+    combined = x.home_cards_weighted_avg + x.away_cards_weighted_avg
+    has_data = cards_have_data(x)
+    has_pick = has_data & (combined >= params.cards_min_combined)
+
+    band_conds = [combined >= min_combined for min_combined, _l, _c in params.cards_bands]
+    line = np.select(band_conds, [line for _m, line, _c in params.cards_bands], default=params.cards_bands[-1][1])
+    conf = np.select(band_conds, [c for _m, _l, c in params.cards_bands], default=params.cards_bands[-1][2])
+
+    # Ajuste suave según lo tarjetero que sea el árbitro
+    has_ref = x.referee_matches > 0
+    adjust = np.where(
+        x.referee_cards_avg >= params.referee_high_avg,
+        params.referee_adjust,
+        np.where(x.referee_cards_avg <= params.referee_low_avg, -params.referee_adjust, 0.0),
+    )
+    conf = conf + np.where(has_ref, adjust, 0.0)
+
+    conf = np.where(has_pick, conf, params.cards_no_pick_conf)
+    conf = np.clip(conf, params.cards_conf_min, params.cards_conf_max)
+    conf = np.where(has_data, conf, 0.0)
+
+    line = np.where(has_pick, line, np.nan)
+    return line, conf
+
+
+def score_matches(x: FeatureArrays, params: ScoringParams = DEFAULT_PARAMS) -> MatchScores:
+    """
+    Picks y confianzas de N partidos en una pasada.
+    """
+    goals_code, goals_conf = score_goals(x, params)
+    cards_line, cards_conf = score_cards(x, params)
+    goals_conf = np.clip(goals_conf, 0.0, 1.0)
+    cards_conf = np.clip(cards_conf, 0.0, 1.0)
+
+    # ⭐ Estrella: goles si es muy clara; si no, tarjetas cuando hay pick y más confianza
+    star_is_cards = (
+        (goals_conf < params.star_goals_min_conf)
+        & ~np.isnan(cards_line)
+        & (cards_conf > goals_conf)
+    )
+    return MatchScores(
+        goals_code=goals_code,
+        goals_conf=goals_conf,
+        cards_line=cards_line,
+        cards_conf=cards_conf,
+        star_is_cards=star_is_cards,
+        star_conf=np.where(star_is_cards, cards_conf, goals_conf),
+    )
+
+
+def score_features(features: Sequence[MatchFeatures], params: ScoringParams = DEFAULT_PARAMS) -> MatchScores:
+    return score_matches(features_to_arrays(features), params)
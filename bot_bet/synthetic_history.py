@@ -0,0 +1,369 @@
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .predictions import MatchPrediction, render_match_payload, render_match_text, score_and_render
+from .predictions_db import connect_predictions_db, init_predictions_db, write_prediction_matches
+from .scoring import MatchFeatures
+from .team_players_cards_stats import PlayerCardsStats
+
+
+# =========================
+# Histórico sintético de predicciones (pruebas de carga)
+# =========================
+#
+# Llena un predictions.db con días seguidos de predicciones inventadas pero con
+# la forma exacta de las reales: las features de cada partido se generan al
+# azar (a partir de un perfil fijo por equipo) y pasan por el mismo scoring y
+# los mismos renderizadores que usa el bot, así que el payload es el de
+# render_daily_payload y el texto el de render_daily_message.
+#
+# Sirve para medir compute_stats, fetch_days y las vistas de día con años de
+# histórico:
+#
+#   python -m bot_bet.synthetic_history --db /tmp/carga.db --matches 1000000 --leagues 10
+#
+# Los días se generan y se guardan por lotes (unos BATCH_MATCHES partidos por
+# transacción), con write_prediction_matches como main.py: la memoria no
+# depende del tamaño total.
+#
+# Cada día lleva partidos de todas las ligas en un único mensaje (predictions
+# tiene una fila por día); el título lista las ligas.
+
+BATCH_MATCHES = 5000
+
+LEAGUE_NAMES = (
+    "LaLiga",
+    "Premier League",
+    "Serie A",
+    "Bundesliga",
+    "Ligue 1",
+    "Eredivisie",
+    "Primeira Liga",
+    "Pro League",
+    "Süper Lig",
+    "Championship",
+)
+
+_CLUB_PREFIXES = ("Real", "Atlético", "Deportivo", "Unión", "Sporting", "Racing", "CD", "CF", "Club", "Inter")
+_CLUB_PLACES = (
+    "Valdoria", "Mirasol", "Castelar", "Robledo", "Alcantara", "Montefrío", "Las Lomas", "Villaverde",
+    "Puerto Alto", "San Telmo", "Riberas", "Costanera", "Peñalba", "Sierra Azul", "El Pinar", "Navalón",
+    "Torreblanca", "Miralrío", "Fuentecilla", "Campoamor", "Bellavista", "Olmedo", "Vistahermosa", "Lagunilla",
+)
+_FIRST_NAMES = ("Álex", "Bruno", "Carlos", "Dani", "Enzo", "Fran", "Gonzalo", "Hugo", "Iker", "Jorge", "Luca", "Marco")
+_LAST_NAMES = ("García", "Silva", "Rossi", "Müller", "Dubois", "Jansen", "Costa", "Smith", "Yilmaz", "Peeters", "López")
+
+TEAMS_PER_LEAGUE = 20
+
+
+@dataclass
+class TeamProfile:
+    name: str
+    goals_avg: float   # goles totales por partido (a favor + en contra)
+    over_0_5: float
+    over_1_5: float
+    yellow_avg: float
+    red_avg: float
+    players: List[PlayerCardsStats]
+
+
+@dataclass
+class SyntheticLeague:
+    name: str
+    teams: List[TeamProfile]
+    referees: List[Tuple[str, float]]  # (nombre, media de tarjetas)
+
+
+def league_name(i: int) -> str:
+    return LEAGUE_NAMES[i] if i < len(LEAGUE_NAMES) else f"Liga {i + 1}"
+
+
+def _team_profile(rnd: random.Random, name: str) -> TeamProfile:
+    goals_avg = rnd.uniform(1.8, 3.6)
+    yellow_avg = rnd.uniform(1.4, 3.2)
+    players = []
+    for _ in range(rnd.randint(0, 3)):
+        matches = rnd.randint(8, 30)
+        yellow, red = rnd.randint(3, 12), rnd.randint(0, 2)
+        players.append(PlayerCardsStats(
+            name=f"{rnd.choice(_FIRST_NAMES)} {rnd.choice(_LAST_NAMES)}",
+            matches=matches,
+            yellow=yellow,
+            red=red,
+            total_cards=yellow + red,
+            cards_per_match=(yellow + red) / matches,
+        ))
+    players.sort(key=lambda p: p.cards_per_match, reverse=True)
+    return TeamProfile(
+        name=name,
+        goals_avg=goals_avg,
+        over_0_5=min(1.0, 0.62 + goals_avg * 0.1),
+        over_1_5=min(1.0, 0.2 + goals_avg * 0.18),
+        yellow_avg=yellow_avg,
+        red_avg=rnd.uniform(0.02, 0.2),
+        players=players,
+    )
+
+
+def build_leagues(n_leagues: int, seed: int = 42) -> List[SyntheticLeague]:
+    rnd = random.Random(seed)
+    leagues: List[SyntheticLeague] = []
+    for i in range(n_leagues):
+        name = league_name(i)
+        clubs = rnd.sample([f"{p} {c}" for p in _CLUB_PREFIXES for c in _CLUB_PLACES], TEAMS_PER_LEAGUE)
+        # Nombres únicos entre ligas (prediction_daily_teams cuenta por nombre)
+        suffix = "" if i == 0 else f" ({name})"
+        leagues.append(SyntheticLeague(
+            name=name,
+            teams=[_team_profile(rnd, club + suffix) for club in clubs],
+            referees=[
+                (f"{rnd.choice(_FIRST_NAMES)} {rnd.choice(_LAST_NAMES)}, {name}", rnd.uniform(3.0, 6.0))
+                for _ in range(12)
+            ],
+        ))
+    return leagues
+
+
+def _jitter(rnd: random.Random, value: float, spread: float, lo: float = 0.0, hi: Optional[float] = None) -> float:
+    out = max(lo, value + rnd.uniform(-spread, spread))
+    return min(hi, out) if hi is not None else out
+
+
+def _match_features(
+    rnd: random.Random,
+    fixture_id: int,
+    home: TeamProfile,
+    away: TeamProfile,
+    referee: Tuple[str, float],
+    played: int,
+) -> MatchFeatures:
+    has_team_ids = rnd.random() > 0.01
+    if not has_team_ids:
+        return MatchFeatures(fixture_id=fixture_id, has_team_ids=False)
+
+    recent = min(played, 5)
+
+    def rate(value: float, n: int) -> float:
+        # Los porcentajes recientes salen de n partidos: k/n
+        return round(value * n) / n if n else 0.0
+
+    def side(team: TeamProfile) -> Dict[str, float]:
+        return {
+            "season_over_0_5": _jitter(rnd, team.over_0_5, 0.05, hi=1.0),
+            "season_over_1_5": _jitter(rnd, team.over_1_5, 0.05, hi=1.0),
+            "season_goals_avg": _jitter(rnd, team.goals_avg, 0.2),
+            "recent_over_0_5": rate(_jitter(rnd, team.over_0_5, 0.2, hi=1.0), recent),
+            "recent_over_1_5": rate(_jitter(rnd, team.over_1_5, 0.25, hi=1.0), recent),
+            "recent_goals_avg": _jitter(rnd, team.goals_avg, 0.8),
+            "yellow_avg": _jitter(rnd, team.yellow_avg, 0.3),
+            "red_avg": _jitter(rnd, team.red_avg, 0.05),
+        }
+
+    h, a = side(home), side(away)
+    referee_name = referee[0] if rnd.random() > 0.1 else None
+    referee_matches = rnd.randint(0, 10) if referee_name else 0
+
+    return MatchFeatures(
+        fixture_id=fixture_id,
+        has_team_ids=True,
+        home_season_over_0_5=h["season_over_0_5"],
+        home_season_over_1_5=h["season_over_1_5"],
+        home_season_goals_avg=h["season_goals_avg"],
+        away_season_over_0_5=a["season_over_0_5"],
+        away_season_over_1_5=a["season_over_1_5"],
+        away_season_goals_avg=a["season_goals_avg"],
+        home_recent_matches=recent,
+        home_recent_over_0_5=h["recent_over_0_5"] if recent else 0.0,
+        home_recent_over_1_5=h["recent_over_1_5"] if recent else 0.0,
+        home_recent_goals_avg=h["recent_goals_avg"] if recent else 0.0,
+        away_recent_matches=recent,
+        away_recent_over_0_5=a["recent_over_0_5"] if recent else 0.0,
+        away_recent_over_1_5=a["recent_over_1_5"] if recent else 0.0,
+        away_recent_goals_avg=a["recent_goals_avg"] if recent else 0.0,
+        home_cards_matches=played,
+        home_yellow_avg=h["yellow_avg"] if played else 0.0,
+        home_red_avg=h["red_avg"] if played else 0.0,
+        home_cards_weighted_avg=(h["yellow_avg"] + 2 * h["red_avg"]) if played else 0.0,
+        away_cards_matches=played,
+        away_yellow_avg=a["yellow_avg"] if played else 0.0,
+        away_red_avg=a["red_avg"] if played else 0.0,
+        away_cards_weighted_avg=(a["yellow_avg"] + 2 * a["red_avg"]) if played else 0.0,
+        referee_name=referee_name,
+        referee_matches=referee_matches,
+        referee_cards_avg=_jitter(rnd, referee[1], 0.5) if referee_matches else 0.0,
+    )
+
+
+def _season_played(day: date) -> int:
+    """
+    Partidos de liga ya jugados por cada equipo ese día (temporada de agosto a
+    mayo, una jornada por semana; en verano se usa la temporada anterior entera).
+    """
+    start_year = day.year if day.month >= 8 else day.year - 1
+    weeks = (day - date(start_year, 8, 15)).days // 7
+    return max(0, min(38, weeks))
+
+
+def render_synthetic_day(day: date, leagues: List[str], predictions: List[MatchPrediction]) -> Tuple[str, Dict[str, Any]]:
+    """
+    (texto, payload) de un día, igual que render_daily_message /
+    render_daily_payload pero con el día y las ligas indicados.
+    """
+    title = f"🏆 {' · '.join(leagues)} – Pronósticos ({day.strftime('%d/%m/%Y')})"
+    blocks: List[str] = [title, ""]
+    for idx, prediction in enumerate(predictions, start=1):
+        blocks.append(f"{idx}️⃣ {render_match_text(prediction)}")
+        blocks.append("")
+
+    payload = {
+        "day": day.isoformat(),
+        "target_day": day.isoformat(),
+        "league": " · ".join(leagues),
+        "season": day.year if day.month >= 8 else day.year - 1,
+        "matches": [render_match_payload(p) for p in predictions],
+    }
+    return "\n".join(blocks).strip(), payload
+
+
+def iter_synthetic_days(
+    total_matches: int,
+    n_leagues: int = 1,
+    matches_per_league: int = 10,
+    end_day: Optional[date] = None,
+    seed: int = 42,
+) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+    """
+    (día, texto, payload) de días consecutivos que terminan en end_day (hoy por
+    defecto), hasta sumar total_matches partidos. Se generan de uno en uno.
+    """
+    leagues = build_leagues(n_leagues, seed)
+    per_day = n_leagues * matches_per_league
+    n_days = -(-total_matches // per_day) if total_matches > 0 else 0
+    first_day = (end_day or date.today()) - timedelta(days=n_days - 1)
+    rnd = random.Random(seed + 1)
+    fixture_id = 1_000_000
+    remaining = total_matches
+
+    for d in range(n_days):
+        day = first_day + timedelta(days=d)
+        played = _season_played(day)
+        matches: List[Dict[str, Any]] = []
+        collected: List[Tuple[MatchFeatures, Tuple[List[PlayerCardsStats], List[PlayerCardsStats]]]] = []
+
+        for league in leagues:
+            teams = rnd.sample(league.teams, min(2 * matches_per_league, len(league.teams)))
+            pairs = [(teams[2 * i], teams[2 * i + 1]) for i in range(len(teams) // 2)]
+            for home, away in pairs:
+                if remaining <= 0:
+                    break
+                remaining -= 1
+                fixture_id += 1
+                referee = rnd.choice(league.referees)
+                features = _match_features(rnd, fixture_id, home, away, referee, played)
+                has_cards = features.home_cards_matches > 0 and features.away_cards_matches > 0
+                matches.append({
+                    "fixture_id": fixture_id,
+                    "home_team": home.name,
+                    "away_team": away.name,
+                    "kickoff": f"{rnd.choice((14, 16, 18, 19, 21))}:{rnd.choice(('00', '15', '30', '45'))}",
+                    "match_date": day.isoformat(),
+                    "referee": referee[0],
+                })
+                collected.append((features, (home.players, away.players) if has_cards else ([], [])))
+
+        text, payload = render_synthetic_day(day, [l.name for l in leagues], score_and_render(matches, collected))
+        yield day.isoformat(), text, payload
+
+
+def generate_history(
+    db_path: Path,
+    total_matches: int,
+    n_leagues: int = 1,
+    matches_per_league: int = 10,
+    end_day: Optional[date] = None,
+    seed: int = 42,
+    batch_matches: int = BATCH_MATCHES,
+    append: bool = False,
+) -> Tuple[int, int]:
+    """
+    Escribe el histórico en db_path y devuelve (días, partidos) guardados.
+    Se niega a escribir en una BD con predicciones salvo con append=True.
+    """
+    conn = connect_predictions_db(db_path)
+    try:
+        init_predictions_db(conn)
+        existing = conn.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+        if existing and not append:
+            raise ValueError(f"{db_path} ya tiene {existing} días de predicciones (usa append para añadir)")
+
+        days = matches = pending = 0
+        batch: List[Tuple[str, str, Dict[str, Any]]] = []
+
+        def flush() -> None:
+            nonlocal pending
+            conn.executemany(
+                "INSERT OR REPLACE INTO predictions(day, content, payload_json, created_at) VALUES (?, ?, ?, ?)",
+                [(day, text, json.dumps(payload, ensure_ascii=False), f"{day} 09:00:00") for day, text, payload in batch],
+            )
+            for day, _text, payload in batch:
+                write_prediction_matches(conn, day, payload)
+            conn.commit()
+            batch.clear()
+            pending = 0
+
+        for item in iter_synthetic_days(total_matches, n_leagues, matches_per_league, end_day, seed):
+            batch.append(item)
+            days += 1
+            matches += len(item[2]["matches"])
+            pending += len(item[2]["matches"])
+            if pending >= batch_matches:
+                flush()
+        if batch:
+            flush()
+        return days, matches
+    finally:
+        conn.close()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Genera un histórico sintético de predicciones (pruebas de carga)")
+    parser.add_argument("--db", type=Path, required=True, help="predictions.db de destino (no uses el de producción)")
+    parser.add_argument("--matches", type=int, default=100_000, help="Nº total de partidos (filas de prediction_matches)")
+    parser.add_argument("--leagues", type=int, default=1, help="Ligas por día")
+    parser.add_argument("--matches-per-league", type=int, default=10, help="Partidos por liga y día (máx. 10)")
+    parser.add_argument("--end", default=None, help="Último día (YYYY-MM-DD, por defecto hoy)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-matches", type=int, default=BATCH_MATCHES, help="Partidos por transacción (aprox.)")
+    parser.add_argument("--append", action="store_true", help="Permitir escribir en una BD con predicciones")
+    args = parser.parse_args(argv)
+
+    end_day = datetime.strptime(args.end, "%Y-%m-%d").date() if args.end else None
+    start = time.perf_counter()
+    try:
+        days, matches = generate_history(
+            args.db,
+            args.matches,
+            n_leagues=args.leagues,
+            matches_per_league=min(args.matches_per_league, TEAMS_PER_LEAGUE // 2),
+            end_day=end_day,
+            seed=args.seed,
+            batch_matches=args.batch_matches,
+            append=args.append,
+        )
+    except ValueError as e:
+        print(f"[ERROR] {e}")
+        raise SystemExit(1)
+    elapsed = time.perf_counter() - start
+    print(f"[INFO] Histórico sintético: {days} días, {matches} partidos en {args.db} ({elapsed:.1f}s, {matches / max(elapsed, 1e-9):.0f} partidos/s)")
+
+
+if __name__ == "__main__":
+    main()
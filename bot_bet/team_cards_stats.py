@@ -1,10 +1,9 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Any, Dict
 
-from .api_football_client import api_football_get
-from .config import settings
+from .metrics import timed
+from .team_season_snapshot import get_team_season_snapshot
 
 
 @dataclass
@@ -18,50 +17,10 @@ class TeamCardsStats:
     cards_weighted_avg: float  # amarillas + 2 * rojas
 
 
-def _safe_int(value: Any) -> int:
-    try:
-        if value is None:
-            return 0
-        return int(value)
-    except (TypeError, ValueError):
-        return 0
-
-
-def _get_nested(d: Dict[str, Any], *keys: str) -> Any:
-    cur: Any = d
-    for k in keys:
-        if not isinstance(cur, dict):
-            return None
-        cur = cur.get(k)
-    return cur
-
-
-def _sum_card_buckets(card_dict: Any) -> int:
-    """
-    Suma los 'total' de todos los tramos de minutos en:
-    cards.yellow / cards.red
-
-    card_dict suele ser algo como:
-    {
-        "0-15":   {"total": 1, "percentage": "10.0%"},
-        "16-30":  {"total": 2, "percentage": "20.0%"},
-        ...
-    }
-    """
-    if not isinstance(card_dict, dict):
-        return 0
-
-    total = 0
-    for _minute_range, info in card_dict.items():
-        if isinstance(info, dict):
-            total += _safe_int(info.get("total"))
-    return total
-
-
+@timed()
 def get_team_cards_stats(team_id: int) -> TeamCardsStats:
     """
-    Obtiene estadísticas de tarjetas de un equipo en la temporada/lig actual usando:
-      - /teams/statistics?team=...&league=...&season=...
+    Vista de TARJETAS sobre el snapshot de temporada (/teams/statistics?team=...&league=...&season=...).
 
     Cálculo:
       - matches = fixtures.played.total
@@ -71,19 +30,10 @@ def get_team_cards_stats(team_id: int) -> TeamCardsStats:
       - red_avg    = red_total / matches
       - cards_weighted_avg = yellow_avg + 2 * red_avg
     """
-    data = api_football_get(
-        "/teams/statistics",
-        {
-            "team": team_id,
-            "league": settings.api_football_league_id,
-            "season": settings.api_football_season,
-        },
-    )
-
-    response = data.get("response") or {}
+    snapshot = get_team_season_snapshot(team_id)
 
     # Partidos jugados en liga (total: casa + fuera)
-    matches = _safe_int(_get_nested(response, "fixtures", "played", "total"))
+    matches = snapshot.matches
 
     if matches <= 0:
         print(f"[CARDS] Team {team_id}: 0 partidos registrados en la API.")
@@ -97,13 +47,8 @@ def get_team_cards_stats(team_id: int) -> TeamCardsStats:
             cards_weighted_avg=0.0,
         )
 
-    cards = response.get("cards") or {}
-    yellow_buckets = cards.get("yellow") or {}
-    red_buckets = cards.get("red") or {}
-
-    yellow_total = _sum_card_buckets(yellow_buckets)
-    red_total = _sum_card_buckets(red_buckets)
-
+    yellow_total = snapshot.yellow_total
+    red_total = snapshot.red_total
     yellow_avg = yellow_total / matches if matches > 0 else 0.0
     red_avg = red_total / matches if matches > 0 else 0.0
     cards_weighted_avg = yellow_avg + 2 * red_avg
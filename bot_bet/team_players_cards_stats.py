@@ -2,7 +2,9 @@ from dataclasses import dataclass
 from typing import Any, Dict, List
 
 from .api_football_client import api_football_get
+from .api_quota import OPTIONAL
 from .config import settings
+from .metrics import timed
 
 
 @dataclass
@@ -15,6 +17,7 @@ class PlayerCardsStats:
     cards_per_match: float
 
 
+@timed()
 def get_team_players_cards_stats(
     team_id: int,
     top_n: int = 3,
@@ -35,6 +38,7 @@ def get_team_players_cards_stats(
             "team": team_id,
             "season": settings.api_football_season,
         },
+        priority=OPTIONAL,  # solo adorna el texto: cede ante las llamadas críticas
     )
 
     response = data.get("response", []) or []
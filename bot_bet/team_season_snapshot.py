@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple, Union
+
+from .api_football_client import api_football_get
+from .config import settings
+
+
+# =========================
+# Snapshot de temporada por equipo (/teams/statistics)
+# =========================
+#
+# Goles y tarjetas salen del MISMO documento de /teams/statistics. Aquí se pide
+# y se parsea una sola vez por equipo y ejecución; team_goals_stats y
+# team_cards_stats son vistas sobre este objeto.
+
+CardBuckets = Tuple[Tuple[str, int], ...]
+
+
+@dataclass(frozen=True)
+class TeamSeasonSnapshot:
+    team_id: int
+    matches: int  # fixtures.played.total
+    goals_for_avg: float
+    goals_against_avg: float
+    over_0_5: int  # nº de partidos con over 0.5 (según la API)
+    over_1_5: int
+    yellow_buckets: CardBuckets  # (("0-15", 2), ("16-30", 1), ...)
+    red_buckets: CardBuckets
+
+    @property
+    def over_0_5_rate(self) -> float:
+        return self.over_0_5 / self.matches if self.matches else 0.0
+
+    @property
+    def over_1_5_rate(self) -> float:
+        return self.over_1_5 / self.matches if self.matches else 0.0
+
+    @property
+    def yellow_total(self) -> int:
+        return sum(total for _minutes, total in self.yellow_buckets)
+
+    @property
+    def red_total(self) -> int:
+        return sum(total for _minutes, total in self.red_buckets)
+
+
+def _safe_float(value: Optional[Union[str, int, float]]) -> float:
+    if value is None:
+        return 0.0
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _safe_int(value: Any) -> int:
+    try:
+        if value is None:
+            return 0
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _get_nested(d: Dict[str, Any], *keys: str) -> Any:
+    cur: Any = d
+    for k in keys:
+        if not isinstance(cur, dict):
+            return None
+        cur = cur.get(k)
+    return cur
+
+
+def _parse_card_buckets(card_dict: Any) -> CardBuckets:
+    """
+    cards.yellow / cards.red suele ser algo como:
+    {
+        "0-15":   {"total": 1, "percentage": "10.0%"},
+        "16-30":  {"total": 2, "percentage": "20.0%"},
+        ...
+    }
+    """
+    if not isinstance(card_dict, dict):
+        return ()
+    return tuple(
+        (str(minute_range), _safe_int(info.get("total")))
+        for minute_range, info in card_dict.items()
+        if isinstance(info, dict)
+    )
+
+
+def _over_count(goals_for: Dict[str, Any], key: str) -> int:
+    # 🔧 Depende del formato real de la API: "over_0_5" puede venir como número
+    # o como {"total": X, ...}
+    over_stats_for = goals_for.get("total", {}) or {}
+    value = over_stats_for.get(key) if isinstance(over_stats_for, dict) else None
+    if isinstance(value, dict):
+        value = value.get("total")
+    return _safe_int(value)
+
+
+def parse_team_season_snapshot(team_id: int, response: Dict[str, Any]) -> TeamSeasonSnapshot:
+    goals = response.get("goals", {}) or {}
+    goals_for = goals.get("for", {}) or {}
+    goals_against = goals.get("against", {}) or {}
+    cards = response.get("cards") or {}
+
+    return TeamSeasonSnapshot(
+        team_id=team_id,
+        matches=_safe_int(_get_nested(response, "fixtures", "played", "total")),
+        goals_for_avg=_safe_float(_get_nested(goals_for, "average", "total")),
+        goals_against_avg=_safe_float(_get_nested(goals_against, "average", "total")),
+        over_0_5=_over_count(goals_for, "over_0_5"),
+        over_1_5=_over_count(goals_for, "over_1_5"),
+        yellow_buckets=_parse_card_buckets(cards.get("yellow")),
+        red_buckets=_parse_card_buckets(cards.get("red")),
+    )
+
+
+# Memo por ejecución: (team, league, season) -> snapshot
+_snapshots: Dict[Tuple[int, int, int], TeamSeasonSnapshot] = {}
+_snapshots_lock = threading.Lock()
+
+
+def get_team_season_snapshot(team_id: int) -> TeamSeasonSnapshot:
+    league_id = settings.api_football_league_id
+    season = settings.api_football_season
+    key = (team_id, league_id, season)
+
+    with _snapshots_lock:
+        snapshot = _snapshots.get(key)
+    if snapshot is not None:
+        return snapshot
+
+    # Si dos hilos piden el mismo equipo a la vez, api_football_get agrupa la petición
+    data = api_football_get(
+        "/teams/statistics",
+        {"league": league_id, "season": season, "team": team_id},
+    )
+    snapshot = parse_team_season_snapshot(team_id, data.get("response") or {})
+
+    with _snapshots_lock:
+        _snapshots[key] = snapshot
+    return snapshot
+
+
+def clear_team_season_snapshots() -> None:
+    """
+    Vacía el memo; se llama al principio de cada ejecución diaria.
+    """
+    with _snapshots_lock:
+        _snapshots.clear()
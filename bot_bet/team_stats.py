@@ -4,9 +4,8 @@ from dataclasses import dataclass
 from datetime import datetime
 from typing import Dict, Any, List
 
-import requests
-
 from .config import settings
+from .http_session import get_session, get_timeout
 from .la_liga_client import LALIGA_COMPETITION_ID, BASE_URL
 
 
@@ -41,7 +40,7 @@ def get_team_form_stats(team_id: int, limit: int = 10) -> TeamFormStats:
         "limit": limit,
     }
 
-    resp = requests.get(url, headers=_headers(), params=params)
+    resp = get_session().get(url, headers=_headers(), params=params, timeout=get_timeout())
     if resp.status_code != 200:
         raise FootballDataError(
             f"Error al obtener partidos del equipo {team_id}: "
@@ -1,9 +1,10 @@
 from __future__ import annotations
 
 from typing import List
-import requests
 
 from .config import settings
+from .http_session import get_session, get_timeout
+from .metrics import span
 
 
 # Límite de seguridad por debajo del máximo duro de Telegram (4096)
@@ -49,15 +50,16 @@ def send_message_sync(text: str) -> None:
     chunks = _split_message(text)
 
     for idx, chunk in enumerate(chunks, start=1):
-        resp = requests.post(
-            API_URL,
-            data={
-                "chat_id": settings.telegram_chat_id,
-                "text": chunk,
-                "parse_mode": "HTML",
-            },
-            timeout=10,
-        )
+        with span("telegram_send", endpoint="sendMessage", bytes=len(chunk.encode("utf-8"))):
+            resp = get_session().post(
+                API_URL,
+                data={
+                    "chat_id": settings.telegram_chat_id,
+                    "text": chunk,
+                    "parse_mode": "HTML",
+                },
+                timeout=get_timeout(),
+            )
 
         if not resp.ok:
             print(
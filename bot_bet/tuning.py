@@ -0,0 +1,527 @@
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import os
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, fields, replace
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .backtest import resolve_results
+from .config import DATA_DIR, settings
+from .feature_store import load_feature_arrays
+from .fixtures_store import FINISHED_STATUSES
+from .football_db import football_db
+from .referee_cards_stats import normalize_referee_name
+from .scoring import (
+    DEFAULT_PARAMS,
+    GOALS_OVER_0_5,
+    GOALS_OVER_1_5,
+    GOALS_UNDER_3_5,
+    NUMERIC_FEATURES,
+    FeatureArrays,
+    MatchFeatures,
+    ScoringParams,
+    features_to_arrays,
+    score_matches,
+)
+
+
+# =========================
+# Ajuste de umbrales (barrido de parámetros)
+# =========================
+#
+# Reconstruye, para cada partido terminado del almacén local, las features tal
+# y como se habrían visto ANTES del partido (solo con partidos anteriores de la
+# misma temporada) junto con su resultado real. Después puntúa todo el
+# histórico con cada combinación de ScoringParams de la rejilla, repartiendo
+# las combinaciones entre procesos.
+#
+# Aproximaciones respecto al bot en vivo:
+# - Los % over de "temporada" se calculan con los goles totales de los partidos
+#   anteriores (el bot usa el agregado de /teams/statistics).
+# - Las tarjetas son amarillas + rojas; la media del árbitro pondera rojas x2
+#   como el índice de árbitros.
+# - La rentabilidad (ROI) usa cuotas fijas supuestas (ASSUMED_ODDS), no cuotas
+#   reales de mercado: sirve para comparar ajustes, no como previsión.
+#
+# Con --source store se usan en su lugar las features que guardó el bot en
+# vivo (feature_store.py), sin ninguna de esas aproximaciones.
+
+FEATURES_CACHE_DIR = DATA_DIR / "tuning"
+
+RECENT_WINDOW = 10
+REFEREE_WINDOW = 15
+
+# Cuotas supuestas por pick: ("goles", código) / ("tarjetas", línea)
+ASSUMED_ODDS: Dict[Tuple[str, float], float] = {
+    ("goles", GOALS_OVER_0_5): 1.07,
+    ("goles", GOALS_OVER_1_5): 1.30,
+    ("goles", GOALS_UNDER_3_5): 1.35,
+    ("tarjetas", 3.5): 1.45,
+    ("tarjetas", 4.5): 1.75,
+    ("tarjetas", 5.5): 2.10,
+}
+DEFAULT_CARDS_ODDS = 1.80
+
+
+# =========================
+# Features point-in-time desde el almacén local
+# =========================
+
+@dataclass
+class HistoricalDataset:
+    features: FeatureArrays
+    fixture_ids: np.ndarray  # int64
+    total_goals: np.ndarray  # float64
+    total_cards: np.ndarray  # float64, NaN si el partido no tiene estadística
+
+    def __len__(self) -> int:
+        return len(self.fixture_ids)
+
+
+def _team_cards(stats: List[Dict[str, Any]], team_id: int, position: int) -> Optional[Tuple[int, int]]:
+    """
+    (amarillas, rojas) de un equipo en /fixtures/statistics. Se busca por id y,
+    si no aparece, por posición (la API devuelve primero al local).
+    """
+    entry = next((s for s in stats if (s.get("team") or {}).get("id") == team_id), None)
+    if entry is None and len(stats) >= 2:
+        entry = stats[position]
+    if entry is None:
+        return None
+
+    values = {}
+    for stat in entry.get("statistics", []) or []:
+        try:
+            values[stat.get("type")] = int(stat.get("value") or 0)
+        except (TypeError, ValueError):
+            values[stat.get("type")] = 0
+    return values.get("Yellow Cards", 0), values.get("Red Cards", 0)
+
+
+@dataclass
+class _TeamSeason:
+    matches: int = 0
+    over_0_5: int = 0
+    over_1_5: int = 0
+    goals_sum: int = 0
+    cards_matches: int = 0
+    yellow_sum: int = 0
+    red_sum: int = 0
+
+
+def _cards_avgs(s: _TeamSeason) -> Tuple[float, float]:
+    if not s.cards_matches:
+        return 0.0, 0.0
+    return s.yellow_sum / s.cards_matches, s.red_sum / s.cards_matches
+
+
+def _rates(history: Sequence[Tuple[int, int]]) -> Tuple[int, float, float, float]:
+    """
+    history: [(goles a favor, goles en contra), ...] -> (n, over 0.5, over 1.5, goles totales de media).
+    """
+    n = len(history)
+    if not n:
+        return 0, 0.0, 0.0, 0.0
+    totals = [gf + ga for gf, ga in history]
+    return (
+        n,
+        sum(1 for t in totals if t >= 1) / n,
+        sum(1 for t in totals if t >= 2) / n,
+        sum(totals) / n,
+    )
+
+
+def build_point_in_time_features(rows: Iterable[Dict[str, Any]], min_history: int = 3) -> HistoricalDataset:
+    """
+    rows: partidos terminados (filas de fixtures) en orden cronológico.
+    Solo entran los partidos en los que ambos equipos tienen al menos
+    min_history partidos previos en la temporada.
+    """
+    seasons: Dict[Tuple[int, int], _TeamSeason] = defaultdict(_TeamSeason)
+    recent: Dict[Tuple[int, int], Deque[Tuple[int, int]]] = defaultdict(lambda: deque(maxlen=RECENT_WINDOW))
+    referees: Dict[Tuple[int, str], Deque[int]] = defaultdict(lambda: deque(maxlen=REFEREE_WINDOW))
+
+    features: List[MatchFeatures] = []
+    fixture_ids: List[int] = []
+    total_goals: List[float] = []
+    total_cards: List[float] = []
+
+    for r in rows:
+        season = r["season"]
+        home_key, away_key = (season, r["home_id"]), (season, r["away_id"])
+        hs, as_ = seasons[home_key], seasons[away_key]
+        ref_key = (season, normalize_referee_name(r["referee"])) if r.get("referee") else None
+
+        stats = json.loads(r["statistics_json"]) if r.get("statistics_json") else None
+        home_cards = _team_cards(stats, r["home_id"], 0) if stats else None
+        away_cards = _team_cards(stats, r["away_id"], 1) if stats else None
+
+        # 1) Features con lo anterior al partido
+        if hs.matches >= min_history and as_.matches >= min_history:
+            hn, h05, h15, hg = _rates(recent[home_key])
+            an, a05, a15, ag = _rates(recent[away_key])
+            ref_hist = referees.get(ref_key) if ref_key else None
+            hy, hr = _cards_avgs(hs)
+            ay, ar = _cards_avgs(as_)
+            features.append(MatchFeatures(
+                fixture_id=r["fixture_id"],
+                has_team_ids=True,
+                home_season_over_0_5=hs.over_0_5 / hs.matches,
+                home_season_over_1_5=hs.over_1_5 / hs.matches,
+                home_season_goals_avg=hs.goals_sum / hs.matches,
+                away_season_over_0_5=as_.over_0_5 / as_.matches,
+                away_season_over_1_5=as_.over_1_5 / as_.matches,
+                away_season_goals_avg=as_.goals_sum / as_.matches,
+                home_recent_matches=hn,
+                home_recent_over_0_5=h05,
+                home_recent_over_1_5=h15,
+                home_recent_goals_avg=hg,
+                away_recent_matches=an,
+                away_recent_over_0_5=a05,
+                away_recent_over_1_5=a15,
+                away_recent_goals_avg=ag,
+                home_cards_matches=hs.cards_matches,
+                home_yellow_avg=hy,
+                home_red_avg=hr,
+                home_cards_weighted_avg=hy + 2 * hr,
+                away_cards_matches=as_.cards_matches,
+                away_yellow_avg=ay,
+                away_red_avg=ar,
+                away_cards_weighted_avg=ay + 2 * ar,
+                referee_name=r.get("referee"),
+                referee_matches=len(ref_hist) if ref_hist else 0,
+                referee_cards_avg=sum(ref_hist) / len(ref_hist) if ref_hist else 0.0,
+            ))
+            fixture_ids.append(r["fixture_id"])
+            total_goals.append(float(r["home_goals"] + r["away_goals"]))
+            total_cards.append(
+                float(sum(home_cards) + sum(away_cards)) if home_cards and away_cards else np.nan
+            )
+
+        # 2) Después, el partido pasa a formar parte del histórico
+        hg_, ag_ = r["home_goals"], r["away_goals"]
+        for key, s, gf, ga, cards in (
+            (home_key, hs, hg_, ag_, home_cards),
+            (away_key, as_, ag_, hg_, away_cards),
+        ):
+            s.matches += 1
+            s.over_0_5 += 1 if gf + ga >= 1 else 0
+            s.over_1_5 += 1 if gf + ga >= 2 else 0
+            s.goals_sum += gf + ga
+            if cards is not None:
+                s.cards_matches += 1
+                s.yellow_sum += cards[0]
+                s.red_sum += cards[1]
+            recent[key].append((gf, ga))
+
+        if ref_key and home_cards and away_cards:
+            yellow = home_cards[0] + away_cards[0]
+            red = home_cards[1] + away_cards[1]
+            referees[ref_key].append(yellow + 2 * red)
+
+    return HistoricalDataset(
+        features=features_to_arrays(features),
+        fixture_ids=np.array(fixture_ids, dtype=np.int64),
+        total_goals=np.array(total_goals, dtype=np.float64),
+        total_cards=np.array(total_cards, dtype=np.float64),
+    )
+
+
+def _warehouse_version(league_id: int) -> Tuple[int, str]:
+    with football_db() as conn:
+        row = conn.execute(
+            "SELECT COUNT(*) AS n, COALESCE(MAX(updated_at), '') AS last FROM fixtures WHERE league_id = ?",
+            (league_id,),
+        ).fetchone()
+    return row["n"], row["last"]
+
+
+def _load_rows(league_id: int) -> List[Dict[str, Any]]:
+    placeholders = ",".join("?" * len(FINISHED_STATUSES))
+    with football_db() as conn:
+        rows = conn.execute(
+            f"""
+            SELECT fixture_id, season, kickoff, home_id, away_id, home_goals, away_goals,
+                   referee, statistics_json
+            FROM fixtures
+            WHERE league_id = ? AND status IN ({placeholders})
+              AND home_goals IS NOT NULL AND away_goals IS NOT NULL
+            ORDER BY kickoff, fixture_id
+            """,
+            (league_id, *FINISHED_STATUSES),
+        ).fetchall()
+    return [dict(r) for r in rows]
+
+
+def load_historical_dataset(
+    league_id: Optional[int] = None,
+    min_history: int = 3,
+    cache_dir: Path = FEATURES_CACHE_DIR,
+) -> HistoricalDataset:
+    """
+    Dataset de la liga (todas las temporadas del almacén). Se guarda en un .npz
+    que se reutiliza mientras el almacén no cambie (nº de partidos y último
+    updated_at).
+    """
+    league_id = league_id if league_id is not None else settings.api_football_league_id
+    n, last = _warehouse_version(league_id)
+    version = f"{n}|{last}|{min_history}|{RECENT_WINDOW}|{REFEREE_WINDOW}"
+    cache_path = cache_dir / f"features_{league_id}.npz"
+
+    if cache_path.exists():
+        with np.load(cache_path, allow_pickle=False) as cached:
+            if str(cached["version"]) == version:
+                return HistoricalDataset(
+                    features=FeatureArrays(
+                        n=len(cached["fixture_ids"]),
+                        columns={name: cached[f"f_{name}"] for name in NUMERIC_FEATURES},
+                    ),
+                    fixture_ids=cached["fixture_ids"],
+                    total_goals=cached["total_goals"],
+                    total_cards=cached["total_cards"],
+                )
+
+    dataset = build_point_in_time_features(_load_rows(league_id), min_history=min_history)
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    np.savez(
+        cache_path,
+        version=np.array(version),
+        fixture_ids=dataset.fixture_ids,
+        total_goals=dataset.total_goals,
+        total_cards=dataset.total_cards,
+        **{f"f_{name}": getattr(dataset.features, name) for name in NUMERIC_FEATURES},
+    )
+    return dataset
+
+
+def load_store_dataset(date_from: Optional[str] = None, date_to: Optional[str] = None) -> HistoricalDataset:
+    """
+    Dataset con las features que guardó el bot en vivo (feature store) y el
+    resultado de los partidos ya terminados. No llama a la API: los resultados
+    salen de fixture_results o del almacén de partidos.
+    """
+    fixture_ids, features = load_feature_arrays(date_from, date_to)
+    results = resolve_results(fixture_ids.tolist(), fetch_missing=False)
+    res = np.array(
+        [results.get(int(f), (None, None, None, None)) for f in fixture_ids], dtype=np.float64
+    ).reshape(len(fixture_ids), 4)
+
+    total_goals = res[:, 0] + res[:, 1]
+    finished = ~np.isnan(total_goals)
+    return HistoricalDataset(
+        features=features.take(finished),
+        fixture_ids=fixture_ids[finished],
+        total_goals=total_goals[finished],
+        total_cards=(res[:, 2] + res[:, 3])[finished],
+    )
+
+
+# =========================
+# Evaluación de una combinación de parámetros
+# =========================
+
+@dataclass
+class TuningResult:
+    params: Dict[str, Any]  # solo lo que cambia respecto a ScoringParams()
+    matches: int
+    goals_hit_rate: float
+    cards_picks: int
+    cards_hit_rate: float
+    star_picks: int
+    star_hit_rate: float
+    star_roi: float  # beneficio por unidad apostada a la estrella (cuotas supuestas)
+
+
+_GOALS_SIDE_LINE = {
+    GOALS_OVER_0_5: (1, 0.5),
+    GOALS_OVER_1_5: (1, 1.5),
+    GOALS_UNDER_3_5: (-1, 3.5),
+}
+
+
+def _goals_odds(codes: np.ndarray) -> np.ndarray:
+    return np.select(
+        [codes == code for code in _GOALS_SIDE_LINE],
+        [ASSUMED_ODDS[("goles", code)] for code in _GOALS_SIDE_LINE],
+        default=np.nan,
+    )
+
+
+def _cards_odds(lines: np.ndarray) -> np.ndarray:
+    known = [(line, odds) for (market, line), odds in ASSUMED_ODDS.items() if market == "tarjetas"]
+    return np.select([lines == line for line, _o in known], [o for _l, o in known], default=DEFAULT_CARDS_ODDS)
+
+
+def evaluate_params(dataset: HistoricalDataset, params: ScoringParams) -> TuningResult:
+    scores = score_matches(dataset.features, params)
+    goals, cards = dataset.total_goals, dataset.total_cards
+
+    # Goles: siempre hay pick si hay ids (en el histórico, siempre)
+    code = scores.goals_code
+    goals_hit = np.select(
+        [code == GOALS_OVER_0_5, code == GOALS_OVER_1_5, code == GOALS_UNDER_3_5],
+        [goals > 0.5, goals > 1.5, goals < 3.5],
+        default=False,
+    )
+    goals_graded = code >= 0
+
+    # Tarjetas: solo partidos con pick y con estadística
+    cards_graded = ~np.isnan(scores.cards_line) & ~np.isnan(cards)
+    cards_hit = cards_graded & (cards > np.nan_to_num(scores.cards_line, nan=np.inf))
+
+    # Estrella: una unidad por partido a la apuesta estrella
+    star_is_cards = scores.star_is_cards
+    star_graded = np.where(star_is_cards, cards_graded, goals_graded)
+    star_hit = np.where(star_is_cards, cards_hit, goals_hit) & star_graded
+    star_odds = np.where(star_is_cards, _cards_odds(scores.cards_line), _goals_odds(code))
+    n_star = int(star_graded.sum())
+    profit = float(np.sum(np.where(star_hit, star_odds - 1.0, -1.0)[star_graded]))
+
+    n_goals = int(goals_graded.sum())
+    n_cards = int(cards_graded.sum())
+    return TuningResult(
+        params=_params_diff(params),
+        matches=len(dataset),
+        goals_hit_rate=float(goals_hit[goals_graded].mean()) if n_goals else 0.0,
+        cards_picks=n_cards,
+        cards_hit_rate=float(cards_hit[cards_graded].mean()) if n_cards else 0.0,
+        star_picks=n_star,
+        star_hit_rate=float(star_hit[star_graded].mean()) if n_star else 0.0,
+        star_roi=profit / n_star if n_star else 0.0,
+    )
+
+
+def _params_diff(params: ScoringParams) -> Dict[str, Any]:
+    return {
+        f.name: getattr(params, f.name)
+        for f in fields(ScoringParams)
+        if getattr(params, f.name) != getattr(DEFAULT_PARAMS, f.name)
+    }
+
+
+# =========================
+# Barrido en paralelo (procesos)
+# =========================
+
+def param_grid(grid: Dict[str, Sequence[Any]], base: ScoringParams = DEFAULT_PARAMS) -> List[ScoringParams]:
+    """
+    {"over_0_5_cutoff": [0.85, 0.9], "over_1_5_cutoff": [0.6, 0.7]} -> 4 ScoringParams.
+    """
+    names = list(grid)
+    return [replace(base, **dict(zip(names, values))) for values in itertools.product(*(grid[n] for n in names))]
+
+
+# Dataset de cada proceso del pool (se envía una vez, en el initializer)
+_worker_dataset: Optional[HistoricalDataset] = None
+
+
+def _init_worker(dataset: HistoricalDataset) -> None:
+    global _worker_dataset
+    _worker_dataset = dataset
+
+
+def _evaluate_in_worker(params: ScoringParams) -> TuningResult:
+    assert _worker_dataset is not None
+    return evaluate_params(_worker_dataset, params)
+
+
+def run_sweep(
+    dataset: HistoricalDataset,
+    candidates: Sequence[ScoringParams],
+    max_workers: Optional[int] = None,
+) -> List[TuningResult]:
+    """
+    Evalúa cada combinación y devuelve los resultados ordenados por ROI de la
+    estrella (y después por acierto). Con max_workers <= 1 se ejecuta en el
+    propio proceso.
+    """
+    if (max_workers or 1) <= 1 or len(candidates) <= 1:
+        results = [evaluate_params(dataset, p) for p in candidates]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_init_worker,
+            initargs=(dataset,),
+        ) as executor:
+            results = list(executor.map(_evaluate_in_worker, candidates, chunksize=max(1, len(candidates) // (4 * max_workers))))
+
+    return sorted(results, key=lambda r: (r.star_roi, r.star_hit_rate), reverse=True)
+
+
+def format_results(results: Sequence[TuningResult], top: int = 10) -> str:
+    lines = [f"{'ROI':>7}  {'estrella':>8}  {'goles':>6}  {'tarjetas':>8}  {'n':>6}  parámetros"]
+    for r in results[:top]:
+        params = ", ".join(f"{k}={v}" for k, v in r.params.items()) or "(por defecto)"
+        lines.append(
+            f"{r.star_roi:+7.1%}  {r.star_hit_rate:8.1%}  {r.goals_hit_rate:6.1%}  "
+            f"{r.cards_hit_rate:8.1%}  {r.star_picks:6d}  {params}"
+        )
+    return "\n".join(lines)
+
+
+def _parse_grid_arg(value: str) -> Tuple[str, List[Any]]:
+    """
+    'over_0_5_cutoff=0.85,0.9,0.95' -> ("over_0_5_cutoff", [0.85, 0.9, 0.95]).
+    Valores numéricos o JSON (para tuplas: 'weight_bands=[[8,0.5,0.5],...]|[...]').
+    """
+    name, _, raw = value.partition("=")
+    name = name.strip()
+    if name not in {f.name for f in fields(ScoringParams)}:
+        raise argparse.ArgumentTypeError(f"Parámetro desconocido: {name}")
+
+    if raw.strip().startswith("["):
+        values = [_to_tuple(json.loads(v)) for v in raw.split("|")]
+    else:
+        values = [float(v) for v in raw.split(",") if v.strip()]
+    return name, values
+
+
+def _to_tuple(value: Any) -> Any:
+    return tuple(_to_tuple(v) for v in value) if isinstance(value, list) else value
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Barrido de umbrales del scoring sobre el histórico local")
+    parser.add_argument(
+        "--grid",
+        action="append",
+        type=_parse_grid_arg,
+        default=[],
+        help="nombre=valor1,valor2,... (se puede repetir)",
+    )
+    parser.add_argument("--workers", type=int, default=None, help="Procesos (por defecto, nº de CPUs)")
+    parser.add_argument("--min-history", type=int, default=3, help="Partidos previos mínimos por equipo")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument(
+        "--source",
+        choices=("history", "store"),
+        default="history",
+        help="history: features reconstruidas del almacén; store: features guardadas por el bot",
+    )
+    parser.add_argument("--from", dest="date_from", default=None, help="Solo con --source store (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="date_to", default=None, help="Solo con --source store (YYYY-MM-DD)")
+    args = parser.parse_args(argv)
+
+    if args.source == "store":
+        dataset = load_store_dataset(args.date_from, args.date_to)
+    else:
+        dataset = load_historical_dataset(min_history=args.min_history)
+    print(f"[INFO] Histórico: {len(dataset)} partidos con features")
+
+    candidates = param_grid(dict(args.grid)) if args.grid else [DEFAULT_PARAMS]
+    print(f"[INFO] Evaluando {len(candidates)} combinaciones")
+
+    results = run_sweep(dataset, candidates, max_workers=args.workers or os.cpu_count())
+    print(format_results(results, top=args.top))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,31 @@
 from __future__ import annotations
 
+import asyncio
 import json
 import re
 import sqlite3
+import threading
 from datetime import date
 from pathlib import Path
-from typing import Optional, List, Dict, Any, Tuple
-from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import HTMLResponse
+from typing import Optional, List, Dict, Any, Iterator, Tuple
+from fastapi import FastAPI, Request, HTTPException, Query
+from fastapi.responses import HTMLResponse, PlainTextResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 
-from bot_bet.api_football_client import get_standings, ApiFootballError, api_football_get
+from bot_bet.api_football_client import ApiFootballError, api_football_get_async
+from bot_bet.api_quota import get_quota_status
 from bot_bet.config import settings
+from bot_bet.fixtures_store import (
+    FINISHED_STATUSES,
+    fixture_row_to_api,
+    get_team_finished_fixtures,
+    get_team_finished_state,
+)
+from bot_bet.metrics import render_prometheus, span
+from bot_bet.predictions_db import CONF_SCALE, connect_predictions_db, fetch_latest_run_metrics, init_predictions_db
+from bot_bet.webapp.render_cache import RenderCache, cached_html, parse_sqlite_utc
+from bot_bet.webapp.standings_cache import StandingsCache, format_age
 
 
 # === Paths y App ===
@@ -25,28 +38,55 @@ app = FastAPI(title="bot-bet")
 app.mount("/static", StaticFiles(directory=Path(__file__).resolve().parent / "static"), name="static")
 templates = Jinja2Templates(directory=str(Path(__file__).resolve().parent / "templates"))
 
+standings_cache = StandingsCache(
+    settings.api_football_league_id,
+    settings.api_football_season,
+    ttl_seconds=settings.standings_cache_ttl,
+)
+render_cache = RenderCache(max_entries=settings.render_cache_max_entries)
+
 
 # === DB helpers ===
+# Una conexión por hilo (los endpoints síncronos corren en el threadpool de
+# FastAPI), abierta una vez y reutilizada: así se conservan la caché de páginas
+# y las sentencias preparadas entre peticiones. `with get_conn() as conn` sigue
+# delimitando la transacción, pero ya no cierra la conexión.
+_local = threading.local()
+_all_conns: List[sqlite3.Connection] = []
+_all_conns_lock = threading.Lock()
+
+
 def get_conn() -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+    conns: Dict[str, sqlite3.Connection] = getattr(_local, "conns", None) or {}
+    _local.conns = conns
+
+    key = str(DB_PATH)
+    conn = conns.get(key)
+    if conn is None:
+        # Solo la usa su hilo; check_same_thread=False es para poder cerrarla al apagar
+        conn = connect_predictions_db(DB_PATH, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conns[key] = conn
+        with _all_conns_lock:
+            _all_conns.append(conn)
     return conn
 
 
+def close_all_connections() -> None:
+    """
+    Cierra las conexiones de todos los hilos (al apagar la app).
+    """
+    with _all_conns_lock:
+        conns = list(_all_conns)
+        _all_conns.clear()
+    for conn in conns:
+        conn.close()
+    _local.__dict__.clear()
+
+
 def init_db() -> None:
     with get_conn() as conn:
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS predictions (
-                day TEXT PRIMARY KEY,
-                content TEXT NOT NULL,
-                payload_json TEXT,
-                created_at TEXT NOT NULL DEFAULT (datetime('now'))
-            )
-        """)
-        cols = [r[1] for r in conn.execute("PRAGMA table_info(predictions)").fetchall()]
-        if "payload_json" not in cols:
-            conn.execute("ALTER TABLE predictions ADD COLUMN payload_json TEXT")
-        conn.commit()
+        init_predictions_db(conn)
 
 
 # === Payload processing ===
@@ -71,6 +111,22 @@ def fetch_prediction(day: str) -> Optional[sqlite3.Row]:
         ).fetchone()
 
 
+def fetch_prediction_created_at(day: str) -> Optional[str]:
+    with get_conn() as conn:
+        row = conn.execute("SELECT created_at FROM predictions WHERE day = ?", (day,)).fetchone()
+    return row["created_at"] if row else None
+
+
+def fetch_days_version() -> int:
+    """
+    Contador de escrituras de predictions.db (prediction_totals.version, lo sube
+    predictions_db en cada día guardado). Una sola fila: no recorre el histórico.
+    """
+    with get_conn() as conn:
+        row = conn.execute("SELECT version FROM prediction_totals WHERE id = 1").fetchone()
+    return row["version"] if row else 0
+
+
 def parse_payload(row: sqlite3.Row) -> Optional[Dict[str, Any]]:
     try:
         payload = json.loads(row["payload_json"] or "")
@@ -107,167 +163,272 @@ def filter_payload_matches(payload: Dict[str, Any], pick_type="all", min_conf=0.
 
 
 # === Stats/trend ===
-def _iter_payloads_with_day(limit_days=365) -> List[Tuple[str, Dict[str, Any]]]:
-    out = []
-    with get_conn() as conn:
-        rows = conn.execute(
-            "SELECT day, payload_json FROM predictions ORDER BY day DESC LIMIT ?", (limit_days,)
-        ).fetchall()
-
-    for r in rows:
-        try:
-            p = json.loads(r["payload_json"] or "")
-            if isinstance(p, dict) and isinstance(p.get("matches"), list):
-                out.append((r["day"], p))
-        except Exception:
-            continue
-    return out
-
+# compute_stats() lee los agregados materializados que predictions_db mantiene
+# en cada escritura: los totales de prediction_totals y los tops sumando los
+# contadores por día (prediction_daily_picks / prediction_daily_teams).
+# Con limit_days (lo que usa /stats) los totales salen de sumar
+# prediction_daily_stats de los últimos N días guardados (de ellos solo cuentan
+# los de payload válido) y los tops, de los contadores de esos mismos días: el
+# coste depende de la ventana, no del histórico.
 
 def compute_trend(limit_days=30) -> List[Dict[str, Any]]:
-    trend = []
-    rows = _iter_payloads_with_day(limit_days=limit_days)
-
-    for day, payload in rows:
-        matches = payload.get("matches", [])
-        stars_goles = sum(1 for m in matches if m.get("star", {}).get("type") == "goles")
-        stars_tarjetas = sum(1 for m in matches if m.get("star", {}).get("type") == "tarjetas")
-        avg_conf = sum(_safe_float(m.get("star", {}).get("confidence")) for m in matches if m.get("star")) / max(1, len(matches))
-
-        trend.append({
-            "day": day,
-            "matches": len(matches),
-            "stars_goles": stars_goles,
-            "stars_tarjetas": stars_tarjetas,
-            "avg_conf": avg_conf,
+    with get_conn() as conn:
+        rows = conn.execute("""
+            SELECT * FROM (
+                SELECT * FROM prediction_daily_stats ORDER BY day DESC LIMIT ?
+            )
+            WHERE has_payload = 1
+            ORDER BY day DESC
+        """, (limit_days,)).fetchall()
+
+    return [
+        {
+            "day": r["day"],
+            "matches": r["matches"],
+            "stars_goles": r["stars_goles"],
+            "stars_tarjetas": r["stars_tarjetas"],
+            "avg_conf": r["conf_bp_sum"] / CONF_SCALE / max(1, r["matches"]),
             "has_payload": True,
-        })
-
-    return trend
-
-
-def compute_stats(limit_days=365) -> Dict[str, Any]:
-    payloads_with_day = _iter_payloads_with_day(limit_days)
-    pick_counter = {}
-    team_counter = {}
-    total_matches = 0
-    star_conf_sum = 0.0
-    star_conf_n = 0
-    type_counts = {"goles": 0, "tarjetas": 0, "other": 0}
-
-    for _, payload in payloads_with_day:
-        matches = payload.get("matches", [])
-        total_matches += len(matches)
-        for m in matches:
-            for team in [m.get("home"), m.get("away")]:
-                if team:
-                    team_counter[team] = team_counter.get(team, 0) + 1
-            star = m.get("star", {})
-            stype = star.get("type", "other")
-            type_counts[stype if stype in type_counts else "other"] += 1
-            conf = _safe_float(star.get("confidence"), 0.0)
-            if conf:
-                star_conf_sum += conf
-                star_conf_n += 1
-            pick = star.get("pick")
-            if pick:
-                pick_counter[pick] = pick_counter.get(pick, 0) + 1
+        }
+        for r in rows
+    ]
 
-    with get_conn() as conn:
-        total_days = conn.execute("SELECT COUNT(*) AS n FROM predictions").fetchone()["n"]
 
+def _stats_dict(limit_days, total_days, days, totals, type_counts, top_picks, top_teams) -> Dict[str, Any]:
     total_stars = sum(type_counts.values())
     return {
         "limit_days": limit_days,
         "total_days": total_days,
-        "days_with_payload": len(payloads_with_day),
-        "days_without_payload": total_days - len(payloads_with_day),
-        "total_matches": total_matches,
+        "days_with_payload": days,
+        "days_without_payload": total_days - days,
+        "total_matches": totals["matches"],
         "star_type_count": type_counts,
         "total_stars": total_stars,
         "pct_goles": type_counts["goles"] / total_stars if total_stars else 0,
         "pct_tarjetas": type_counts["tarjetas"] / total_stars if total_stars else 0,
-        "avg_star_confidence": star_conf_sum / star_conf_n if star_conf_n else 0.0,
-        "top_picks": sorted(pick_counter.items(), key=lambda x: x[1], reverse=True)[:10],
-        "top_teams": sorted(team_counter.items(), key=lambda x: x[1], reverse=True)[:12],
+        "avg_star_confidence": totals["conf_bp_sum"] / CONF_SCALE / totals["conf_n"] if totals["conf_n"] else 0.0,
+        "top_picks": top_picks,
+        "top_teams": top_teams,
+    }
+
+
+def _top_counts(conn: sqlite3.Connection, table: str, column: str, window: str, params, limit: int):
+    rows = conn.execute(window + f"""
+        SELECT {column} AS key, SUM(n) AS n FROM {table}
+        WHERE day IN (SELECT day FROM win)
+        GROUP BY {column} ORDER BY n DESC, {column} LIMIT :top
+    """, {**params, "top": limit}).fetchall()
+    return [(r["key"], r["n"]) for r in rows]
+
+
+def compute_stats(limit_days: Optional[int] = None) -> Dict[str, Any]:
+    if limit_days is not None:
+        return _compute_stats_window(limit_days)
+
+    window = "WITH win AS (SELECT day FROM prediction_daily_stats WHERE has_payload = 1)"
+    with get_conn() as conn:
+        totals = conn.execute("SELECT * FROM prediction_totals WHERE id = 1").fetchone()
+        top_picks = _top_counts(conn, "prediction_daily_picks", "pick", window, {}, 10)
+        top_teams = _top_counts(conn, "prediction_daily_teams", "team", window, {}, 12)
+
+    type_counts = {
+        "goles": totals["stars_goles"],
+        "tarjetas": totals["stars_tarjetas"],
+        "other": totals["stars_other"],
     }
+    return _stats_dict(
+        limit_days,
+        totals["days"],
+        totals["days_with_payload"],
+        totals,
+        type_counts,
+        top_picks,
+        top_teams,
+    )
+
+
+def _compute_stats_window(limit_days: int) -> Dict[str, Any]:
+    # Últimos N días guardados (de ellos, los de payload válido)
+    window = """
+        WITH win AS (
+            SELECT * FROM (
+                SELECT * FROM prediction_daily_stats ORDER BY day DESC LIMIT :limit
+            ) WHERE has_payload = 1
+        )
+    """
+    params = {"limit": limit_days}
+
+    with get_conn() as conn:
+        totals = conn.execute(window + """
+            SELECT
+                COUNT(*) AS days,
+                COALESCE(SUM(matches), 0) AS matches,
+                COALESCE(SUM(stars_goles), 0) AS goles,
+                COALESCE(SUM(stars_tarjetas), 0) AS tarjetas,
+                COALESCE(SUM(conf_bp_sum), 0) AS conf_bp_sum,
+                COALESCE(SUM(conf_n), 0) AS conf_n
+            FROM win
+        """, params).fetchone()
+        top_picks = _top_counts(conn, "prediction_daily_picks", "pick", window, params, 10)
+        top_teams = _top_counts(conn, "prediction_daily_teams", "team", window, params, 12)
+        total_days = conn.execute("SELECT days FROM prediction_totals WHERE id = 1").fetchone()["days"]
+
+    type_counts = {
+        "goles": totals["goles"],
+        "tarjetas": totals["tarjetas"],
+        "other": totals["matches"] - totals["goles"] - totals["tarjetas"],
+    }
+    return _stats_dict(
+        limit_days,
+        total_days,
+        totals["days"],
+        totals,
+        type_counts,
+        top_picks,
+        top_teams,
+    )
 
 
 # === Startup ===
 @app.on_event("startup")
-def _startup():
-    init_db()
+async def _startup():
+    await asyncio.to_thread(init_db)
+    standings_cache.refresh_in_background()
 
 
-# === Vistas ===
-@app.get("/", response_class=HTMLResponse)
-def index(request: Request):
-    today = date.today().isoformat()
-    days = fetch_days(limit=120)
-    today_row = fetch_prediction(today)
+@app.on_event("shutdown")
+def _shutdown():
+    close_all_connections()
+
 
+# === Métricas ===
+@app.middleware("http")
+async def _time_requests(request: Request, call_next):
+    # Para respuestas en streaming mide hasta las cabeceras, no el cuerpo completo
+    with span("http_request") as s:
+        response = await call_next(request)
+        route = request.scope.get("route")
+        s.set(endpoint=getattr(route, "path", "sin_ruta"), status=response.status_code)
+    return response
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """
+    Métricas en formato Prometheus: tramos de este proceso (peticiones web,
+    llamadas a API-Football...) y el resumen de la última ejecución diaria.
+    """
+    with get_conn() as conn:
+        last_run = fetch_latest_run_metrics(conn)
+
+    gauges: Dict[str, Tuple[str, float]] = {
+        "bot_bet_render_cache_hits": ("Aciertos de la caché de páginas renderizadas.", render_cache.hits),
+        "bot_bet_render_cache_misses": ("Fallos de la caché de páginas renderizadas.", render_cache.misses),
+    }
+    snapshot = standings_cache.snapshot
+    if snapshot is not None:
+        gauges["bot_bet_standings_age_seconds"] = ("Antigüedad de la clasificación en memoria.", round(snapshot.age_seconds, 1))
+    quota = get_quota_status()
+    if quota.daily_remaining is not None:
+        gauges["bot_bet_api_quota_daily_remaining"] = ("Peticiones diarias restantes a API-Football.", quota.daily_remaining)
+    gauges["bot_bet_api_quota_minute_available"] = ("Tokens por minuto disponibles.", round(quota.minute_available, 2))
+
+    return PlainTextResponse(
+        render_prometheus(last_run=last_run, extra_gauges=gauges),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+# === Vistas ===
+def _filters(request: Request) -> Tuple[str, float]:
     pick_type = request.query_params.get("type", "all")
     try:
         min_conf = float(request.query_params.get("min_conf", "0"))
     except Exception:
         min_conf = 0.0
+    return pick_type, min_conf
 
-    payload_matches = []
-    text_matches = []
-    payload = None
-
-    if today_row:
-        payload = parse_payload(today_row)
-        if payload and payload.get("matches") is not None:
-            payload_matches = filter_payload_matches(payload, pick_type, min_conf)
-        else:
-            text_matches = split_into_match_blocks(today_row["content"])
 
-    return templates.TemplateResponse("index.html", {
-        "request": request,
-        "today": today,
-        "today_row": today_row,
-        "days": days,
-        "payload": payload,
-        "payload_matches": payload_matches,
-        "text_matches": text_matches,
-        "pick_type": pick_type,
-        "min_conf": min_conf,
-        "extract_match_title": extract_match_title_from_text_block,
-    })
+@app.get("/", response_class=HTMLResponse)
+def index(request: Request):
+    today = date.today().isoformat()
+    pick_type, min_conf = _filters(request)
+    days_version = fetch_days_version()
+    key = ("index", today, pick_type, min_conf, fetch_prediction_created_at(today), days_version)
+
+    def render() -> bytes:
+        days = fetch_days(limit=120)
+        today_row = fetch_prediction(today)
+
+        payload_matches = []
+        text_matches = []
+        payload = None
+
+        if today_row:
+            payload = parse_payload(today_row)
+            if payload and payload.get("matches") is not None:
+                payload_matches = filter_payload_matches(payload, pick_type, min_conf)
+            else:
+                text_matches = split_into_match_blocks(today_row["content"])
+
+        return templates.TemplateResponse("index.html", {
+            "request": request,
+            "today": today,
+            "today_row": today_row,
+            "days": days,
+            "payload": payload,
+            "payload_matches": payload_matches,
+            "text_matches": text_matches,
+            "pick_type": pick_type,
+            "min_conf": min_conf,
+            "extract_match_title": extract_match_title_from_text_block,
+        }).body
+
+    # Sin Last-Modified: la página depende también del día de hoy, y un
+    # If-Modified-Since daría 304 con la vista de "hoy" de ayer. Solo ETag.
+    return cached_html(request, render_cache, key, None, render)
 
 
 @app.get("/day/{day}", response_class=HTMLResponse)
 def day_view(day: str, request: Request):
-    row = fetch_prediction(day)
-    if not row:
+    created_at = fetch_prediction_created_at(day)
+    if not created_at:
         raise HTTPException(status_code=404)
 
-    pick_type = request.query_params.get("type", "all")
-    try:
-        min_conf = float(request.query_params.get("min_conf", "0"))
-    except Exception:
-        min_conf = 0.0
+    pick_type, min_conf = _filters(request)
+    key = ("day", day, pick_type, min_conf, created_at)
 
-    payload = parse_payload(row)
-    payload_matches = filter_payload_matches(payload, pick_type, min_conf) if payload else []
-    text_matches = split_into_match_blocks(row["content"]) if not payload else []
+    def render() -> bytes:
+        row = fetch_prediction(day)
+        if not row:
+            raise HTTPException(status_code=404)
 
-    return templates.TemplateResponse("day.html", {
-        "request": request,
-        "row": row,
-        "payload": payload,
-        "payload_matches": payload_matches,
-        "text_matches": text_matches,
-        "pick_type": pick_type,
-        "min_conf": min_conf,
-        "extract_match_title": extract_match_title_from_text_block,
-    })
+        payload = parse_payload(row)
+        payload_matches = filter_payload_matches(payload, pick_type, min_conf) if payload else []
+        text_matches = split_into_match_blocks(row["content"]) if not payload else []
+
+        return templates.TemplateResponse("day.html", {
+            "request": request,
+            "row": row,
+            "payload": payload,
+            "payload_matches": payload_matches,
+            "text_matches": text_matches,
+            "pick_type": pick_type,
+            "min_conf": min_conf,
+            "extract_match_title": extract_match_title_from_text_block,
+        }).body
+
+    return cached_html(request, render_cache, key, parse_sqlite_utc(created_at), render)
+
+
+# /stats muestra el último año de predicciones; compute_stats() sin límite da
+# los totales de todo el histórico.
+STATS_WINDOW_DAYS = 365
 
 
 @app.get("/stats", response_class=HTMLResponse)
 def stats_view(request: Request):
-    stats = compute_stats()
+    stats = compute_stats(limit_days=STATS_WINDOW_DAYS)
     trend_30 = compute_trend()
     return templates.TemplateResponse("stats.html", {
         "request": request,
@@ -277,84 +438,139 @@ def stats_view(request: Request):
 
 
 @app.get("/standings", response_class=HTMLResponse)
-def standings_view(request: Request):
+async def standings_view(request: Request):
     try:
-        table = get_standings(settings.api_football_league_id, settings.api_football_season)
+        snapshot = await standings_cache.get()
     except ApiFootballError as e:
         raise HTTPException(status_code=502, detail=str(e))
     except Exception:
         raise HTTPException(status_code=500, detail="Error inesperado")
     return templates.TemplateResponse("standings.html", {
         "request": request,
-        "table": table,
+        "table": snapshot.table,
+        "standings_age": format_age(snapshot.age_seconds),
     })
 
+# === /form ===
+# Resultado por equipo: team_id -> (fixture_id del último partido terminado en
+# el almacén local, partidos, resumen). Se recalcula cuando la sincronización
+# añade un partido nuevo. Si la clasificación ya cuenta más partidos de los que
+# tiene el almacén (aún no se ha sincronizado), se lee de la API y no se cachea.
+_form_cache: Dict[int, Tuple[Optional[int], List[Dict[str, Any]], Dict[str, int]]] = {}
+
+
+async def _fetch_missing_statistics(matches: List[Dict[str, Any]]) -> None:
+    """
+    Pide /fixtures/statistics en paralelo (con límite de concurrencia) solo para
+    los partidos que no la traen ya del almacén local.
+    """
+    missing = [m for m in matches if m.get("statistics") is None]
+    semaphore = asyncio.Semaphore(max(1, settings.pipeline_workers))
+
+    async def fetch(match: Dict[str, Any]) -> None:
+        async with semaphore:
+            status = ((match.get("fixture") or {}).get("status") or {}).get("short")
+            stats_resp = await api_football_get_async(
+                "/fixtures/statistics",
+                {"fixture": match["fixture"]["id"]},
+                finished=status in FINISHED_STATUSES,
+            )
+        match["statistics"] = stats_resp.get("response", [])
+
+    await asyncio.gather(*(fetch(m) for m in missing))
+
+
+async def _load_team_form(
+    selected_team: str,
+    team_id: int,
+    from_store: bool,
+) -> Tuple[List[Dict[str, Any]], Dict[str, int], bool]:
+    """
+    Últimos 10 partidos del equipo con goles y tarjetas, y el resumen.
+    El tercer valor indica si todos los partidos tienen estadística (si no, no se cachea).
+    """
+    league_id = int(settings.api_football_league_id)
+    season = int(settings.api_football_season)
+    summary = {"gf": 0, "ga": 0, "yellow_cards": 0, "red_cards": 0}
+
+    # Preferimos el almacén local de partidos (sincronizado por el bot diario)
+    if from_store:
+        rows = await asyncio.to_thread(get_team_finished_fixtures, team_id, 10)
+        matches = [fixture_row_to_api(r) for r in rows]
+    else:
+        resp = await api_football_get_async("/fixtures", {
+            "team": team_id,
+            "season": season,
+            "league": league_id,
+            "last": 10
+        })
+        matches = resp["response"]
+
+    # Estadísticas que falten, todas en un paso
+    await _fetch_missing_statistics(matches)
+
+    for match in matches:
+        is_home = match["teams"]["home"]["name"] == selected_team
+        goals = match["goals"]
+        gf = goals["home"] if is_home else goals["away"]
+        ga = goals["away"] if is_home else goals["home"]
+        summary["gf"] += gf
+        summary["ga"] += ga
+
+        stats_list = match["statistics"]
+
+        # Contadores por partido
+        match_yellow = 0
+        match_red = 0
+
+        try:
+            team_stats = next(s for s in stats_list if s["team"]["name"] == selected_team)
+            for stat in team_stats.get("statistics", []):
+                if stat["type"].lower() == "yellow cards":
+                    match_yellow = stat["value"] or 0
+                    summary["yellow_cards"] += match_yellow
+                elif stat["type"].lower() == "red cards":
+                    match_red = stat["value"] or 0
+                    summary["red_cards"] += match_red
+        except Exception:
+            pass
+
+        # Agregar al partido
+        match["yellow_cards"] = match_yellow
+        match["red_cards"] = match_red
+
+    complete = all(len(m["statistics"]) >= 2 for m in matches)
+    return matches, summary, complete
+
+
 @app.get("/form", response_class=HTMLResponse)
-def team_form_view(request: Request, team: Optional[str] = None):
+async def team_form_view(request: Request, team: Optional[str] = None):
     teams = []
     selected_team = team
     matches = []
     summary = {"gf": 0, "ga": 0, "yellow_cards": 0, "red_cards": 0}
     error = None
+    standings_age = None
 
     try:
-        league_id = int(settings.api_football_league_id)
-        season = int(settings.api_football_season)
-
-        standings_data = get_standings(league_id=league_id, season=season)
-        all_teams = [t["team"]["name"] for t in standings_data]
-        teams = sorted(set(all_teams))
-
-        if selected_team and selected_team in teams:
-            team_id = next((t["team"]["id"] for t in standings_data if t["team"]["name"] == selected_team), None)
-            if not team_id:
-                raise ValueError("No se encontró el ID del equipo")
-
-            resp = api_football_get("/fixtures", {
-                "team": team_id,
-                "season": season,
-                "league": league_id,
-                "last": 10
-            })
-
-            matches = resp["response"]
-
-            for match in matches:
-                is_home = match["teams"]["home"]["name"] == selected_team
-                goals = match["goals"]
-                gf = goals["home"] if is_home else goals["away"]
-                ga = goals["away"] if is_home else goals["home"]
-                summary["gf"] += gf
-                summary["ga"] += ga
-
-                # Obtener estadísticas del partido
-                fixture_id = match["fixture"]["id"]
-                stats_resp = api_football_get("/fixtures/statistics", {
-                    "fixture": fixture_id
-                })
-
-                stats_list = stats_resp.get("response", [])
-                match["statistics"] = stats_list
-
-                # Contadores por partido
-                match_yellow = 0
-                match_red = 0
-
-                try:
-                    team_stats = next(s for s in stats_list if s["team"]["name"] == selected_team)
-                    for stat in team_stats.get("statistics", []):
-                        if stat["type"].lower() == "yellow cards":
-                            match_yellow = stat["value"] or 0
-                            summary["yellow_cards"] += match_yellow
-                        elif stat["type"].lower() == "red cards":
-                            match_red = stat["value"] or 0
-                            summary["red_cards"] += match_red
-                except Exception:
-                    pass
-
-                # Agregar al partido
-                match["yellow_cards"] = match_yellow
-                match["red_cards"] = match_red
+        snapshot = await standings_cache.get()
+        standings_age = format_age(snapshot.age_seconds)
+        teams = snapshot.teams
+
+        if selected_team and selected_team in snapshot.team_ids:
+            team_id = snapshot.team_ids[selected_team]
+            played = snapshot.played.get(team_id)
+
+            local_played, last_fixture_id = await asyncio.to_thread(get_team_finished_state, team_id)
+            from_store = last_fixture_id is not None and (played is None or local_played >= played)
+
+            cached = _form_cache.get(team_id)
+            if from_store and cached is not None and cached[0] == last_fixture_id:
+                _, matches, summary = cached
+            else:
+                matches, summary, complete = await _load_team_form(selected_team, team_id, from_store)
+                if from_store and complete:
+                    _form_cache[team_id] = (last_fixture_id, matches, summary)
 
     except Exception as e:
         error = str(e)
@@ -366,4 +582,113 @@ def team_form_view(request: Request, team: Optional[str] = None):
         "matches": matches,
         "summary": summary,
         "error": error,
+        "standings_age": standings_age,
     })
+
+
+# === API JSON ===
+# Histórico para notebooks: /api/predictions pagina por día (cursor = último día
+# devuelto) y /api/predictions/export.ndjson vuelca una línea por partido
+# leyendo de prediction_matches por bloques, sin cargar todo en memoria.
+
+API_PAGE_MAX = 200
+EXPORT_BATCH_SIZE = 500
+
+
+def _check_day(value: Optional[str], name: str) -> Optional[str]:
+    if value is None:
+        return None
+    try:
+        return date.fromisoformat(value).isoformat()
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"'{name}' debe ser una fecha YYYY-MM-DD")
+
+
+def _day_range_sql(date_from: Optional[str], date_to: Optional[str], column: str = "day") -> Tuple[str, List[Any]]:
+    clauses, params = [], []
+    if date_from:
+        clauses.append(f"{column} >= ?")
+        params.append(date_from)
+    if date_to:
+        clauses.append(f"{column} <= ?")
+        params.append(date_to)
+    return (" AND ".join(clauses) or "1"), params
+
+
+@app.get("/api/predictions")
+def api_predictions(
+    date_from: Optional[str] = Query(None, alias="from"),
+    date_to: Optional[str] = Query(None, alias="to"),
+    type: str = "all",
+    min_conf: float = 0.0,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=API_PAGE_MAX),
+):
+    date_from = _check_day(date_from, "from")
+    date_to = _check_day(date_to, "to")
+    cursor = _check_day(cursor, "cursor")
+
+    where, params = _day_range_sql(date_from, date_to)
+    if cursor:
+        where += " AND day > ?"
+        params.append(cursor)
+
+    with get_conn() as conn:
+        rows = conn.execute(
+            f"SELECT day, content, payload_json, created_at FROM predictions WHERE {where} ORDER BY day LIMIT ?",
+            (*params, limit + 1),
+        ).fetchall()
+
+    items = []
+    for row in rows[:limit]:
+        payload = parse_payload(row)
+        items.append({
+            "day": row["day"],
+            "created_at": row["created_at"],
+            "has_payload": bool(payload and payload.get("matches") is not None),
+            "matches": filter_payload_matches(payload, type, min_conf) if payload else [],
+        })
+
+    return {
+        "items": items,
+        "next_cursor": items[-1]["day"] if len(rows) > limit else None,
+    }
+
+
+def _iter_export_lines(date_from: Optional[str], date_to: Optional[str], pick_type: str, min_conf: float) -> Iterator[bytes]:
+    where, params = _day_range_sql(date_from, date_to)
+    where += " AND COALESCE(star_conf, 0) >= ?"
+    params.append(min_conf)
+    if pick_type != "all":
+        where += " AND star_type = ?"
+        params.append(pick_type)
+
+    # Conexión propia: StreamingResponse puede pedir cada bloque desde un hilo distinto
+    conn = connect_predictions_db(DB_PATH, check_same_thread=False)
+    try:
+        cur = conn.execute(f"SELECT * FROM prediction_matches WHERE {where} ORDER BY day, idx", params)
+        columns = [d[0] for d in cur.description]
+        while True:
+            batch = cur.fetchmany(EXPORT_BATCH_SIZE)
+            if not batch:
+                break
+            yield "".join(
+                json.dumps(dict(zip(columns, r)), ensure_ascii=False) + "\n" for r in batch
+            ).encode("utf-8")
+    finally:
+        conn.close()
+
+
+@app.get("/api/predictions/export.ndjson")
+def api_predictions_export(
+    date_from: Optional[str] = Query(None, alias="from"),
+    date_to: Optional[str] = Query(None, alias="to"),
+    type: str = "all",
+    min_conf: float = 0.0,
+):
+    date_from = _check_day(date_from, "from")
+    date_to = _check_day(date_to, "to")
+    return StreamingResponse(
+        _iter_export_lines(date_from, date_to, type, min_conf),
+        media_type="application/x-ndjson",
+    )
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import HTMLResponse, Response
+
+
+# =========================
+# Caché de páginas ya renderizadas (/ y /day/{day})
+# =========================
+#
+# La clave incluye created_at del día (INSERT OR REPLACE lo renueva), así que
+# un día guardado de nuevo genera otra clave y la entrada vieja acaba saliendo
+# por LRU. Cada respuesta lleva ETag (y Last-Modified si la página solo depende
+# de lo guardado, como /day/{day}) para que el navegador (o un proxy) revalide
+# con 304 sin descargar de nuevo la página.
+
+RenderKey = Tuple[Any, ...]
+
+
+class RenderCache:
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[RenderKey, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: RenderKey) -> Optional[bytes]:
+        with self._lock:
+            body = self._entries.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key: RenderKey, body: bytes) -> None:
+        with self._lock:
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+def make_etag(key: RenderKey) -> str:
+    return '"' + hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:20] + '"'
+
+
+def parse_sqlite_utc(value: Optional[str]) -> Optional[datetime]:
+    """
+    created_at de SQLite ('YYYY-MM-DD HH:MM:SS', UTC) -> datetime con zona.
+    """
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value).replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+
+def _not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # Si viene If-None-Match, manda sobre If-Modified-Since (RFC 9110)
+        tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            return last_modified.replace(microsecond=0) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def cached_html(
+    request: Request,
+    cache: RenderCache,
+    key: RenderKey,
+    last_modified: Optional[datetime],
+    render: Callable[[], bytes],
+) -> Response:
+    """
+    Devuelve 304 si el cliente ya tiene esta versión; si no, el HTML de la caché
+    (o el que genera render() la primera vez).
+    """
+    etag = make_etag(key)
+    headers: Dict[str, str] = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+
+    if _not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+
+    body = cache.get(key)
+    if body is None:
+        body = render()
+        cache.put(key, body)
+    return HTMLResponse(content=body, headers=headers)
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from bot_bet.api_football_client import get_standings_async
+
+
+# =========================
+# Caché en memoria de la clasificación (web)
+# =========================
+#
+# /standings y /form comparten la tabla ya parseada y un índice nombre -> id.
+# Pasado el TTL se sigue sirviendo la copia anterior mientras se refresca en
+# segundo plano; solo la primera carga (sin copia) espera a la API. Como mucho
+# hay un refresco en marcha a la vez (sin estampidas).
+# El refresco va directo a la API (sin la caché persistente): así fetched_at es
+# la hora real de los datos y la antigüedad que muestran las páginas es cierta.
+
+
+@dataclass(frozen=True)
+class StandingsSnapshot:
+    table: List[Dict[str, Any]]
+    team_ids: Dict[str, int]  # nombre -> id
+    teams: List[str]  # nombres ordenados (desplegable de /form)
+    played: Dict[int, int]  # id -> partidos jugados (cambia al terminar uno nuevo)
+    fetched_at: float  # time.time()
+
+    @property
+    def age_seconds(self) -> float:
+        return max(0.0, time.time() - self.fetched_at)
+
+
+def _build_snapshot(table: List[Dict[str, Any]]) -> StandingsSnapshot:
+    team_ids: Dict[str, int] = {}
+    played: Dict[int, int] = {}
+    for row in table:
+        team = row.get("team", {}) or {}
+        name, team_id = team.get("name"), team.get("id")
+        if name and team_id is not None:
+            team_ids.setdefault(name, team_id)
+            games = (row.get("all", {}) or {}).get("played")
+            if isinstance(games, int):
+                played[team_id] = games
+    return StandingsSnapshot(
+        table=table,
+        team_ids=team_ids,
+        teams=sorted(team_ids),
+        played=played,
+        fetched_at=time.time(),
+    )
+
+
+class StandingsCache:
+    def __init__(self, league_id: int, season: int, ttl_seconds: float) -> None:
+        self.league_id = league_id
+        self.season = season
+        self.ttl_seconds = ttl_seconds
+        self._snapshot: Optional[StandingsSnapshot] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    @property
+    def snapshot(self) -> Optional[StandingsSnapshot]:
+        return self._snapshot
+
+    async def _refresh(self) -> StandingsSnapshot:
+        table = await get_standings_async(self.league_id, self.season, use_cache=False)
+        self._snapshot = _build_snapshot(table)
+        return self._snapshot
+
+    def _start_refresh(self) -> asyncio.Task:
+        loop = asyncio.get_running_loop()
+        task = self._refresh_task
+        if task is None or task.done() or task.get_loop() is not loop:
+            task = loop.create_task(self._refresh())
+            task.add_done_callback(self._log_refresh_error)
+            self._refresh_task = task
+        return task
+
+    @staticmethod
+    def _log_refresh_error(task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            print(f"[WARN] No se pudo refrescar la clasificación: {task.exception()}")
+
+    def refresh_in_background(self) -> None:
+        """
+        Lanza un refresco sin esperarlo (p. ej. al arrancar la app).
+        """
+        self._start_refresh()
+
+    async def get(self) -> StandingsSnapshot:
+        snapshot = self._snapshot
+        if snapshot is None:
+            # Primera carga: todos los que lleguen esperan al mismo refresco
+            return await asyncio.shield(self._start_refresh())
+        if snapshot.age_seconds >= self.ttl_seconds:
+            self._start_refresh()
+        return snapshot
+
+
+def format_age(seconds: float) -> str:
+    """
+    90 -> 'hace 1 min', 20 -> 'hace unos segundos'.
+    """
+    if seconds < 60:
+        return "hace unos segundos"
+    minutes = int(seconds // 60)
+    if minutes < 60:
+        return f"hace {minutes} min"
+    return f"hace {minutes // 60} h {minutes % 60} min"
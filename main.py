@@ -5,9 +5,22 @@ import json
 import sqlite3
 from datetime import date
 from pathlib import Path
-from typing import Optional, Dict, Any, Tuple
-
-from bot_bet.predictions import build_daily_message_and_payload
+from typing import Optional, Dict, Any
+
+from bot_bet.api_cache import get_cache_stats, reset_cache_stats
+from bot_bet.api_football_client import get_http_call_count, reset_http_call_count
+from bot_bet.config import settings
+from bot_bet.fixtures_store import sync_fixtures
+from bot_bet.feature_store import list_feature_days
+from bot_bet.http_replay import configure_http_mode, save_cassette
+from bot_bet.metrics import registry as metrics_registry, span
+from bot_bet.predictions import build_daily_message_and_payload, render_daily_message, replay_match_predictions
+from bot_bet.predictions_db import (
+    connect_predictions_db,
+    init_predictions_db,
+    write_prediction_matches,
+    write_run_metrics,
+)
 from bot_bet.telegram_client import send_message_sync
 
 # =========================
@@ -37,23 +50,8 @@ def set_last_run_date(today_str: str) -> None:
 
 
 def _init_db(conn: sqlite3.Connection) -> None:
-    conn.execute(
-        """
-        CREATE TABLE IF NOT EXISTS predictions (
-            day TEXT PRIMARY KEY,
-            content TEXT NOT NULL,
-            payload_json TEXT,
-            created_at TEXT NOT NULL DEFAULT (datetime('now'))
-        )
-        """
-    )
-
-    # Migración suave: si la tabla ya existía sin payload_json, la añadimos
-    cols = [r[1] for r in conn.execute("PRAGMA table_info(predictions)").fetchall()]
-    if "payload_json" not in cols:
-        conn.execute("ALTER TABLE predictions ADD COLUMN payload_json TEXT")
-
-    conn.commit()
+    # Esquema compartido con la web (incluye migraciones y backfill de prediction_matches)
+    init_predictions_db(conn)
 
 
 def save_prediction_to_db(day: str, content: str, payload: Optional[Dict[str, Any]] = None) -> None:
@@ -61,23 +59,47 @@ def save_prediction_to_db(day: str, content: str, payload: Optional[Dict[str, An
 
     payload_json = json.dumps(payload, ensure_ascii=False) if payload else None
 
-    conn = sqlite3.connect(DB_PATH)
+    with span("db_write", table="predictions"):
+        conn = connect_predictions_db(DB_PATH)
+        try:
+            _init_db(conn)
+            conn.execute(
+                "INSERT OR REPLACE INTO predictions(day, content, payload_json) VALUES (?, ?, ?)",
+                (day, content, payload_json),
+            )
+            write_prediction_matches(conn, day, payload)
+            conn.commit()
+        finally:
+            conn.close()
+
+
+def save_run_metrics(day: str, summary: Dict[str, Any]) -> None:
+    conn = connect_predictions_db(DB_PATH)
     try:
         _init_db(conn)
-        conn.execute(
-            "INSERT OR REPLACE INTO predictions(day, content, payload_json) VALUES (?, ?, ?)",
-            (day, content, payload_json),
-        )
+        write_run_metrics(conn, day, summary)
         conn.commit()
     finally:
         conn.close()
 
 
-def run_bot(force: bool = False) -> None:
+def _print_run_summary(summary: Dict[str, Any]) -> None:
+    slowest = ", ".join(
+        f"{name} {entry['seconds']:.2f}s/{entry['count']}"
+        for name, entry in sorted(summary["spans"].items(), key=lambda kv: kv[1]["seconds"], reverse=True)[:5]
+    )
+    print(f"[INFO] Tiempo total: {summary['wall_seconds']:.1f}s. Tramos: {slowest}")
+
+
+def run_bot(force: bool = False, dry_run: bool = False) -> None:
+    """
+    dry_run: solo genera y muestra el mensaje (sin guardar en DB, sin Telegram
+    y sin marcar el día). Es lo que usan --record y --replay.
+    """
     today_str = date.today().isoformat()
     last = get_last_run_date()
 
-    if not force and last == today_str:
+    if not force and not dry_run and last == today_str:
         print(f"[INFO] El bot ya se ejecutó hoy ({today_str}). No se envía nada.")
         return
 
@@ -87,6 +109,9 @@ def run_bot(force: bool = False) -> None:
     text: str
     payload: Optional[Dict[str, Any]]
 
+    reset_http_call_count()
+    reset_cache_stats()
+    metrics_registry.reset()
     try:
         text, payload = build_daily_message_and_payload()
     except Exception as e:
@@ -94,11 +119,21 @@ def run_bot(force: bool = False) -> None:
         # Fallback duro: guardamos algo mínimo para no romper
         text = f"🏆 LaLiga – Pronósticos ({today_str})\n\n⚠️ Error generando pronósticos."
         payload = None
+    cache_stats = get_cache_stats()
+    print(
+        f"[INFO] Llamadas HTTP a API-Football en esta ejecución: {get_http_call_count()} "
+        f"(caché: {cache_stats['hits']} aciertos, {cache_stats['misses']} fallos)"
+    )
 
     print("\n================ MENSAJE GENERADO ================\n")
     print(text)
     print("\n==================================================\n")
 
+    if dry_run:
+        _print_run_summary(metrics_registry.run_summary())
+        print("[INFO] Ejecución de prueba: no se guarda en DB, no se envía a Telegram ni se marca el día.")
+        return
+
     # 2) Guardamos SIEMPRE en DB (aunque Telegram falle)
     try:
         save_prediction_to_db(today_str, text, payload)
@@ -113,7 +148,15 @@ def run_bot(force: bool = False) -> None:
     except Exception as e:
         print(f"[ERROR] Error enviando a Telegram: {e}")
 
-    # 4) Marcamos ejecución del día (siempre, para evitar spam)
+    # 4) Resumen de tiempos de la ejecución, junto a la predicción del día
+    summary = metrics_registry.run_summary()
+    _print_run_summary(summary)
+    try:
+        save_run_metrics(today_str, summary)
+    except Exception as e:
+        print(f"[ERROR] No se pudieron guardar las métricas: {e}")
+
+    # 5) Marcamos ejecución del día (siempre, para evitar spam)
     set_last_run_date(today_str)
     print(f"[INFO] Ejecución completada y marcada para {today_str}.")
 
@@ -125,7 +168,60 @@ def main() -> None:
         action="store_true",
         help="Forzar envío aunque ya se haya ejecutado hoy",
     )
+    parser.add_argument(
+        "--sync-fixtures",
+        action="store_true",
+        help="Solo sincronizar el almacén local de partidos (sin generar ni enviar pronósticos)",
+    )
+    parser.add_argument(
+        "--replay-features",
+        metavar="YYYY-MM-DD",
+        help="Regenerar el mensaje de una ejecución pasada desde el feature store (sin API, sin enviar ni guardar)",
+    )
+    http_mode = parser.add_mutually_exclusive_group()
+    http_mode.add_argument(
+        "--record",
+        nargs="?",
+        const="",
+        metavar="CASSETTE",
+        help="Ejecución de prueba grabando las respuestas HTTP (por defecto en HTTP_CASSETTE_PATH)",
+    )
+    http_mode.add_argument(
+        "--replay",
+        nargs="?",
+        const="",
+        metavar="CASSETTE",
+        help="Ejecución de prueba sin red, respondiendo desde un cassette grabado",
+    )
     args = parser.parse_args()
+
+    if args.record is not None or args.replay is not None:
+        mode = "record" if args.record is not None else "replay"
+        cassette = args.record if args.record is not None else args.replay
+        configure_http_mode(mode, Path(cassette) if cassette else None)
+        run_bot(dry_run=True)
+        save_cassette()
+        return
+
+    if args.replay_features:
+        predictions = replay_match_predictions(args.replay_features)
+        if not predictions:
+            days = ", ".join(list_feature_days()[:10]) or "ninguno"
+            print(f"[WARN] No hay features guardadas para {args.replay_features}. Días disponibles: {days}")
+            return
+        # El título lleva el día de ejecución: el de la jornada repetida, no hoy
+        settings.run_date = args.replay_features
+        print(render_daily_message(predictions))
+        return
+
+    if args.sync_fixtures:
+        result = sync_fixtures()
+        print(
+            f"[INFO] Partidos sincronizados: {result.changed} cambiados de {result.fetched}, "
+            f"{result.statistics_fetched} estadísticas nuevas."
+        )
+        return
+
     run_bot(force=args.force)
 
 
@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+import pytest
+
+# config.py exige estas variables al importarse; los tests no salen a la red
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "test")
+os.environ.setdefault("TELEGRAM_CHAT_ID", "0")
+os.environ.setdefault("API_FOOTBALL_KEY", "test")
+
+from bot_bet.config import settings  # noqa: E402
+
+
+# =========================
+# Fixtures comunes
+# =========================
+#
+#   python -m pytest -q
+#
+# Cada test trabaja con sus propias BDs en tmp_path (nunca las de data/).
+
+@pytest.fixture(autouse=True)
+def _isolated_paths(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "football_db_path", tmp_path / "football.db")
+    monkeypatch.setattr(settings, "api_cache_path", tmp_path / "api_cache.db")
+    monkeypatch.setattr(settings, "api_cache_enabled", False)
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List
+
+from bot_bet.api_cache import DEFAULT_TTL, ENDPOINT_TTLS, HOUR, make_key, ttl_for
+
+
+def _fixture(status: str) -> Dict[str, Any]:
+    return {"fixture": {"id": 1, "status": {"short": status}}}
+
+
+def _stats(entries: int) -> Dict[str, Any]:
+    response: List[Dict[str, Any]] = [{"team": {"id": i}, "statistics": []} for i in range(entries)]
+    return {"response": response}
+
+
+# === /fixtures/statistics ===
+
+def test_statistics_of_finished_fixture_never_expire():
+    assert ttl_for("/fixtures/statistics", {"fixture": 1}, _stats(2), finished=True) is None
+
+
+def test_statistics_of_live_fixture_are_not_frozen():
+    # En juego también vienen las 2 entradas, pero parciales
+    assert ttl_for("/fixtures/statistics", {"fixture": 1}, _stats(2)) == DEFAULT_TTL
+
+
+def test_incomplete_statistics_expire_even_if_finished():
+    assert ttl_for("/fixtures/statistics", {"fixture": 1}, _stats(0), finished=True) == DEFAULT_TTL
+    assert ttl_for("/fixtures/statistics", {"fixture": 1}, _stats(1), finished=True) == DEFAULT_TTL
+    assert ttl_for("/fixtures/statistics", {"fixture": 1}, {"response": None}, finished=True) == DEFAULT_TTL
+
+
+# === /fixtures ===
+
+def test_fixtures_by_id_all_finished_never_expire():
+    data = {"response": [_fixture("FT"), _fixture("AET"), _fixture("PEN")]}
+    assert ttl_for("/fixtures", {"ids": "1-2-3"}, data) is None
+    assert ttl_for("/fixtures", {"id": 1}, {"response": [_fixture("FT")]}) is None
+
+
+def test_fixtures_by_id_with_unfinished_use_endpoint_ttl():
+    data = {"response": [_fixture("FT"), _fixture("2H")]}
+    assert ttl_for("/fixtures", {"ids": "1-2"}, data) == ENDPOINT_TTLS["/fixtures"]
+    assert ttl_for("/fixtures", {"id": 1}, {"response": []}) == ENDPOINT_TTLS["/fixtures"]
+
+
+def test_fixtures_last_n_and_season():
+    data = {"response": [_fixture("FT")]}
+    assert ttl_for("/fixtures", {"team": 1, "last": 10}, data) == HOUR
+    # Temporada completa: aunque todos estén terminados, no es una consulta por id
+    assert ttl_for("/fixtures", {"league": 140, "season": 2025}, data) == ENDPOINT_TTLS["/fixtures"]
+
+
+# === Resto ===
+
+def test_other_endpoints():
+    assert ttl_for("/standings", None, {"response": []}) == ENDPOINT_TTLS["/standings"]
+    assert ttl_for("/teams/statistics", {}, {"response": {}}) == ENDPOINT_TTLS["/teams/statistics"]
+    assert ttl_for("/desconocido", None, {}) == DEFAULT_TTL
+
+
+def test_make_key_normalizes_params():
+    assert make_key("/fixtures", {"league": 140, "season": "2025"}) == make_key(
+        "/fixtures", {"season": 2025, "league": "140"}
+    )
+    assert make_key("/standings") == make_key("/standings", {})
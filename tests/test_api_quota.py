@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+
+import bot_bet.api_football_client as client
+import bot_bet.api_quota as api_quota
+from bot_bet.api_quota import CRITICAL, OPTIONAL, QuotaScheduler
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+    return FakeClock()
+
+
+def _scheduler(clock: FakeClock, per_minute: int = 60, daily_reserve: int = 5) -> QuotaScheduler:
+    return QuotaScheduler(per_minute=per_minute, daily_reserve=daily_reserve, clock=clock)
+
+
+def test_optional_calls_cannot_spend_the_daily_reserve(clock):
+    q = _scheduler(clock)
+    q.update_from_headers({"x-ratelimit-requests-limit": "100", "x-ratelimit-requests-remaining": "7"})
+
+    assert q.acquire(OPTIONAL)
+    assert q.acquire(OPTIONAL)
+    assert q.daily_remaining == 5
+    # Solo queda la reserva: las opcionales se rechazan, las críticas pasan
+    assert not q.acquire(OPTIONAL)
+    assert not q.status().optional_allowed
+    for _ in range(5):
+        assert q.acquire(CRITICAL)
+    assert q.daily_remaining == 0
+    assert not q.acquire(CRITICAL)
+    assert q.rejected == 2
+
+
+def test_unknown_daily_quota_does_not_block(clock):
+    q = _scheduler(clock)
+    assert q.status().optional_allowed
+    assert q.acquire(OPTIONAL)
+
+
+def test_daily_exhausted_blocks_everything(clock):
+    q = _scheduler(clock)
+    q.on_daily_exhausted()
+    assert not q.acquire(CRITICAL)
+    assert not q.acquire(OPTIONAL)
+
+
+def test_bucket_refills_at_the_per_minute_rate(clock):
+    q = _scheduler(clock, per_minute=60)
+    for _ in range(60):
+        assert q.acquire(CRITICAL)
+    assert not q.acquire(CRITICAL)
+
+    clock.advance(1.0)  # 60/min -> 1 token por segundo
+    assert q.acquire(CRITICAL)
+    assert not q.acquire(CRITICAL)
+
+    clock.advance(3600)  # no pasa del límite por minuto
+    assert q.status().minute_available == 60
+
+
+def test_headers_override_local_estimate(clock):
+    q = _scheduler(clock, per_minute=300)
+    q.update_from_headers({
+        "X-RateLimit-Limit": "10",
+        "X-RateLimit-Remaining": "2",
+        "x-ratelimit-requests-remaining": "50",
+    })
+    status = q.status()
+    assert status.minute_limit == 10
+    assert status.minute_available == 2
+    assert status.daily_remaining == 50
+
+
+def test_rate_limited_empties_the_bucket(clock):
+    q = _scheduler(clock)
+    q.on_rate_limited()
+    assert not q.acquire(CRITICAL)
+    clock.advance(1.0)
+    assert q.acquire(CRITICAL)
+
+
+def test_optional_yields_to_waiting_critical(clock):
+    q = _scheduler(clock, per_minute=60)
+    q.on_rate_limited()  # cubo vacío: la crítica tiene que esperar
+
+    granted = []
+    worker = threading.Thread(target=lambda: granted.append(q.acquire(CRITICAL, max_wait=5)))
+    worker.start()
+    deadline = time.monotonic() + 2
+    while q._critical_waiting == 0 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    assert q._critical_waiting == 1
+
+    clock.advance(1.0)  # llega un token
+    # Con una crítica esperando, la opcional no se lo lleva
+    assert not q.acquire(OPTIONAL)
+
+    q.update_from_headers({})  # despierta a la crítica
+    worker.join(timeout=2)
+    assert granted == [True]
+    assert q.status().minute_available < 1
+
+
+# === 429 de API-Football ===
+
+class ScriptedAdapter(BaseAdapter):
+    """
+    Devuelve las respuestas (status, cuerpo) en orden, una por petición.
+    """
+
+    def __init__(self, responses: List[Tuple[int, Dict[str, Any]]]) -> None:
+        super().__init__()
+        self.responses = list(responses)
+        self.sent = 0
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        status, body = self.responses[self.sent]
+        self.sent += 1
+        resp = requests.Response()
+        resp.status_code = status
+        resp._content = json.dumps(body).encode("utf-8")
+        resp.request = request
+        resp.url = request.url
+        return resp
+
+    def close(self) -> None:
+        pass
+
+
+@pytest.fixture
+def scripted_api(monkeypatch: pytest.MonkeyPatch):
+    def install(responses: List[Tuple[int, Dict[str, Any]]]) -> ScriptedAdapter:
+        adapter = ScriptedAdapter(responses)
+        session = requests.Session()
+        session.mount("https://", adapter)
+        monkeypatch.setattr(client, "get_session", lambda: session)
+        # Cubo rápido: tras un 429 el token siguiente llega en milisegundos
+        monkeypatch.setattr(api_quota, "_scheduler", QuotaScheduler(per_minute=6000, daily_reserve=5))
+        return adapter
+
+    return install
+
+
+def test_http_429_is_retried_once_through_the_scheduler(scripted_api):
+    adapter = scripted_api([(429, {"message": "Too many requests"}), (200, {"response": [1]})])
+    assert client.api_football_get("/status")["response"] == [1]
+    assert adapter.sent == 2
+
+
+def test_second_http_429_raises_quota_exceeded(scripted_api):
+    adapter = scripted_api([(429, {}), (429, {}), (200, {"response": []})])
+    with pytest.raises(client.ApiQuotaExceeded):
+        client.api_football_get("/status")
+    assert adapter.sent == 2
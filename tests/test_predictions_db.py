@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import itertools
+import json
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import pytest
+
+from bot_bet.predictions_db import (
+    CONF_SCALE,
+    connect_predictions_db,
+    init_predictions_db,
+    rebuild_prediction_aggregates,
+    write_prediction_matches,
+)
+
+
+_fixture_ids = itertools.count(1)
+
+
+def _match(home: str, away: str, star_type: str, star_pick: str, conf: float) -> Dict[str, Any]:
+    return {
+        "fixture_id": next(_fixture_ids),
+        "home": home,
+        "away": away,
+        "picks": {
+            "goles": {"pick": "Más de 1.5 goles", "confidence": conf},
+            "tarjetas": {"pick": "Más de 3.5 tarjetas totales", "confidence": conf},
+        },
+        "star": {"type": star_type, "pick": star_pick, "confidence": conf},
+    }
+
+
+def _save(conn: sqlite3.Connection, day: str, payload: Optional[Dict[str, Any]]) -> None:
+    conn.execute(
+        "INSERT OR REPLACE INTO predictions(day, content, payload_json) VALUES (?, ?, ?)",
+        (day, "texto", json.dumps(payload) if payload else None),
+    )
+    write_prediction_matches(conn, day, payload)
+    conn.commit()
+
+
+def _snapshot(conn: sqlite3.Connection) -> Tuple[Any, ...]:
+    # Todo salvo version, que por diseño sigue subiendo al reconstruir
+    totals = conn.execute(
+        "SELECT days, days_with_payload, matches, stars_goles, stars_tarjetas, stars_other, conf_bp_sum, conf_n "
+        "FROM prediction_totals WHERE id = 1"
+    ).fetchone()
+    return (
+        tuple(totals),
+        conn.execute("SELECT * FROM prediction_daily_stats ORDER BY day").fetchall(),
+        conn.execute("SELECT * FROM prediction_daily_picks ORDER BY day, pick").fetchall(),
+        conn.execute("SELECT * FROM prediction_daily_teams ORDER BY day, team").fetchall(),
+    )
+
+
+def _assert_matches_rebuild(conn: sqlite3.Connection) -> None:
+    incremental = _snapshot(conn)
+    rebuild_prediction_aggregates(conn)
+    assert incremental == _snapshot(conn)
+
+
+@pytest.fixture
+def conn(tmp_path: Path):
+    c = connect_predictions_db(tmp_path / "predictions.db")
+    init_predictions_db(c)
+    yield c
+    c.close()
+
+
+DAY1: List[Dict[str, Any]] = [
+    _match("Betis", "Sevilla", "goles", "Más de 1.5 goles", 0.7),
+    _match("Getafe", "Osasuna", "tarjetas", "Más de 4.5 tarjetas totales", 0.6),
+]
+DAY2: List[Dict[str, Any]] = [
+    _match("Betis", "Girona", "goles", "Más de 1.5 goles", 0.9),
+]
+
+
+def test_write_updates_totals_and_daily_counts(conn):
+    _save(conn, "2025-03-01", {"matches": DAY1})
+    _save(conn, "2025-03-02", {"matches": DAY2})
+
+    totals = conn.execute("SELECT * FROM prediction_totals").fetchone()
+    assert totals[1:9] == (2, 2, 3, 2, 1, 0, 22000, 3)
+    assert conn.execute(
+        "SELECT SUM(n) FROM prediction_daily_teams WHERE team = 'Betis'"
+    ).fetchone()[0] == 2
+    assert conn.execute(
+        "SELECT day, n FROM prediction_daily_picks WHERE pick = 'Más de 1.5 goles' ORDER BY day"
+    ).fetchall() == [("2025-03-01", 1), ("2025-03-02", 1)]
+    _assert_matches_rebuild(conn)
+
+
+def test_replacing_a_day_subtracts_its_old_contribution(conn):
+    _save(conn, "2025-03-01", {"matches": DAY1})
+    _save(conn, "2025-03-02", {"matches": DAY2})
+    _save(conn, "2025-03-01", {"matches": [_match("Cádiz", "Elche", "tarjetas", "Más de 3.5 tarjetas totales", 0.55)]})
+
+    totals = conn.execute("SELECT * FROM prediction_totals").fetchone()
+    assert totals[1:9] == (2, 2, 2, 1, 1, 0, 14500, 2)
+    assert conn.execute(
+        "SELECT team FROM prediction_daily_teams WHERE day = '2025-03-01' ORDER BY team"
+    ).fetchall() == [("Cádiz",), ("Elche",)]
+    _assert_matches_rebuild(conn)
+
+
+def test_day_without_payload_removes_its_matches(conn):
+    _save(conn, "2025-03-01", {"matches": DAY1})
+    _save(conn, "2025-03-02", {"matches": DAY2})
+    _save(conn, "2025-03-01", None)
+
+    totals = conn.execute("SELECT * FROM prediction_totals").fetchone()
+    # El día sigue contando, pero sin payload ni partidos
+    assert totals[1:9] == (2, 1, 1, 1, 0, 0, 9000, 1)
+    for table in ("prediction_daily_picks", "prediction_daily_teams", "prediction_matches"):
+        assert conn.execute(f"SELECT COUNT(*) FROM {table} WHERE day = '2025-03-01'").fetchone()[0] == 0
+    _assert_matches_rebuild(conn)
+
+
+def test_confidence_sums_are_exact_after_many_replaces(conn):
+    confs = [0.1, 0.2, 0.3, 0.7777777, 0.123456789]
+    for i in range(50):
+        c = confs[i % len(confs)]
+        _save(conn, f"2025-03-{1 + i % 3:02d}", {"matches": [_match("A", "B", "goles", "Más de 1.5 goles", c)]})
+    conf_bp_sum = conn.execute("SELECT conf_bp_sum FROM prediction_totals").fetchone()[0]
+    assert isinstance(conf_bp_sum, int)
+    assert conf_bp_sum == sum(
+        round(r[0] * CONF_SCALE) for r in conn.execute("SELECT star_conf FROM prediction_matches")
+    )
+    _assert_matches_rebuild(conn)
+
+
+def test_version_only_moves_forward(conn):
+    def version() -> int:
+        return conn.execute("SELECT version FROM prediction_totals").fetchone()[0]
+
+    start = version()
+    _save(conn, "2025-03-01", {"matches": DAY1})
+    _save(conn, "2025-03-01", {"matches": DAY2})
+    assert version() == start + 2
+
+    before = version()
+    rebuild_prediction_aggregates(conn)
+    assert version() > before
+
+
+def test_old_counter_tables_are_migrated(tmp_path: Path):
+    path = tmp_path / "old.db"
+    c = connect_predictions_db(path)
+    init_predictions_db(c)
+    _save(c, "2025-03-01", {"matches": DAY1})
+    # Esquema anterior: contadores globales y sin contadores por día
+    c.execute("DROP TABLE prediction_daily_picks")
+    c.execute("DROP TABLE prediction_daily_teams")
+    c.execute("CREATE TABLE prediction_pick_counts (pick TEXT PRIMARY KEY, n INTEGER NOT NULL)")
+    c.execute("CREATE TABLE prediction_team_counts (team TEXT PRIMARY KEY, n INTEGER NOT NULL)")
+    c.commit()
+
+    init_predictions_db(c)
+    tables = {r[0] for r in c.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert "prediction_pick_counts" not in tables and "prediction_team_counts" not in tables
+    assert c.execute("SELECT COUNT(*) FROM prediction_daily_teams").fetchone()[0] == 4
+    c.close()
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pytest
+from starlette.requests import Request
+
+from benchmarks.asgi_driver import asgi_get
+from bot_bet.predictions_db import connect_predictions_db, write_prediction_matches
+from bot_bet.webapp.render_cache import RenderCache, cached_html, make_etag
+
+LAST_MODIFIED = datetime(2025, 3, 15, 9, 0, 0, tzinfo=timezone.utc)
+KEY = ("day", "2025-03-15", "all", 0.0, "2025-03-15 09:00:00")
+
+
+def _request(headers: Optional[Dict[str, str]] = None) -> Request:
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "query_string": b"",
+        "headers": [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in (headers or {}).items()],
+    })
+
+
+def _http_date(dt: datetime) -> str:
+    return format_datetime(dt, usegmt=True)
+
+
+@pytest.fixture
+def renders() -> List[int]:
+    return []
+
+
+def _get(renders: List[int], cache: RenderCache, headers=None, last_modified=LAST_MODIFIED, key=KEY):
+    def render() -> bytes:
+        renders.append(1)
+        return b"<html>ok</html>"
+
+    return cached_html(_request(headers), cache, key, last_modified, render)
+
+
+# === cached_html ===
+
+def test_first_response_renders_once_and_sets_validators(renders):
+    cache = RenderCache(max_entries=4)
+    first = _get(renders, cache)
+    second = _get(renders, cache)
+    assert first.status_code == second.status_code == 200
+    assert first.body == second.body == b"<html>ok</html>"
+    assert len(renders) == 1
+    assert first.headers["etag"] == make_etag(KEY)
+    assert first.headers["last-modified"] == _http_date(LAST_MODIFIED)
+
+
+@pytest.mark.parametrize("if_none_match", [make_etag(KEY), "W/" + make_etag(KEY), '"otro", ' + make_etag(KEY), "*"])
+def test_matching_etag_gives_304(renders, if_none_match):
+    response = _get(renders, RenderCache(max_entries=4), {"If-None-Match": if_none_match})
+    assert response.status_code == 304
+    assert response.headers["etag"] == make_etag(KEY)
+    assert renders == []
+
+
+def test_stale_etag_gives_200_even_if_not_modified_since(renders):
+    # If-None-Match manda sobre If-Modified-Since
+    response = _get(renders, RenderCache(max_entries=4), {
+        "If-None-Match": '"viejo"',
+        "If-Modified-Since": _http_date(LAST_MODIFIED + timedelta(days=1)),
+    })
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize("since, status", [
+    (LAST_MODIFIED, 304),
+    (LAST_MODIFIED + timedelta(hours=1), 304),
+    (LAST_MODIFIED - timedelta(seconds=1), 200),
+])
+def test_if_modified_since(renders, since, status):
+    response = _get(renders, RenderCache(max_entries=4), {"If-Modified-Since": _http_date(since)})
+    assert response.status_code == status
+
+
+def test_invalid_if_modified_since_is_ignored(renders):
+    response = _get(renders, RenderCache(max_entries=4), {"If-Modified-Since": "ayer"})
+    assert response.status_code == 200
+
+
+def test_without_last_modified_only_the_etag_validates(renders):
+    response = _get(
+        renders, RenderCache(max_entries=4),
+        {"If-Modified-Since": _http_date(LAST_MODIFIED + timedelta(days=1))},
+        last_modified=None,
+    )
+    assert response.status_code == 200
+    assert "last-modified" not in response.headers
+
+
+def test_render_cache_evicts_least_recently_used():
+    cache = RenderCache(max_entries=2)
+    cache.put(("a",), b"a")
+    cache.put(("b",), b"b")
+    assert cache.get(("a",)) == b"a"
+    cache.put(("c",), b"c")
+    assert cache.get(("b",)) is None
+    assert cache.get(("a",)) == b"a" and cache.get(("c",)) == b"c"
+
+
+# === / y /day/{day} en la app ===
+
+@pytest.fixture
+def web(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    import bot_bet.webapp.app as web
+
+    web.close_all_connections()
+    web.render_cache.clear()
+    monkeypatch.setattr(web, "DB_PATH", tmp_path / "predictions.db")
+    web.init_db()
+    yield web
+    web.close_all_connections()
+    web.render_cache.clear()
+
+
+def _save_day(path: Path, day: str) -> None:
+    payload = {"matches": [{
+        "fixture_id": 1,
+        "home": "Betis",
+        "away": "Sevilla",
+        "kickoff": "21:00",
+        "picks": {
+            "goles": {"pick": "Más de 1.5 goles", "confidence": 0.7, "block": "goles"},
+            "tarjetas": {"pick": "Más de 3.5 tarjetas totales", "confidence": 0.6, "block": "tarjetas"},
+        },
+        "star": {"type": "goles", "pick": "Más de 1.5 goles", "confidence": 0.7},
+    }]}
+    conn = connect_predictions_db(path)
+    conn.execute(
+        "INSERT OR REPLACE INTO predictions(day, content, payload_json) VALUES (?, ?, ?)",
+        (day, "texto", json.dumps(payload)),
+    )
+    write_prediction_matches(conn, day, payload)
+    conn.commit()
+    conn.close()
+
+
+def test_index_is_validated_by_etag_only(web):
+    _save_day(web.DB_PATH, "2025-03-14")
+    status, headers, _ = asyncio.run(asgi_get(web.app, "/"))
+    assert status == 200
+    assert "last-modified" not in headers
+    etag = headers["etag"]
+
+    # Sin Last-Modified, If-Modified-Since no puede dar un 304 con el "hoy" de ayer
+    future = _http_date(datetime.now(timezone.utc) + timedelta(days=1))
+    assert asyncio.run(asgi_get(web.app, "/", headers={"If-Modified-Since": future}))[0] == 200
+    assert asyncio.run(asgi_get(web.app, "/", headers={"If-None-Match": etag}))[0] == 304
+
+    # Un día nuevo cambia la versión de la lista de días y con ella el ETag
+    _save_day(web.DB_PATH, "2025-03-15")
+    status, headers, _ = asyncio.run(asgi_get(web.app, "/", headers={"If-None-Match": etag}))
+    assert status == 200
+    assert headers["etag"] != etag
+
+
+def test_day_view_revalidates_with_last_modified(web):
+    _save_day(web.DB_PATH, "2025-03-14")
+    status, headers, _ = asyncio.run(asgi_get(web.app, "/day/2025-03-14"))
+    assert status == 200
+    last_modified = headers["last-modified"]
+    assert asyncio.run(asgi_get(web.app, "/day/2025-03-14", headers={"If-Modified-Since": last_modified}))[0] == 304
+    assert asyncio.run(asgi_get(web.app, "/day/2030-01-01"))[0] == 404